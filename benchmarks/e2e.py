@@ -0,0 +1,171 @@
+"""
+Benchmarks de extremo a extremo de `send` y `backup` sobre el cliente falso.
+
+Miden archivos/s y MB/s del flujo completo (inventario, hashing, planificación,
+base de datos, subida por partes y snapshot) sin credenciales ni red:
+
+    python -m benchmarks.e2e --files 200 --size-kb 256
+    python -m benchmarks.e2e --latency-ms 20 --bandwidth-mbps 50 --flood-every 100
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, List
+
+from benchmarks.fake_telegram import FakeNetwork, FakeTelegramClient, FakeUploadEnvironment
+
+MB = 1024 * 1024
+
+
+@dataclass
+class BenchResult:
+    scenario: str
+    files: int
+    bytes: int
+    seconds: float
+    requests: int
+    floods: int
+
+    @property
+    def files_per_s(self) -> float:
+        return self.files / self.seconds if self.seconds else 0.0
+
+    @property
+    def mb_per_s(self) -> float:
+        return self.bytes / MB / self.seconds if self.seconds else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            **asdict(self),
+            "files_per_s": round(self.files_per_s, 2),
+            "mb_per_s": round(self.mb_per_s, 2),
+        }
+
+
+def make_files(folder: Path, count: int, size: int) -> List[Path]:
+    folder.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for i in range(count):
+        path = folder / f"file_{i:05d}.bin"
+        path.write_bytes(os.urandom(size))
+        paths.append(path)
+    return paths
+
+
+def _measure(
+    scenario: str,
+    workdir: Path,
+    network: FakeNetwork,
+    files: int,
+    nbytes: int,
+    action: Callable[[FakeUploadEnvironment], int],
+    **settings,
+) -> BenchResult:
+    client = FakeTelegramClient(network, name=scenario)
+    with FakeUploadEnvironment(workdir / f"work_{scenario}", client, **settings) as env:
+        start = time.perf_counter()
+        action(env)
+        elapsed = time.perf_counter() - start
+
+    return BenchResult(
+        scenario=scenario,
+        files=files,
+        bytes=nbytes,
+        seconds=elapsed,
+        requests=sum(client.stats.requests.values()),
+        floods=client.stats.floods,
+    )
+
+
+def bench_send(workdir: Path, network: FakeNetwork, count: int, size: int) -> BenchResult:
+    folder = workdir / "send_src"
+    make_files(folder, count, size)
+    return _measure(
+        "send", workdir, network, count, count * size, lambda env: env.send([folder])
+    )
+
+
+def bench_backup(
+    workdir: Path, network: FakeNetwork, count: int, size: int, volume_mb: int
+) -> BenchResult:
+    folder = workdir / "backup_src"
+    make_files(folder, count, size)
+    return _measure(
+        "backup",
+        workdir,
+        network,
+        count,
+        count * size,
+        lambda env: env.backup([folder]),
+        tg_max_size_normal=volume_mb * MB,
+    )
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--files", type=int, default=100, help="Archivos por escenario.")
+    parser.add_argument("--size-kb", type=int, default=256, help="Tamaño de cada archivo.")
+    parser.add_argument("--volume-mb", type=int, default=8, help="Tamaño de volumen en backup.")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--bandwidth-mbps", type=float, default=0.0, help="0 = ilimitado.")
+    parser.add_argument("--flood-every", type=int, default=0)
+    parser.add_argument("--flood-seconds", type=int, default=1)
+    parser.add_argument(
+        "--scenario", choices=("send", "backup", "all"), default="all"
+    )
+    parser.add_argument("--json", type=Path, help="Guarda los resultados en JSON.")
+    return parser.parse_args(argv)
+
+
+def run(args: argparse.Namespace) -> List[BenchResult]:
+    from totelegram.cli.ui import console
+
+    # La salida de la UI distorsiona la medición y ensucia el informe.
+    console.quiet = True
+
+    network = FakeNetwork(
+        latency=args.latency_ms / 1000,
+        bandwidth=args.bandwidth_mbps * MB / 8,
+        flood_every=args.flood_every,
+        flood_seconds=args.flood_seconds,
+    )
+    size = args.size_kb * 1024
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="totelegram-bench-") as tmp:
+        workdir = Path(tmp)
+        if args.scenario in ("send", "all"):
+            results.append(bench_send(workdir, network, args.files, size))
+        if args.scenario in ("backup", "all"):
+            results.append(bench_backup(workdir, network, args.files, size, args.volume_mb))
+    return results
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    results = run(args)
+
+    header = f"{'escenario':<10}{'archivos':>10}{'MB':>10}{'seg':>10}{'arch/s':>10}{'MB/s':>10}{'floods':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(
+            f"{r.scenario:<10}{r.files:>10}{r.bytes / MB:>10.1f}{r.seconds:>10.2f}"
+            f"{r.files_per_s:>10.1f}{r.mb_per_s:>10.1f}{r.floods:>8}"
+        )
+
+    if args.json:
+        args.json.write_text(
+            json.dumps([r.as_dict() for r in results], indent=2), encoding="utf-8"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
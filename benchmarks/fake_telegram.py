@@ -0,0 +1,434 @@
+"""
+Cliente de Telegram en memoria para pruebas de extremo a extremo y benchmarks.
+
+Implementa la parte síncrona de la API de Pyrogram que usan `UploadService`,
+`DiscoveryService`, `ChatAccessService` y `ChatSearchService`, devolviendo tipos
+reales de Pyrogram (`Message`, `Chat`, `User`), de modo que la base de datos y
+los snapshots se comportan igual que con una cuenta real.
+
+Vive en `benchmarks`, fuera del paquete instalable: lo usan los benchmarks y las
+pruebas.
+"""
+
+import hashlib
+import itertools
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from totelegram.telegram.ratelimit import RateScheduler, classify
+from totelegram.telemetry import get_telemetry
+
+if TYPE_CHECKING:
+    from pyrogram.types import Chat, Dialog, Message
+
+    from totelegram.types import UploadContext
+
+UPLOAD_PART_SIZE = 512 * 1024
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass
+class FakeNetwork:
+    """
+    Condiciones simuladas de la red.
+
+    latency: segundos por petición.
+    bandwidth: bytes/s de subida (0 = ilimitado).
+    flood_every: inyecta un FloodWait cada N peticiones del mismo método (0 = nunca).
+    flood_seconds: duración de cada FloodWait inyectado.
+    """
+
+    latency: float = 0.0
+    bandwidth: float = 0.0
+    flood_every: int = 0
+    flood_seconds: int = 1
+    sleep: Callable[[float], None] = time.sleep
+
+
+@dataclass
+class FakeStats:
+    requests: Dict[str, int] = field(default_factory=dict)
+    floods: int = 0
+    bytes_uploaded: int = 0
+    slept: float = 0.0
+
+
+@dataclass
+class _StoredFile:
+    file_id: str
+    file_unique_id: str
+    size: int
+    md5sum: str
+    data: Optional[bytes] = None
+
+
+class FakeTelegramClient:
+    """
+    Sustituto en memoria de `pyrogram.Client` (modo síncrono).
+
+    Las peticiones pasan por un `RateScheduler` propio, igual que con el parche de
+    `Session.invoke`: los FloodWait inyectados que no superan `sleep_threshold` se
+    esperan y reintentan; los mayores se propagan como `FloodWait`.
+
+    Con `keep_data`, los bytes subidos se guardan y `stream_media` los devuelve,
+    para probar restauraciones.
+    """
+
+    def __init__(
+        self,
+        network: Optional[FakeNetwork] = None,
+        name: str = "fake",
+        user_id: int = 777000,
+        is_premium: bool = False,
+        sleep_threshold: int = 60,
+        keep_data: bool = False,
+    ):
+        from pyrogram.enums import ChatType
+        from pyrogram.types import Chat, User
+
+        self.name = name
+        self.network = network or FakeNetwork()
+        self.sleep_threshold = sleep_threshold
+        self.keep_data = keep_data
+        self.scheduler = RateScheduler()
+        self.stats = FakeStats()
+
+        self.me = User(
+            id=user_id,
+            is_self=True,
+            first_name="Fake",
+            username=f"{name}_user",
+            is_premium=is_premium,
+        )
+        self._chats: Dict[int, "Chat"] = {}
+        self._messages: Dict[int, Dict[int, "Message"]] = {}
+        self._files: Dict[str, _StoredFile] = {}
+        self._message_ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+        self.add_chat(-1001000000001, "Fake Channel", ChatType.CHANNEL)
+
+    # --- Estado del fake ---
+
+    def add_chat(self, chat_id: int, title: str, chat_type=None, username=None):
+        from pyrogram.enums import ChatType
+        from pyrogram.types import Chat
+
+        chat = Chat(
+            id=chat_id,
+            type=chat_type or ChatType.CHANNEL,
+            title=title,
+            username=username,
+        )
+        self._chats[chat_id] = chat
+        self._messages.setdefault(chat_id, {})
+        return chat
+
+    @property
+    def default_chat(self):
+        return next(iter(self._chats.values()))
+
+    def messages_in(self, chat_id: int) -> List["Message"]:
+        return list(self._messages.get(chat_id, {}).values())
+
+    # --- Red simulada ---
+
+    def _sleep(self, seconds: float):
+        if seconds > 0:
+            self.stats.slept += seconds
+            self.network.sleep(seconds)
+
+    def _invoke(self, query_name: str, nbytes: int = 0) -> Tuple[int, float]:
+        """Simula una petición. Devuelve (reintentos, segundos de FloodWait esperados)."""
+        from pyrogram.errors import FloodWait
+
+        method = classify(query_name)
+        retries, flood_s = 0, 0.0
+        while True:
+            self._sleep(self.scheduler.reserve(self.name, method))
+
+            with self._lock:
+                count = self.stats.requests.get(query_name, 0) + 1
+                self.stats.requests[query_name] = count
+
+            every = self.network.flood_every
+            if every and count % every == 0:
+                seconds = self.network.flood_seconds
+                self.stats.floods += 1
+                self.scheduler.on_flood(self.name, method, seconds)
+                get_telemetry().flood(self.name, method.value, seconds)
+                if seconds > self.sleep_threshold:
+                    raise FloodWait(value=seconds)
+                retries += 1
+                flood_s += seconds
+                continue
+
+            cost = self.network.latency
+            if nbytes and self.network.bandwidth:
+                cost += nbytes / self.network.bandwidth
+            self._sleep(cost)
+            self.stats.bytes_uploaded += nbytes
+            self.scheduler.on_success(self.name, method)
+            return retries, flood_s
+
+    # --- API de Pyrogram ---
+
+    def get_me(self):
+        self._invoke("users.GetFullUser")
+        return self.me
+
+    def get_chat(self, chat_id: Union[int, str]):
+        from pyrogram.errors import PeerIdInvalid
+
+        self._invoke("channels.GetChannels")
+        for chat in self._chats.values():
+            if chat.id == chat_id or (chat.username and chat.username == str(chat_id).lstrip("@")):
+                return chat
+        raise PeerIdInvalid()
+
+    def get_dialogs(self, limit: int = 0) -> Iterator["Dialog"]:
+        from pyrogram.types import Dialog
+
+        self._invoke("messages.GetDialogs")
+        chats = list(self._chats.values())
+        for chat in chats[:limit] if limit else chats:
+            yield Dialog(chat=chat, top_message=None, unread_messages_count=0,  # type: ignore
+                         unread_mentions_count=0, unread_mark=False, is_pinned=False)
+
+    def get_chat_member(self, chat_id: int, user_id):
+        from pyrogram.enums import ChatMemberStatus
+        from pyrogram.types import ChatMember
+
+        self._invoke("channels.GetParticipant")
+        return ChatMember(status=ChatMemberStatus.OWNER, user=self.me)
+
+    def send_chat_action(self, chat_id: int, action) -> bool:
+        self._invoke("messages.SetTyping")
+        return True
+
+    def save_file(self, path, progress=None, progress_args: tuple = ()) -> _StoredFile:
+        """Consume el stream en partes de 512 KiB, como `save_file` de Pyrogram."""
+        if isinstance(path, (str, bytes)) or hasattr(path, "__fspath__"):
+            fp = open(path, "rb")
+            close = True
+        else:
+            fp, close = path, False
+
+        telemetry = get_telemetry()
+        md5 = hashlib.md5()
+        data = bytearray() if self.keep_data else None
+        total = 0
+        part = 0
+        try:
+            while True:
+                read_started = time.perf_counter()
+                chunk = fp.read(UPLOAD_PART_SIZE)
+                read_s = time.perf_counter() - read_started
+                if not chunk:
+                    break
+                rpc_started = time.perf_counter()
+                retries, flood_s = self._invoke("upload.SaveBigFilePart", len(chunk))
+                telemetry.record_part(
+                    self.name,
+                    part,
+                    len(chunk),
+                    read_s,
+                    time.perf_counter() - rpc_started,
+                    flood_s,
+                    retries,
+                )
+                part += 1
+                md5.update(chunk)
+                if data is not None:
+                    data.extend(chunk)
+                total += len(chunk)
+                if progress:
+                    progress(total, total, *progress_args)
+        finally:
+            if close:
+                fp.close()
+
+        if total == 0:
+            raise ValueError("File size equals to 0 B")
+
+        stored = _StoredFile(
+            file_id=f"fake-{uuid.uuid4().hex}",
+            file_unique_id=uuid.uuid4().hex[:16],
+            size=total,
+            md5sum=md5.hexdigest(),
+            data=bytes(data) if data is not None else None,
+        )
+        self._files[stored.file_id] = stored
+        return stored
+
+    def send_document(
+        self,
+        chat_id: Union[int, str],
+        document,
+        file_name: Optional[str] = None,
+        caption: str = "",
+        progress=None,
+        progress_args: tuple = (),
+        force_document: bool = False,
+        **kwargs,
+    ):
+        from pyrogram.enums import MessageMediaType
+        from pyrogram.types import Document, Message
+
+        chat = self.get_chat(chat_id)
+
+        if isinstance(document, str):
+            # Reenvío por file_id: no se transmiten bytes.
+            stored = self._files[document]
+        else:
+            stored = self.save_file(document, progress=progress, progress_args=progress_args)
+
+        self._invoke("messages.SendMedia")
+        with self._lock:
+            message_id = next(self._message_ids)
+
+        message = Message(
+            id=message_id,
+            chat=chat,
+            date=datetime.now().replace(microsecond=0),
+            media=MessageMediaType.DOCUMENT,
+            caption=caption or None,
+            document=Document(
+                file_id=stored.file_id,
+                file_unique_id=stored.file_unique_id,
+                file_name=file_name or getattr(document, "name", "document"),
+                file_size=stored.size,
+                mime_type="application/octet-stream",
+            ),
+        )
+        self._messages[chat.id][message_id] = message
+        return message
+
+    def get_messages(self, chat_id: int, message_ids: Union[int, List[int]]):
+        from pyrogram.types import Message
+
+        self._invoke("channels.GetMessages")
+        stored = self._messages.get(chat_id, {})
+
+        def lookup(mid: int):
+            return stored.get(mid) or Message(id=mid, empty=True)
+
+        if isinstance(message_ids, int):
+            return lookup(message_ids)
+        return [lookup(mid) for mid in message_ids]
+
+    def stream_media(self, message: "Message", limit: int = 0, offset: int = 0):
+        """Entrega el documento en bloques de 1 MiB desde el bloque `offset`."""
+        stored = self._files[message.document.file_id]
+        if stored.data is None:
+            raise RuntimeError("El cliente no guarda los datos: usa keep_data=True.")
+
+        chunk_idx = offset
+        while limit == 0 or chunk_idx < offset + limit:
+            start = chunk_idx * DOWNLOAD_CHUNK_SIZE
+            if start >= stored.size:
+                return
+            self._invoke("upload.GetFile")
+            yield stored.data[start : start + DOWNLOAD_CHUNK_SIZE]
+            chunk_idx += 1
+
+    def delete_messages(self, chat_id: int, message_ids: Union[int, List[int]]) -> int:
+        self._invoke("channels.DeleteMessages")
+        ids = [message_ids] if isinstance(message_ids, int) else message_ids
+        stored = self._messages.get(chat_id, {})
+        return sum(1 for mid in ids if stored.pop(mid, None) is not None)
+
+
+class FakeUploadEnvironment:
+    """
+    Perfil, base de datos y contexto de subida completos sobre un `FakeTelegramClient`.
+
+    Reproduce lo que hacen `send` y `backup` (inventario, Job y `UploadService`)
+    sin credenciales ni red, para pruebas de extremo a extremo y benchmarks.
+
+    Examples:
+        >>> with FakeUploadEnvironment(tmp) as env:
+        ...     env.send([archivo])
+    """
+
+    def __init__(
+        self,
+        workdir: Path,
+        client: Optional[FakeTelegramClient] = None,
+        profile_name: str = "bench",
+        **settings: Any,
+    ):
+        self.workdir = Path(workdir)
+        self.client = client or FakeTelegramClient(name=profile_name)
+        self.profile_name = profile_name
+        self.settings_overrides = settings
+        self.u_ctx: Optional["UploadContext"] = None
+        self._db_session = None
+
+    def __enter__(self) -> "FakeUploadEnvironment":
+        from totelegram.cli.logic import prepare_upload_context
+        from totelegram.database import DatabaseSession
+        from totelegram.identity import SettingsManager
+        from totelegram.schemas import CLIState
+
+        manager = SettingsManager(self.workdir / "config")
+        values = {
+            "api_id": 1,
+            "api_hash": "fake",
+            "profile_name": self.profile_name,
+            "chat_id": self.client.default_chat.id,
+            **self.settings_overrides,
+        }
+        for key, value in values.items():
+            manager.set_setting(self.profile_name, key, value)
+
+        self._db_session = DatabaseSession(manager.get_database_target(self.profile_name))
+        db = self._db_session.start()
+
+        state = CLIState(manager=manager, profile_name=self.profile_name)
+        settings = manager.get_settings(self.profile_name)
+        self.u_ctx = prepare_upload_context(state, self.client, db, settings)  # type: ignore
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.u_ctx and self.u_ctx.writer:
+            self.u_ctx.writer.close()
+        if self.u_ctx:
+            self.u_ctx.lease_manager.stop()
+        if self._db_session:
+            self._db_session.close()
+
+    def _run(self, units: List[List[Path]], force: bool) -> int:
+        from totelegram.cli.logic import get_or_create_send_job
+        from totelegram.uploader import UploadService
+
+        assert self.u_ctx is not None, "Usa el entorno como context manager."
+        uploader = UploadService(self.u_ctx)
+        done = 0
+        for index, unit in enumerate(units, 1):
+            is_last = index == len(units)
+            job = get_or_create_send_job(unit, self.u_ctx, force, wait_if_busy=True)
+            if job is not None and uploader.process_job(job, job.source.path, is_last):
+                done += 1
+        return done
+
+    def send(self, paths: List[Path], force: bool = False) -> int:
+        """Equivalente a `totelegram send`. Devuelve los Jobs completados."""
+        from totelegram.cli.logic import InventoryEngine, plan_send
+
+        assert self.u_ctx is not None, "Usa el entorno como context manager."
+        report = InventoryEngine(self.u_ctx.settings, force).scan_granular(paths)
+        return self._run(plan_send(report.found, self.u_ctx), force)
+
+    def backup(self, folders: List[Path], force: bool = False) -> int:
+        """Equivalente a `totelegram backup`. Devuelve los Jobs completados."""
+        from totelegram.cli.logic import InventoryEngine
+
+        assert self.u_ctx is not None, "Usa el entorno como context manager."
+        report = InventoryEngine(self.u_ctx.settings, force).scan_backup_inventory(folders)
+        return self._run([[path] for path in report.found], force)
@@ -0,0 +1,488 @@
+"""
+Micro-benchmarks de las rutas calientes, con baseline para detectar regresiones.
+
+Cada caso se mide sobre datos sintéticos de N entradas (1k, 100k, 1M). En los
+casos de bytes (hashing, lectura de volúmenes) una entrada es 1 KiB; en los de
+base de datos, una fila (pieza, miembro de cinta o pieza ya subida).
+
+    python -m benchmarks.micro --sizes 1k,100k --save        # en main
+    python -m benchmarks.micro --sizes 1k,100k --compare     # en la PR
+
+`--compare` termina con código 1 si algún caso es más lento que su baseline en
+más de `--max-regression` por ciento o si algún caso medido no está en el
+baseline, y con código 2 si no existe el archivo de baseline. El baseline de
+los tamaños por defecto está en `benchmarks/baselines/micro.json`. Los tiempos
+solo son comparables en la misma máquina: el baseline guarda el equipo en el
+que se midió.
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, ContextManager, Dict, Iterator, List, Optional, Tuple
+
+KIB = 1024
+PART_SIZE = 512 * KIB
+DEFAULT_BASELINE = Path(__file__).parent / "baselines" / "micro.json"
+
+Fixture = Callable[[int, Path], ContextManager[Callable[[], object]]]
+
+CASES: Dict[str, Fixture] = {}
+
+
+def case(name: str):
+    """Registra un caso. El fixture prepara los datos y entrega la función a medir."""
+
+    def decorator(fixture):
+        CASES[name] = contextmanager(fixture)
+        return fixture
+
+    return decorator
+
+
+def parse_size(text: str) -> int:
+    """'1k' -> 1000, '100k' -> 100000, '1m' -> 1000000"""
+    text = text.strip().lower()
+    multiplier = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+    number = text[:-1] if multiplier > 1 else text
+    return int(float(number) * multiplier)
+
+
+def size_label(n: int) -> str:
+    if n >= 1_000_000 and n % 1_000_000 == 0:
+        return f"{n // 1_000_000}m"
+    if n >= 1_000 and n % 1_000 == 0:
+        return f"{n // 1_000}k"
+    return str(n)
+
+
+# --- Datos sintéticos ---
+
+
+def _write_file(path: Path, n: int) -> Path:
+    block = os.urandom(KIB)
+    with open(path, "wb") as f:
+        for _ in range(n):
+            f.write(block)
+    return path
+
+
+def _manifest_entries(n: int, prefix: str = "", size: int = 512) -> list:
+    from tartape.schemas import ByteWindow, EntryMetadata, EntryState, ManifestEntry
+
+    entries = []
+    for i in range(n):
+        arc_path = f"{prefix}dir_{i // 1000:04d}/file_{i:07d}.bin"
+        window = ByteWindow(start=i * size, end=(i + 1) * size)
+        info = EntryMetadata(
+            arc_path=arc_path,
+            rel_path=arc_path,
+            size=size,
+            mtime=0,
+            mode=0o644,
+            uid=0,
+            gid=0,
+            uname="",
+            gname="",
+            is_dir=False,
+            md5sum=f"{i:032x}",
+        )
+        entries.append(
+            ManifestEntry(
+                info=info,
+                state=EntryState.COMPLETE,
+                global_window=window,
+                local_window=window,
+            )
+        )
+    return entries
+
+
+def _remote_rows(payloads, chat_id: int, owner_id: int) -> Iterator[dict]:
+    for p in payloads:
+        message_id = 1000 + p.sequence_index
+        yield {
+            "payload": p.id,
+            "message_id": message_id,
+            "chat": chat_id,
+            "owner": owner_id,
+            "json_metadata": {
+                "message_id": message_id,
+                "chat": {"id": chat_id, "type": "ChatType.CHANNEL"},
+            },
+        }
+
+
+@contextmanager
+def _database(workdir: Path):
+    from totelegram.database import DatabaseSession
+
+    with DatabaseSession(workdir / "bench.sqlite") as db:
+        yield db
+
+
+def _file_job(n: int, chat, part_size: int = 512):
+    """Job CHUNKED de un archivo virtual partido en `n` piezas."""
+    from totelegram.models import Job, Source
+
+    source = Source.create(
+        path_str="bench.bin",
+        md5sum=f"bench-file-{n}",
+        size=n * part_size,
+        mtime=0.0,
+        mimetype="application/octet-stream",
+    )
+    return Job.formalize_intent(source, chat, is_premium=False, tg_limit=part_size)
+
+
+def _chat_and_owner():
+    from totelegram.models import TelegramChat, TelegramUser
+
+    chat = TelegramChat.create(id=-100123456, title="Bench", type="channel")
+    owner = TelegramUser.create(id=123, first_name="Bench")
+    return chat, owner
+
+
+# --- Casos ---
+
+
+@case("md5")
+def bench_md5(n: int, workdir: Path):
+    from totelegram.utils import create_md5sum_by_hashlib
+
+    path = _write_file(workdir / "data.bin", n)
+    yield lambda: create_md5sum_by_hashlib(path)
+
+
+@case("file_volume_read")
+def bench_file_volume_read(n: int, workdir: Path):
+    from totelegram.stream import FileVolume
+
+    path = _write_file(workdir / "data.bin", n)
+
+    def run():
+        with FileVolume(path, 0, n * KIB, "data.bin") as volume:
+            while volume.read(PART_SIZE):
+                pass
+            return volume.md5sum
+
+    yield run
+
+
+@case("throttled_file")
+def bench_throttled_file(n: int, workdir: Path):
+    from totelegram.utils import ThrottledFile
+
+    path = _write_file(workdir / "data.bin", n)
+
+    def run():
+        # Sin límite: mide el coste del envoltorio, no la pausa.
+        with ThrottledFile(open(path, "rb"), 0) as stream:
+            while stream.read(PART_SIZE):
+                pass
+
+    yield run
+
+
+@case("chunk_ranges")
+def bench_chunk_ranges(n: int, workdir: Path):
+    from totelegram.packaging import chunk_ranges
+
+    yield lambda: chunk_ranges(n * 512, 512)
+
+
+@case("chunker_get_or_create")
+def bench_chunker(n: int, workdir: Path):
+    from totelegram.database import db_transaction
+    from totelegram.packaging import Chunker
+
+    with _database(workdir) as db:
+        chat, _ = _chat_and_owner()
+        job = _file_job(n, chat)
+
+        def run():
+            with db_transaction(db):
+                return Chunker.get_or_create(job)
+
+        yield run
+
+
+@case("register_manifest_entries")
+def bench_register_manifest_entries(n: int, workdir: Path):
+    from totelegram.models import Job, Payload, Source, TapeMember
+    from totelegram.schemas import SourceType
+
+    with _database(workdir):
+        chat, _ = _chat_and_owner()
+        source = Source.create(
+            path_str="carpeta",
+            md5sum="bench-tape",
+            size=n * 512,
+            mtime=0.0,
+            mimetype="application/x-tar",
+            type=SourceType.FOLDER,
+        )
+        job = Job.formalize_intent(source, chat, is_premium=False, tg_limit=n * 512)
+        payload = Payload.create(
+            job=job,
+            sequence_index=0,
+            start_offset=0,
+            end_offset=n * 512,
+            size=n * 512,
+            filename="carpeta.tar",
+            filename_short="bench-tape.tar",
+        )
+        entries = _manifest_entries(n)
+
+        yield lambda: TapeMember.register_manifest_entries(source, payload, entries)
+
+
+@case("generate_snapshot")
+def bench_generate_snapshot(n: int, workdir: Path):
+    from totelegram.models import Job, Payload, RemotePayload, Source, TapeMember
+    from totelegram.packaging import SnapshotService
+    from totelegram.schemas import SourceType
+    from totelegram.utils import batched
+
+    files_per_volume = 1000
+    volumes = math.ceil(n / files_per_volume)
+    volume_size = files_per_volume * 512
+
+    with _database(workdir):
+        chat, owner = _chat_and_owner()
+        source = Source.create(
+            path_str=str(workdir / "carpeta"),
+            md5sum="bench-tape",
+            size=n * 512,
+            mtime=0.0,
+            mimetype="application/x-tar",
+            type=SourceType.FOLDER,
+        )
+        job = Job.formalize_intent(source, chat, is_premium=False, tg_limit=volume_size)
+
+        payloads = []
+        for idx in range(volumes):
+            start = idx * volume_size
+            end = min(start + volume_size, n * 512)
+            payload = Payload.create(
+                job=job,
+                sequence_index=idx,
+                start_offset=start,
+                end_offset=end,
+                size=end - start,
+                filename=f"carpeta.tar.{idx}",
+                filename_short=f"bench-tape.tar.{idx}",
+            )
+            count = min(files_per_volume, n - idx * files_per_volume)
+            TapeMember.register_manifest_entries(
+                source, payload, _manifest_entries(count, prefix=f"v{idx:05d}/")
+            )
+            payloads.append(payload)
+
+        for batch in batched(_remote_rows(payloads, chat.id, owner.id), 500):
+            RemotePayload.insert_many(batch).execute()
+
+        yield lambda: SnapshotService.generate_snapshot(job)
+
+
+@case("claim_next_payload")
+def bench_claim_next_payload(n: int, workdir: Path):
+    """Peor caso: todas las piezas están subidas salvo la última."""
+    from totelegram.database import db_transaction
+    from totelegram.models import RemotePayload, TelegramChat
+    from totelegram.packaging import Chunker
+    from benchmarks.fake_telegram import FakeUploadEnvironment
+    from totelegram.uploader import UploadService
+    from totelegram.utils import batched
+
+    with FakeUploadEnvironment(workdir) as env:
+        assert env.u_ctx is not None
+        chat, _ = TelegramChat.get_or_create_from_chat(env.u_ctx.tg_chat)
+        job = _file_job(n, chat)
+        with db_transaction(env.u_ctx.db):
+            payloads = Chunker.get_or_create(job)
+            rows = _remote_rows(payloads[:-1], chat.id, env.u_ctx.owner.id)
+            for batch in batched(rows, 500):
+                RemotePayload.insert_many(batch).execute()
+
+        uploader = UploadService(env.u_ctx)
+
+        def run():
+            claimed = uploader._claim_next_payload(job)
+            if claimed is not None:
+                claimed[1].release()
+            return claimed
+
+        yield run
+
+
+# --- Medición y baseline ---
+
+
+def measure(name: str, n: int, workdir: Path, repeat: int = 3) -> float:
+    """Mejor tiempo (segundos) de `repeat` rondas, cada una con datos recién creados."""
+    best = math.inf
+    for round_ in range(repeat):
+        round_dir = workdir / f"{name}_{n}_{round_}"
+        round_dir.mkdir(parents=True)
+        try:
+            with CASES[name](n, round_dir) as fn:
+                start = time.perf_counter()
+                fn()
+                best = min(best, time.perf_counter() - start)
+        finally:
+            shutil.rmtree(round_dir, ignore_errors=True)
+    return best
+
+
+def run_suite(
+    names: List[str], sizes: List[int], repeat: int = 3
+) -> Dict[str, float]:
+    from totelegram.cli.ui import console
+
+    # La salida de la UI distorsiona la medición y ensucia el informe.
+    console.quiet = True
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="totelegram-micro-") as tmp:
+        for name in names:
+            for n in sizes:
+                results[f"{name}[{size_label(n)}]"] = measure(name, n, Path(tmp), repeat)
+    return results
+
+
+def machine_info() -> dict:
+    return {
+        "node": platform.node(),
+        "machine": platform.machine(),
+        "python": platform.python_version(),
+    }
+
+
+def load_baseline(path: Path) -> dict:
+    if not path.exists():
+        return {"machine": machine_info(), "results": {}}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def save_baseline(path: Path, results: Dict[str, float]):
+    """Actualiza el baseline con los casos medidos, conservando el resto."""
+    data = load_baseline(path)
+    data["machine"] = machine_info()
+    data["results"].update({k: round(v, 6) for k, v in results.items()})
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(data, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+
+
+def missing_cases(results: Dict[str, float], baseline: Dict[str, float]) -> List[str]:
+    """Casos medidos sin baseline: no se pueden comparar."""
+    return [key for key in results if not baseline.get(key)]
+
+
+def find_regressions(
+    results: Dict[str, float], baseline: Dict[str, float], max_regression: float
+) -> List[Tuple[str, float, float, float]]:
+    """(caso, baseline, actual, % de cambio) de los casos más lentos que lo permitido."""
+    regressions = []
+    for key, current in results.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+        change = (current - base) / base * 100
+        if change > max_regression:
+            regressions.append((key, base, current, change))
+    return regressions
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--sizes", default="1k,100k", help="Tamaños separados por coma (1k,100k,1m)."
+    )
+    parser.add_argument(
+        "--case",
+        action="append",
+        choices=sorted(CASES),
+        help="Caso a medir (repetible). Por defecto, todos.",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Rondas por caso.")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save", action="store_true", help="Guarda como baseline.")
+    parser.add_argument(
+        "--compare", action="store_true", help="Compara contra el baseline."
+    )
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=15.0,
+        help="Porcentaje de empeoramiento tolerado con --compare.",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    names = args.case or list(CASES)
+    sizes = [parse_size(s) for s in args.sizes.split(",") if s.strip()]
+
+    if args.compare and not args.baseline.exists():
+        print(
+            f"No existe el baseline {args.baseline}. "
+            "Mídelo en main con --save y súbelo al repositorio."
+        )
+        return 2
+
+    results = run_suite(names, sizes, args.repeat)
+
+    baseline: Optional[dict] = load_baseline(args.baseline) if args.compare else None
+    base_results = baseline["results"] if baseline else {}
+
+    header = f"{'caso':<38}{'seg':>12}{'baseline':>12}{'cambio':>10}"
+    print(header)
+    print("-" * len(header))
+    for key, seconds in results.items():
+        base = base_results.get(key)
+        change = f"{(seconds - base) / base * 100:+.1f}%" if base else "-"
+        base_text = f"{base:.4f}" if base else "-"
+        print(f"{key:<38}{seconds:>12.4f}{base_text:>12}{change:>10}")
+
+    if args.save:
+        save_baseline(args.baseline, results)
+        print(f"\nBaseline guardado en {args.baseline}")
+
+    if baseline is None:
+        return 0
+
+    if baseline.get("machine", {}).get("node") != platform.node():
+        print(
+            f"\nAviso: el baseline se midió en '{baseline['machine'].get('node')}'; "
+            "los tiempos de otra máquina no son comparables."
+        )
+
+    failed = False
+    missing = missing_cases(results, base_results)
+    if missing:
+        print("\nCasos sin baseline (guárdalos con --save):")
+        for key in missing:
+            print(f"  {key}")
+        failed = True
+
+    regressions = find_regressions(results, base_results, args.max_regression)
+    if regressions:
+        print(f"\nRegresiones de más del {args.max_regression:g}%:")
+        for key, base, current, change in regressions:
+            print(f"  {key}: {base:.4f}s -> {current:.4f}s ({change:+.1f}%)")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
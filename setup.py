@@ -26,7 +26,12 @@ setup(
         "filelock>=3.20.3",
         "tartape>=2.2.0",
     ],
-    packages=find_packages(),
+    extras_require={
+        "zstd": ["zstandard>=0.22.0"],
+        "watch": ["watchdog>=3.0.0"],
+        "postgres": ["psycopg2-binary>=2.9"],
+    },
+    packages=find_packages(exclude=["benchmarks", "benchmarks.*"]),
     entry_points={
         "console_scripts": ["totelegram=totelegram.cli.__main__:run_script"],
     },
@@ -0,0 +1,80 @@
+import json
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from benchmarks.micro import (
+    CASES,
+    DEFAULT_BASELINE,
+    find_regressions,
+    load_baseline,
+    main,
+    measure,
+    missing_cases,
+    parse_args,
+    parse_size,
+    save_baseline,
+    size_label,
+)
+
+
+class TestMicroBenchmarks(unittest.TestCase):
+    def test_sizes(self):
+        self.assertEqual(parse_size("1k"), 1_000)
+        self.assertEqual(parse_size("100K"), 100_000)
+        self.assertEqual(parse_size("1m"), 1_000_000)
+        self.assertEqual(parse_size("250"), 250)
+        self.assertEqual(size_label(1_000_000), "1m")
+        self.assertEqual(size_label(100_000), "100k")
+
+    def test_regression_threshold(self):
+        baseline = {"md5[1k]": 1.0, "chunk_ranges[1k]": 1.0}
+        results = {"md5[1k]": 1.10, "chunk_ranges[1k]": 1.30, "nuevo[1k]": 5.0}
+
+        regressions = find_regressions(results, baseline, max_regression=15)
+
+        self.assertEqual([r[0] for r in regressions], ["chunk_ranges[1k]"])
+        self.assertAlmostEqual(regressions[0][3], 30.0)
+
+    def test_missing_cases_fail_the_comparison(self):
+        baseline = {"md5[1k]": 1.0}
+        results = {"md5[1k]": 1.0, "nuevo[1k]": 5.0}
+        self.assertEqual(missing_cases(results, baseline), ["nuevo[1k]"])
+
+        with TemporaryDirectory() as tmp:
+            path = Path(tmp) / "micro.json"
+            save_baseline(path, {"md5[20]": 1.0})
+            args = ["--compare", "--baseline", str(path), "--sizes", "20", "--repeat", "1"]
+            self.assertEqual(main(args + ["--case", "md5"]), 0)
+            self.assertEqual(main(args + ["--case", "chunk_ranges"]), 1)
+
+    def test_compare_without_baseline_file_fails(self):
+        with TemporaryDirectory() as tmp:
+            missing = Path(tmp) / "micro.json"
+            self.assertEqual(main(["--compare", "--baseline", str(missing)]), 2)
+
+    def test_committed_baseline_covers_default_sizes(self):
+        args = parse_args([])
+        sizes = [size_label(parse_size(s)) for s in args.sizes.split(",")]
+        results = {f"{name}[{size}]": 1.0 for name in CASES for size in sizes}
+        self.assertEqual(missing_cases(results, load_baseline(DEFAULT_BASELINE)["results"]), [])
+
+    def test_save_merges_with_previous_baseline(self):
+        with TemporaryDirectory() as tmp:
+            path = Path(tmp) / "baselines" / "micro.json"
+            save_baseline(path, {"md5[1k]": 0.5})
+            save_baseline(path, {"md5[100k]": 2.0})
+
+            data = json.loads(path.read_text(encoding="utf-8"))
+            self.assertEqual(data["results"], {"md5[1k]": 0.5, "md5[100k]": 2.0})
+            self.assertIn("node", data["machine"])
+
+    def test_every_case_runs_on_small_data(self):
+        with TemporaryDirectory() as tmp:
+            for name in CASES:
+                with self.subTest(case=name):
+                    self.assertGreaterEqual(measure(name, 20, Path(tmp), repeat=1), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
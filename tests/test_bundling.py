@@ -0,0 +1,158 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from benchmarks.fake_telegram import FakeTelegramClient, FakeUploadEnvironment
+from totelegram import bundling, packaging
+from totelegram.bundling import plan_bundles
+from totelegram.cli.ui import console
+from totelegram.models import Job
+from totelegram.packaging import SnapshotService
+from totelegram.restore import RestoreService
+from totelegram.schemas import SourceType
+from totelegram.utils import SNAPSHOT_INDEX_NAME
+
+
+class TestPlanBundles(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _write(self, name: str, size: int) -> Path:
+        path = self.root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"x" * size)
+        return path
+
+    def test_small_files_are_grouped_by_folder(self):
+        small = [self._write(f"a/{i}.txt", 100) for i in range(3)]
+        alone = self._write("b/solo.txt", 100)
+        large = self._write("a/grande.bin", 5_000)
+
+        bundles, singles = plan_bundles(small + [alone, large], 1_000, 10_000)
+        self.assertEqual(bundles, [sorted(small)])
+        self.assertEqual(set(singles), {alone, large})
+
+    def test_bundles_are_split_at_the_volume_limit(self):
+        files = [self._write(f"{i}.txt", 1_000) for i in range(6)]
+        # Cada archivo ocupa 1536 bytes de cinta (cabecera + contenido con relleno).
+        bundles, singles = plan_bundles(files, 2_000, 6_000)
+        self.assertEqual([len(b) for b in bundles], [3, 3])
+        self.assertEqual(singles, [])
+
+    def test_disabled_threshold_keeps_every_file(self):
+        files = [self._write(f"{i}.txt", 10) for i in range(3)]
+        self.assertEqual(plan_bundles(files, 0, 10_000), ([], files))
+
+
+class TestBundledSend(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        console.quiet = True
+
+        self.folder = self.root / "notas"
+        self.folder.mkdir()
+        self.files = {f"{i:02}.txt": os.urandom(1_000 + i) for i in range(20)}
+        self.files["grande.bin"] = os.urandom(200_000)
+        for name, data in self.files.items():
+            (self.folder / name).write_bytes(data)
+
+    def tearDown(self):
+        console.quiet = False
+        self.tmp.cleanup()
+
+    def test_small_files_travel_in_one_bundle_and_restore(self):
+        client = FakeTelegramClient(keep_data=True)
+
+        with FakeUploadEnvironment(
+            self.root / "work", client, bundle_small_files_bytes=10_000
+        ) as env:
+            self.assertEqual(env.send([self.folder]), 2)
+            jobs = list(Job.select())
+            self.assertEqual(
+                sorted(j.source.type for j in jobs), [SourceType.BUNDLE, SourceType.FILE]
+            )
+            # Un mensaje por Job en lugar de uno por archivo.
+            self.assertEqual(len(client.messages_in(client.default_chat.id)), 2)
+
+            # Los archivos del paquete ya tienen snapshot: no se vuelven a enviar.
+            self.assertEqual(env.send([self.folder]), 0)
+
+            # Un archivo modificado vuelve a ser candidato.
+            changed = self.folder / "03.txt"
+            changed.write_bytes(os.urandom(900))
+            mtime = changed.stat().st_mtime + 10
+            os.utime(changed, (mtime, mtime))
+            self.files["03.txt"] = changed.read_bytes()
+            self.assertEqual(env.send([self.folder]), 1)
+
+        manifests = sorted(
+            (p for p in self.root.rglob("*.json.*") if ".bundle-" in p.name),
+            key=lambda p: p.stat().st_mtime_ns,
+        )
+        manifest = SnapshotService.read_snapshot(manifests[0])
+        self.assertEqual(manifest.source.type, SourceType.BUNDLE)
+        members = {m.relative_path for m in manifest.source.inventory or []}
+        self.assertEqual(members, {f"{i:02}.txt" for i in range(20)})
+
+        restore = RestoreService(client)  # type: ignore
+        target = restore.restore_member(manifest, "07.txt", self.root / "uno")
+        self.assertEqual(target.read_bytes(), self.files["07.txt"])
+
+        output = self.root / "restaurado"
+        restore.restore_source(manifest, output)
+        for i in range(20):
+            name = f"{i:02}.txt"
+            if name == "03.txt":
+                continue
+            with self.subTest(name=name):
+                self.assertEqual((output / name).read_bytes(), self.files[name])
+
+    def test_unchanged_bundled_files_are_not_hashed_again(self):
+        client = FakeTelegramClient()
+
+        with FakeUploadEnvironment(
+            self.root / "work", client, bundle_small_files_bytes=10_000
+        ) as env:
+            self.assertEqual(env.send([self.folder]), 2)
+
+            changed = self.folder / "03.txt"
+            mtime = changed.stat().st_mtime + 10
+            os.utime(changed, (mtime, mtime))
+
+            # Con --force vuelven todos: solo se lee el archivo tocado.
+            with mock.patch.object(
+                bundling, "create_md5sum_by_hashlib", wraps=bundling.create_md5sum_by_hashlib
+            ) as md5:
+                env.send([self.folder], force=True)
+            self.assertEqual([c.args[0] for c in md5.call_args_list], [changed])
+
+    def test_lost_index_is_rebuilt_from_the_bundle_snapshot(self):
+        client = FakeTelegramClient()
+
+        with FakeUploadEnvironment(
+            self.root / "work", client, bundle_small_files_bytes=10_000
+        ) as env:
+            self.assertEqual(env.send([self.folder]), 2)
+            (self.folder / SNAPSHOT_INDEX_NAME).unlink()
+
+            # Sin índice, los archivos del paquete se reconocen por su snapshot.
+            self.assertEqual(env.send([self.folder]), 0)
+            self.assertEqual(len(client.messages_in(client.default_chat.id)), 2)
+
+            # La lista reconstruida vuelve al índice: no se leen otra vez.
+            with mock.patch.object(
+                packaging, "create_md5sum_by_hashlib", wraps=packaging.create_md5sum_by_hashlib
+            ) as md5:
+                self.assertEqual(env.send([self.folder]), 0)
+            md5.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,39 @@
+import random
 import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
 
-from totelegram.packaging import chunk_ranges
+import tartape
+
+from totelegram.database import DatabaseSession
+from totelegram.models import Job, Source, TapeMember, TapeMemberGPS, TelegramChat
+from totelegram.packaging import Chunker, chunk_ranges, content_defined_ranges
+from totelegram.schemas import TapeChunking
+
+BLOCK = 512
+
+
+def synthetic_tape(sizes):
+    """(inicio, fin, identidad) de entradas contiguas alineadas a bloques TAR, y el total."""
+    tracks, offset = [], 0
+    for name, size in sizes:
+        end = offset + BLOCK + -(-size // BLOCK) * BLOCK
+        tracks.append((offset, end, f"{name}:{size}"))
+        offset = end
+    return tracks, offset + 2 * BLOCK
+
+
+def volume_signatures(tracks, ranges):
+    """Contenido de cada volumen expresado en entradas y desplazamientos relativos."""
+    signatures = []
+    for vol_start, vol_end in ranges:
+        parts = tuple(
+            (identity, max(start, vol_start) - start, min(end, vol_end) - start)
+            for start, end, identity in tracks
+            if start < vol_end and end > vol_start
+        )
+        signatures.append((parts, vol_end - vol_start))
+    return signatures
 
 
 class TestChunkingMath(unittest.TestCase):
@@ -19,3 +52,131 @@ class TestChunkingMath(unittest.TestCase):
         ranges = chunk_ranges(10, 3)
         expected = [(0, 3), (3, 6), (6, 9), (9, 10)]
         self.assertEqual(ranges, expected)
+
+
+class TestContentDefinedRanges(unittest.TestCase):
+    MAX = 64 * BLOCK
+    AVG = 32 * BLOCK
+    MIN = 8 * BLOCK
+
+    def setUp(self):
+        rng = random.Random(7)
+        self.sizes = [(f"f{i}", rng.randint(0, 12 * BLOCK)) for i in range(600)]
+
+    def ranges(self, sizes):
+        tracks, total = synthetic_tape(sizes)
+        return tracks, content_defined_ranges(tracks, total, self.MIN, self.AVG, self.MAX)
+
+    def test_ranges_cover_the_tape_within_bounds(self):
+        tracks, ranges = self.ranges(self.sizes)
+        _, total = synthetic_tape(self.sizes)
+
+        self.assertEqual(ranges[0][0], 0)
+        self.assertEqual(ranges[-1][1], total)
+        for (_, prev_end), (start, _) in zip(ranges, ranges[1:]):
+            self.assertEqual(prev_end, start)
+        for start, end in ranges:
+            self.assertLessEqual(end - start, self.MAX)
+            self.assertEqual(start % BLOCK, 0)
+        for start, end in ranges[:-1]:
+            self.assertGreaterEqual(end - start, self.MIN)
+
+    def test_large_entries_are_split_at_max_size(self):
+        tracks, ranges = self.ranges([("a", 100), ("video", 5 * self.MAX), ("b", 100)])
+        self.assertTrue(all(end - start <= self.MAX for start, end in ranges))
+        self.assertGreaterEqual(len(ranges), 5)
+
+    def test_insertion_only_changes_nearby_volumes(self):
+        tracks, ranges = self.ranges(self.sizes)
+        before = volume_signatures(tracks, ranges)
+
+        edited = self.sizes[:20] + [("nuevo", 3 * BLOCK)] + self.sizes[20:]
+        tracks, ranges = self.ranges(edited)
+        after = volume_signatures(tracks, ranges)
+
+        reused = len(set(before) & set(after))
+        self.assertGreaterEqual(reused, len(before) - 4)
+
+        # Con cortes fijos, la inserción desplaza todos los volúmenes siguientes.
+        fixed_before = volume_signatures(*self._fixed(self.sizes))
+        fixed_after = volume_signatures(*self._fixed(edited))
+        self.assertLess(len(set(fixed_before) & set(fixed_after)), len(fixed_before) // 2)
+
+    def _fixed(self, sizes):
+        tracks, total = synthetic_tape(sizes)
+        return tracks, chunk_ranges(total, self.MAX)
+
+
+class TestFolderPlanning(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = TemporaryDirectory()
+        self.folder = Path(self.tmp_dir.name) / "carpeta"
+        self.folder.mkdir()
+        for i in range(6):
+            (self.folder / f"archivo_{i}.bin").write_bytes(bytes([i]) * (700 + i * 300))
+
+        self.db_manager = DatabaseSession(":memory:")
+        self.db_manager.start()
+        chat = TelegramChat.create(id=-100123456, title="Test Chat", type="channel")
+
+        tape = tartape.create(self.folder, calculate_hashes=True)
+        self.source = Source.create_from_tape(tape, [])
+        self.job = Job.formalize_intent(
+            self.source, chat, is_premium=False, tg_limit=2048
+        )
+
+    def tearDown(self):
+        self.db_manager.close()
+        try:
+            self.tmp_dir.cleanup()
+        except Exception:
+            pass
+
+    def test_folder_plan_covers_tape(self):
+        """Los volúmenes planificados cubren la cinta completa y sin huecos."""
+        payloads = Chunker.get_or_create(self.job)
+
+        self.assertTrue(Chunker.is_planned(self.job))
+        self.assertEqual(payloads[0].start_offset, 0)
+        self.assertEqual(payloads[-1].end_offset, self.source.size)
+        for prev, curr in zip(payloads, payloads[1:]):
+            self.assertEqual(prev.end_offset, curr.start_offset)
+
+        members = {m.relative_path for m in TapeMember.select()}
+        self.assertEqual(len([m for m in members if m.endswith(".bin")]), 6)
+        self.assertGreater(TapeMemberGPS.select().count(), 0)
+
+    def test_folder_plan_resumes(self):
+        """Una planificación interrumpida se completa sin duplicar volúmenes."""
+        plan = Chunker.iter_folder_plan(self.job)
+        next(plan)
+        plan.close()
+
+        self.assertFalse(Chunker.is_planned(self.job))
+
+        payloads = Chunker.get_or_create(self.job)
+        indexes = [p.sequence_index for p in payloads]
+        self.assertEqual(indexes, list(range(len(payloads))))
+        self.assertTrue(Chunker.is_planned(self.job))
+
+    def test_cdc_plan_is_recorded_and_cuts_at_entry_boundaries(self):
+        chat = TelegramChat.get()
+        self.job.delete_instance()
+        job = Job.formalize_intent(
+            self.source, chat, is_premium=False, tg_limit=4096, tape_chunking=TapeChunking.CDC
+        )
+        job = Job.get_by_id(job.id)
+        self.assertEqual(job.config.tape_chunking, TapeChunking.CDC)
+        self.assertEqual((job.config.cdc_min_size, job.config.cdc_avg_size), (512, 2048))
+
+        payloads = Chunker.get_or_create(job)
+        self.assertTrue(Chunker.is_planned(job))
+        self.assertEqual(payloads[-1].end_offset, self.source.size)
+        self.assertTrue(all(p.size <= 4096 for p in payloads))
+
+        with tartape.Catalog.from_directory(self.folder):
+            from tartape.models import Track
+
+            starts = {t.start_offset for t in Track.select()}
+        ends = [p.end_offset for p in payloads[:-1]]
+        self.assertTrue(all(end in starts or end % 4096 == 0 for end in ends))
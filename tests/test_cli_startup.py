@@ -0,0 +1,72 @@
+import subprocess
+import sys
+import unittest
+
+from typer.testing import CliRunner
+
+from totelegram.cli.__main__ import COMMANDS, app
+
+runner = CliRunner()
+
+# Módulos que solo deben cargarse al ejecutar un comando que los necesite.
+HEAVY_MODULES = (
+    "peewee",
+    "tartape",
+    "pyrogram",
+    "pydantic_settings",
+    "rich",
+    "totelegram.models",
+    "totelegram.uploader",
+    "totelegram.identity",
+)
+
+# Presupuesto de importación de la CLI (microsegundos, medido con -X importtime).
+IMPORT_BUDGET_US = 200_000
+
+
+def _import_times(module: str) -> dict:
+    """Devuelve {módulo: tiempo acumulado en µs} al importar `module` en un proceso limpio."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+class TestCliStartup(unittest.TestCase):
+    def test_startup_does_not_import_heavy_modules(self):
+        times = _import_times("totelegram.cli.__main__")
+        loaded = [m for m in HEAVY_MODULES if m in times]
+        self.assertEqual(loaded, [], f"La CLI importa al arrancar: {loaded}")
+
+    def test_startup_import_budget(self):
+        times = _import_times("totelegram.cli.__main__")
+        elapsed = times["totelegram.cli.__main__"]
+        self.assertLess(
+            elapsed,
+            IMPORT_BUDGET_US,
+            f"Importar la CLI tomó {elapsed / 1000:.1f} ms",
+        )
+
+    def test_lazy_commands_are_listed_and_resolved(self):
+        result = runner.invoke(app, ["--help"])
+        self.assertEqual(result.exit_code, 0)
+        for name in COMMANDS:
+            self.assertIn(name, result.stdout)
+
+        result = runner.invoke(app, ["config", "--help"])
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn("set", result.stdout)
+
+    def test_version_exits_early(self):
+        result = runner.invoke(app, ["--version"])
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn("toTelegram v", result.stdout)
@@ -0,0 +1,163 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+from benchmarks.fake_telegram import FakeTelegramClient, FakeUploadEnvironment
+from totelegram.cli.ui import console
+from totelegram import compression
+from totelegram.compression import frame_spans, is_compressed_mimetype
+from totelegram.models import Job, Payload
+from totelegram.packaging import SnapshotService
+from totelegram.restore import TG_CHUNK_SIZE, RestoreService
+from totelegram.schemas import PayloadCompression
+
+# Cabecera PNG: filetype la reconoce como image/png.
+PNG_HEADER = b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR"
+
+
+def _text(size: int) -> bytes:
+    line = b"2026-10-19 12:00:00 INFO evento procesado sin errores\n"
+    return (line * (size // len(line) + 1))[:size]
+
+
+class AsyncDocuments:
+    """API asíncrona de Pyrogram sobre los documentos guardados por el cliente falso."""
+
+    def __init__(self, client: FakeTelegramClient, manifest):
+        self.loop = asyncio.new_event_loop()
+        self.documents = {}
+        for part in manifest.parts:
+            message = client.get_messages(part.chat_id, part.message_id)
+            self.documents[part.message_id] = client._files[message.document.file_id].data
+
+    async def get_messages(self, chat_id, ids):
+        return [SimpleNamespace(id=i, empty=False, document=True) for i in ids]
+
+    async def stream_media(self, message, limit=0, offset=0):
+        data = self.documents[message.id]
+        for chunk_idx in range(offset, offset + limit):
+            start = chunk_idx * TG_CHUNK_SIZE
+            if start >= len(data):
+                return
+            yield data[start : start + TG_CHUNK_SIZE]
+
+
+class TestFrameSpans(unittest.TestCase):
+    def test_range_maps_to_the_frames_that_contain_it(self):
+        frames = [10, 20, 30, 40]  # Tamaños comprimidos de frames de 100 bytes
+        self.assertEqual(list(frame_spans(frames, 0, 100, 100)), [(0, 0, 10)])
+        self.assertEqual(
+            list(frame_spans(frames, 150, 250, 100)), [(100, 10, 30), (200, 30, 60)]
+        )
+        self.assertEqual(list(frame_spans(frames, 399, 400, 100)), [(300, 60, 100)])
+
+    def test_compressed_mimetypes(self):
+        self.assertTrue(is_compressed_mimetype("image/jpeg"))
+        self.assertTrue(is_compressed_mimetype("application/zip"))
+        self.assertFalse(is_compressed_mimetype("image/bmp"))
+        self.assertFalse(is_compressed_mimetype("application/octet-stream"))
+
+
+class TestPayloadCompression(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        console.quiet = True
+
+    def tearDown(self):
+        console.quiet = False
+        self.tmp.cleanup()
+
+    def _latest_manifest(self, pattern: str):
+        snapshots = sorted(self.root.glob(pattern), key=lambda p: p.stat().st_mtime_ns)
+        return SnapshotService.read_snapshot(snapshots[-1])
+
+    def test_compressed_file_uploads_less_and_restores(self):
+        data = _text(250_000)
+        path = self.root / "registro.log"
+        path.write_bytes(data)
+        client = FakeTelegramClient(keep_data=True)
+
+        with FakeUploadEnvironment(
+            self.root / "work", client, tg_max_size_normal=102_400, payload_compression="zstd"
+        ) as env:
+            self.assertEqual(env.send([path]), 1)
+            job = Job.get()
+            self.assertEqual(job.config.compression, PayloadCompression.ZSTD)
+            payloads = list(Payload.select().order_by(Payload.sequence_index))
+            self.assertEqual(len(payloads), 3)
+            self.assertTrue(all(p.packed_size and p.packed_frames for p in payloads))
+
+        self.assertLess(client.stats.bytes_uploaded, len(data) // 10)
+
+        manifest = self._latest_manifest("registro.log*.json.*")
+        self.assertEqual(manifest.compression, PayloadCompression.ZSTD)
+        self.assertTrue(all(p.part_size > p.stored_size for p in manifest.parts))
+
+        restore = RestoreService(AsyncDocuments(client, manifest))  # type: ignore
+        target = restore.restore_source(manifest, self.root / "out")
+        self.assertEqual(target.read_bytes(), data)
+        self.assertFalse(list((self.root / "out").glob("*.zst")))
+
+    def test_compressed_pieces_are_spooled_outside_the_system_temp(self):
+        path = self.root / "registro.log"
+        path.write_bytes(_text(250_000))
+        spool = self.root / "spool"
+
+        with mock.patch.object(
+            compression.tempfile, "TemporaryFile", wraps=tempfile.TemporaryFile
+        ) as temporary:
+            with FakeUploadEnvironment(
+                self.root / "work",
+                FakeTelegramClient(),
+                tg_max_size_normal=102_400,
+                payload_compression="zstd",
+                compression_spool_dir=str(spool),
+            ) as env:
+                self.assertEqual(env.send([path]), 1)
+
+        self.assertEqual(temporary.call_count, 3)
+        self.assertTrue(all(c.kwargs["dir"] == spool for c in temporary.call_args_list))
+
+    def test_folder_member_restores_from_compressed_volumes(self):
+        folder = self.root / "logs"
+        folder.mkdir()
+        files = {"a.log": _text(180_000), "b.log": _text(5_000), "c.bin": os.urandom(2_000)}
+        for name, data in files.items():
+            (folder / name).write_bytes(data)
+        client = FakeTelegramClient(keep_data=True)
+
+        with FakeUploadEnvironment(
+            self.root / "work", client, tg_max_size_normal=102_400, payload_compression="zstd"
+        ) as env:
+            self.assertEqual(env.backup([folder]), 1)
+            self.assertEqual(Job.get().config.compression, PayloadCompression.ZSTD)
+
+        manifest = self._latest_manifest("logs*.json.*")
+        restore = RestoreService(client)  # type: ignore
+        for name, data in files.items():
+            with self.subTest(name=name):
+                target = restore.restore_member(manifest, f"logs/{name}", self.root / "m")
+                self.assertEqual(target.read_bytes(), data)
+
+    def test_already_compressed_source_is_uploaded_as_is(self):
+        path = self.root / "foto.png"
+        path.write_bytes(PNG_HEADER + os.urandom(50_000))
+        client = FakeTelegramClient()
+
+        with FakeUploadEnvironment(
+            self.root / "work", client, payload_compression="zstd"
+        ) as env:
+            self.assertEqual(env.send([path]), 1)
+            self.assertEqual(Job.get().config.compression, PayloadCompression.NONE)
+            self.assertIsNone(Payload.get().packed_size)
+
+        self.assertEqual(client.stats.bytes_uploaded, path.stat().st_size)
+
+
+if __name__ == "__main__":
+    unittest.main()
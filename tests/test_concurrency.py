@@ -0,0 +1,116 @@
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from totelegram.concurrency import LeaseKeeper, LeaseManager
+from totelegram.database import DatabaseSession
+from totelegram.models import Claim, ResourceType
+
+
+class TestLeaseRegistry(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.session = DatabaseSession(Path(self.tmp.name) / "db.sqlite")
+        self.db = self.session.start()
+        self.manager = LeaseManager(self.db, "nodo-a", heartbeat_interval=3600)
+
+    def tearDown(self):
+        self.manager.stop()
+        self.session.close()
+        self.tmp.cleanup()
+
+    def expire(self, resource_id: str):
+        Claim.update(expires_at=datetime.now() - timedelta(minutes=1)).where(
+            Claim.resource_id == resource_id
+        ).execute()
+
+    def test_one_heartbeat_thread_renews_every_held_lease(self):
+        for resource_id in ("account:1", "job:1", "job:2"):
+            self.assertTrue(self.manager.try_acquire(resource_id, ResourceType.JOB))
+            self.expire(resource_id)
+
+        with LeaseKeeper(self.manager, "account:1"), LeaseKeeper(
+            self.manager, "job:1"
+        ), LeaseKeeper(self.manager, "job:2"):
+            heartbeats = [t for t in threading.enumerate() if t.name == "lease-heartbeat"]
+            self.assertEqual(len(heartbeats), 1)
+
+            self.assertEqual(self.manager.renew_held(), [])
+            now = datetime.now()
+            self.assertTrue(all(c.expires_at > now for c in Claim.select()))
+
+        self.assertEqual(self.manager.held(), [])
+        heartbeats[0].join(2)
+        self.assertFalse(heartbeats[0].is_alive())
+
+    def test_stolen_lease_fires_its_callback_and_leaves_the_registry(self):
+        other = LeaseManager(self.db, "nodo-b")
+        self.assertTrue(self.manager.try_acquire("job:1", ResourceType.JOB))
+        self.assertTrue(self.manager.try_acquire("account:1", ResourceType.ACCOUNT))
+
+        lost = []
+        with LeaseKeeper(self.manager, "job:1", on_lost=lost.append) as keeper, \
+             LeaseKeeper(self.manager, "account:1"):
+            self.expire("job:1")
+            self.assertTrue(other.try_acquire("job:1", ResourceType.JOB))
+
+            self.assertEqual(self.manager.renew_held(), ["job:1"])
+            self.assertEqual(lost, ["job:1"])
+            self.assertTrue(keeper.lost.is_set())
+            self.assertEqual(self.manager.held(), ["account:1"])
+
+    def test_expired_claims_of_dead_nodes_are_collected(self):
+        dead = LeaseManager(self.db, "nodo-muerto")
+        self.assertTrue(dead.try_acquire("job:9", ResourceType.JOB))
+        self.expire("job:9")
+        self.assertTrue(self.manager.try_acquire("job:1", ResourceType.JOB))
+
+        with LeaseKeeper(self.manager, "job:1"):
+            self.manager.renew_held()
+
+        self.assertEqual([c.resource_id for c in Claim.select()], ["job:1"])
+
+    def test_released_lease_is_not_reported_as_lost(self):
+        self.assertTrue(self.manager.try_acquire("job:1", ResourceType.JOB))
+        lost = []
+        with LeaseKeeper(self.manager, "job:1", on_lost=lost.append):
+            self.manager.release("job:1")
+            self.assertEqual(self.manager.renew_held(), [])
+        self.assertEqual(lost, [])
+
+    def test_background_heartbeat_renews_on_its_interval(self):
+        manager = LeaseManager(self.db, "nodo-c", heartbeat_interval=0.05)
+        self.assertTrue(manager.try_acquire("job:3", ResourceType.JOB))
+        self.expire("job:3")
+        try:
+            with LeaseKeeper(manager, "job:3"):
+                deadline = time.monotonic() + 5
+                while Claim.get_by_id("job:3").expires_at < datetime.now():
+                    self.assertLess(time.monotonic(), deadline)
+                    time.sleep(0.02)
+        finally:
+            manager.stop()
+
+    def test_repeated_holds_do_not_postpone_renewal(self):
+        manager = LeaseManager(self.db, "nodo-d", heartbeat_interval=0.2)
+        self.assertTrue(manager.try_acquire("job:4", ResourceType.JOB))
+        self.expire("job:4")
+        try:
+            with LeaseKeeper(manager, "job:4"):
+                # Cada hold despierta al heartbeat antes de que venza su intervalo.
+                deadline = time.monotonic() + 5
+                i = 0
+                while Claim.get_by_id("job:4").expires_at < datetime.now():
+                    self.assertLess(time.monotonic(), deadline)
+                    with LeaseKeeper(manager, f"account:{i}"):
+                        time.sleep(0.05)
+                    i += 1
+        finally:
+            manager.stop()
+
+
+if __name__ == "__main__":
+    unittest.main()
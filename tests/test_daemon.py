@@ -0,0 +1,81 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from rich.text import Text
+
+from totelegram.cli.ui import DisplayQueue, console
+from totelegram.daemon import queue_summary, submit_paths
+from totelegram.database import DatabaseSession
+from totelegram.models import QueueEntry
+from totelegram.schemas import QueueMode, QueueStatus
+
+
+class TestUploadQueue(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.db_manager = DatabaseSession(":memory:")
+        self.db = self.db_manager.start()
+
+    def tearDown(self):
+        self.db_manager.close()
+        self.tmp.cleanup()
+
+    def _paths(self, *names):
+        paths = []
+        for name in names:
+            path = self.root / name
+            path.write_text(name)
+            paths.append(path)
+        return paths
+
+    def test_claim_is_fifo_per_profile(self):
+        a, b = self._paths("a.txt", "b.txt")
+        submit_paths(self.db, "main", [a, b], QueueMode.SEND)
+        submit_paths(self.db, "other", [a], QueueMode.BACKUP)
+
+        first = QueueEntry.claim_next("main")
+        second = QueueEntry.claim_next("main")
+        self.assertEqual(first.path, a.resolve())
+        self.assertEqual(second.path, b.resolve())
+        self.assertEqual(first.status, QueueStatus.RUNNING)
+        self.assertEqual(first.attempts, 1)
+        self.assertIsNone(QueueEntry.claim_next("main"))
+
+        other = QueueEntry.claim_next("other")
+        self.assertEqual(other.mode, QueueMode.BACKUP)
+
+    def test_requeue_and_finish(self):
+        (a,) = self._paths("a.txt")
+        submit_paths(self.db, "main", [a], QueueMode.SEND)
+
+        QueueEntry.claim_next("main")
+        self.assertEqual(QueueEntry.requeue_running("main"), 1)
+
+        entry = QueueEntry.claim_next("main")
+        self.assertEqual(entry.attempts, 2)
+        entry.mark_failed("boom")
+
+        counts, recent = queue_summary(self.db, "main")
+        self.assertEqual(counts, {QueueStatus.FAILED: 1})
+        self.assertEqual(recent[0].error, "boom")
+        self.assertIsNone(QueueEntry.claim_next("main"))
+
+    def test_status_render_uses_styled_labels(self):
+        a, b = self._paths("a.txt", "b.txt")
+        submit_paths(self.db, "main", [a, b], QueueMode.SEND)
+        QueueEntry.claim_next("main")
+
+        counts, recent = queue_summary(self.db, "main")
+        with console.capture() as capture:
+            DisplayQueue.render_queue("main", counts, recent)
+        output = Text.from_ansi(capture.get()).plain
+
+        self.assertIn("PENDIENTE: 1", output)
+        self.assertIn("EN CURSO: 1", output)
+        self.assertNotIn("RUNNING", output)
+
+
+if __name__ == "__main__":
+    unittest.main()
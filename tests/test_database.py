@@ -0,0 +1,108 @@
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+import peewee
+from playhouse.pool import PooledSqliteDatabase
+
+from totelegram.concurrency import LeaseManager
+from totelegram.database import DatabaseSession, db_connection, db_read, db_transaction
+from totelegram.models import Claim, ResourceType, TelegramUser
+
+
+def run_in_thread(target, *args):
+    result = {}
+
+    def wrapper():
+        try:
+            result["value"] = target(*args)
+        except BaseException as e:
+            result["error"] = e
+
+    thread = threading.Thread(target=wrapper)
+    thread.start()
+    thread.join(10)
+    if "error" in result:
+        raise result["error"]
+    return result.get("value")
+
+
+class TestConnectionManagement(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.session = DatabaseSession(Path(self.tmp.name) / "db.sqlite")
+        self.db = self.session.start()
+
+    def tearDown(self):
+        self.session.close()
+        self.tmp.cleanup()
+
+    def test_file_databases_are_pooled_and_threads_return_connections(self):
+        self.assertIsInstance(self.db, PooledSqliteDatabase)
+
+        def count_users():
+            with db_connection(self.db):
+                return TelegramUser.select().count()
+
+        for _ in range(5):
+            self.assertEqual(run_in_thread(count_users), 0)
+
+        # Solo la conexión del hilo principal sigue en uso; las demás volvieron al pool.
+        self.assertEqual(len(self.db._in_use), 1)
+        self.assertEqual(len(self.db._connections), 1)
+
+    def test_nested_db_connection_keeps_the_open_connection(self):
+        with db_connection(self.db):
+            with db_connection(self.db):
+                pass
+            self.assertFalse(self.db.is_closed())
+
+    def test_reads_do_not_wait_for_the_write_lock(self):
+        writing = threading.Event()
+        release = threading.Event()
+
+        def long_write():
+            with db_connection(self.db):
+                with db_transaction(self.db):
+                    TelegramUser.create(id=1, first_name="escritor")
+                    writing.set()
+                    release.wait(10)
+
+        writer = threading.Thread(target=long_write)
+        writer.start()
+        self.assertTrue(writing.wait(5))
+
+        def read():
+            with db_read(self.db):
+                return TelegramUser.select().count()
+
+        try:
+            # Lee la foto confirmada (sin la fila en curso) sin esperar al escritor.
+            self.assertEqual(run_in_thread(read), 0)
+            self.assertTrue(writer.is_alive())
+        finally:
+            release.set()
+            writer.join()
+
+        self.assertEqual(run_in_thread(read), 1)
+
+    def test_lease_renewal_from_a_background_thread(self):
+        manager = LeaseManager(self.db, "node-a")
+        self.assertTrue(manager.try_acquire("account:1", ResourceType.ACCOUNT))
+        before = Claim.get(Claim.resource_id == "account:1").expires_at
+
+        self.assertTrue(run_in_thread(manager.renew, "account:1", 10))
+        self.assertGreater(Claim.get(Claim.resource_id == "account:1").expires_at, before)
+        self.assertEqual(len(self.db._in_use), 1)
+
+
+class TestMemoryDatabase(unittest.TestCase):
+    def test_memory_databases_use_a_single_connection(self):
+        with DatabaseSession(":memory:") as db:
+            self.assertNotIsInstance(db, PooledSqliteDatabase)
+            self.assertIsInstance(db, peewee.SqliteDatabase)
+
+
+if __name__ == "__main__":
+    unittest.main()
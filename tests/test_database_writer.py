@@ -0,0 +1,108 @@
+import os
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+import peewee
+
+from benchmarks.fake_telegram import FakeTelegramClient, FakeUploadEnvironment
+from totelegram.cli.ui import console
+from totelegram.database import (
+    DatabaseSession,
+    SyncWriter,
+    WriteBehindWriter,
+    create_writer,
+)
+from totelegram.models import Payload, RemotePayload, TelegramUser
+
+
+class TestWriteBehindWriter(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.session = DatabaseSession(Path(self.tmp.name) / "db.sqlite")
+        self.db = self.session.start()
+        self.writer = WriteBehindWriter(self.db, max_batch=500, max_delay=0.2)
+
+    def tearDown(self):
+        self.writer.close()
+        self.session.close()
+        self.tmp.cleanup()
+
+    def test_small_writes_are_grouped_and_flush_exposes_them(self):
+        futures = [
+            self.writer.submit(lambda i=i: TelegramUser.create(id=i, first_name=f"u{i}").id)
+            for i in range(1, 201)
+        ]
+        self.writer.flush()
+
+        self.assertEqual(TelegramUser.select().count(), 200)
+        self.assertEqual([f.result() for f in futures], list(range(1, 201)))
+        self.assertLess(self.writer.batches, 10)
+
+    def test_failed_write_does_not_abort_its_batch(self):
+        TelegramUser.create(id=1, first_name="existente")
+
+        duplicate = self.writer.submit(lambda: TelegramUser.create(id=1, first_name="dup"))
+        ok = self.writer.submit(lambda: TelegramUser.create(id=2, first_name="nuevo"))
+
+        with self.assertRaises(peewee.IntegrityError):
+            self.writer.flush()
+        self.assertIsInstance(duplicate.exception(), peewee.IntegrityError)
+        self.assertEqual(ok.result().id, 2)
+        self.assertEqual(TelegramUser.select().count(), 2)
+
+        # El error ya se entregó: la siguiente barrera no lo repite.
+        self.writer.flush()
+
+    def test_callbacks_run_after_commit(self):
+        seen = []
+        committed = threading.Event()
+
+        def check(_):
+            # Otra conexión (este hilo) ya ve la fila: el commit ocurrió antes.
+            seen.append(self.writer.db.execute_sql(
+                "SELECT COUNT(*) FROM telegramuser"
+            ).fetchone()[0])
+            committed.set()
+
+        self.writer.submit(lambda: TelegramUser.create(id=5, first_name="x")).add_done_callback(check)
+        self.assertTrue(committed.wait(5))
+        self.assertEqual(seen, [1])
+
+    def test_memory_databases_write_synchronously(self):
+        with DatabaseSession(":memory:") as db:
+            self.assertIsInstance(create_writer(db, write_behind=True), SyncWriter)
+
+
+class TestWriteBehindUpload(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        console.quiet = True
+
+    def tearDown(self):
+        console.quiet = False
+        self.tmp.cleanup()
+
+    def test_send_with_write_behind_registers_every_piece(self):
+        src = self.root / "src"
+        src.mkdir()
+        for i in range(3):
+            (src / f"f{i}.bin").write_bytes(os.urandom(250_000))
+
+        client = FakeTelegramClient()
+        with FakeUploadEnvironment(
+            self.root / "work", client, tg_max_size_normal=102_400, db_write_behind=True
+        ) as env:
+            assert env.u_ctx is not None
+            self.assertIsInstance(env.u_ctx.writer, WriteBehindWriter)
+            self.assertEqual(env.send([src]), 3)
+            self.assertEqual(RemotePayload.select().count(), 9)
+            self.assertEqual(Payload.select().where(Payload.md5sum.is_null()).count(), 0)
+
+        self.assertEqual(len(client.messages_in(client.default_chat.id)), 9)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,157 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from benchmarks.fake_telegram import FakeNetwork, FakeTelegramClient, FakeUploadEnvironment
+from totelegram.cli.ui import console
+from totelegram.models import Job, Payload, RemotePayload
+from totelegram.packaging import VolumePlanner
+from totelegram.schemas import JobStatus
+from totelegram.uploader import UploadService
+from totelegram.utils import has_snapshot
+
+
+class TestFakeTelegramEndToEnd(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        console.quiet = True
+
+    def tearDown(self):
+        console.quiet = False
+        self.tmp.cleanup()
+
+    def _files(self, folder: str, count: int, size: int):
+        base = self.root / folder
+        base.mkdir()
+        for i in range(count):
+            (base / f"f{i}.bin").write_bytes(os.urandom(size))
+        return base
+
+    def test_send_splits_and_snapshots(self):
+        src = self._files("src", 2, 300_000)
+        client = FakeTelegramClient(FakeNetwork(flood_every=4, flood_seconds=0))
+
+        with FakeUploadEnvironment(self.root / "work", client, tg_max_size_normal=102_400) as env:
+            self.assertEqual(env.send([src]), 2)
+            self.assertEqual(Job.select().where(Job.status == JobStatus.UPLOADED).count(), 2)
+            self.assertEqual(RemotePayload.select().count(), 6)
+
+        self.assertEqual(len(client.messages_in(client.default_chat.id)), 6)
+        self.assertGreater(client.stats.floods, 0)
+        self.assertTrue(all(has_snapshot(p) for p in src.glob("*.bin")))
+
+    def test_backup_then_skip_snapshotted(self):
+        src = self._files("folder", 4, 50_000)
+        client = FakeTelegramClient()
+
+        with FakeUploadEnvironment(self.root / "work", client, tg_max_size_normal=102_400) as env:
+            self.assertEqual(env.backup([src]), 1)
+            sent = len(client.messages_in(client.default_chat.id))
+            self.assertTrue(has_snapshot(src))
+
+            # Con snapshot, el inventario la descarta sin tocar Telegram.
+            self.assertEqual(env.backup([src]), 0)
+
+        self.assertEqual(sent, 2)
+        self.assertEqual(len(client.messages_in(client.default_chat.id)), 2)
+
+    def test_volumes_planned_after_an_empty_claim_are_uploaded(self):
+        src = self._files("folder", 4, 50_000)
+        client = FakeTelegramClient()
+
+        claim = UploadService._claim_next_payload
+        calls = []
+
+        def claim_after_race(service, job):
+            # La primera consulta no ve ningún volumen todavía confirmado.
+            calls.append(job.id)
+            return None if len(calls) == 1 else claim(service, job)
+
+        wait = VolumePlanner.wait_for_progress
+
+        def wait_after_planning(planner, timeout=5.0):
+            # El planificador confirma el resto y termina antes de avisar.
+            planner.join()
+            return wait(planner, timeout)
+
+        with FakeUploadEnvironment(self.root / "work", client, tg_max_size_normal=102_400) as env:
+            with mock.patch.object(
+                UploadService, "_claim_next_payload", autospec=True, side_effect=claim_after_race
+            ), mock.patch.object(
+                VolumePlanner, "wait_for_progress", autospec=True, side_effect=wait_after_planning
+            ):
+                self.assertEqual(env.backup([src]), 1)
+
+            job = Job.get()
+            self.assertEqual(job.status, JobStatus.UPLOADED)
+            self.assertEqual(Payload.total_pending_for_job(job), 0)
+
+        self.assertEqual(len(client.messages_in(client.default_chat.id)), 2)
+
+    def test_failed_upload_stops_the_planner(self):
+        src = self._files("folder", 8, 50_000)
+        client = FakeTelegramClient()
+        stop = VolumePlanner.stop
+        planners = []
+
+        def record_stop(planner):
+            planners.append(planner)
+            stop(planner)
+
+        with FakeUploadEnvironment(self.root / "work", client, tg_max_size_normal=102_400) as env:
+            with mock.patch.object(
+                UploadService, "_drain_payloads", side_effect=RuntimeError("red caída")
+            ), mock.patch.object(
+                VolumePlanner, "stop", autospec=True, side_effect=record_stop
+            ), self.assertRaises(RuntimeError):
+                env.backup([src])
+
+            self.assertEqual(len(planners), 1)
+            self.assertFalse(planners[0].is_alive())
+
+    def test_identical_pieces_are_forwarded_instead_of_uploaded(self):
+        head = os.urandom(1_048_576)
+        src = self.root / "src"
+        src.mkdir()
+        (src / "app.log").write_bytes(head + os.urandom(200_000))
+        # El mismo log con más líneas al final: comparte la primera pieza.
+        (src / "app.1.log").write_bytes(head + os.urandom(400_000))
+        client = FakeTelegramClient()
+
+        with FakeUploadEnvironment(self.root / "work", client, tg_max_size_normal=1_048_576) as env:
+            self.assertEqual(env.send([src / "app.log"]), 1)
+            uploaded = client.stats.bytes_uploaded
+
+            self.assertEqual(env.send([src / "app.1.log"]), 1)
+            self.assertEqual(client.stats.bytes_uploaded - uploaded, 400_000)
+            self.assertEqual(Job.select().where(Job.status == JobStatus.UPLOADED).count(), 2)
+
+        messages = client.messages_in(client.default_chat.id)
+        self.assertEqual(len(messages), 4)
+        self.assertEqual(messages[0].document.file_id, messages[2].document.file_id)
+
+    def test_same_size_pieces_with_another_head_are_not_hashed(self):
+        src = self.root / "src"
+        src.mkdir()
+        (src / "a.bin").write_bytes(os.urandom(1_500_000))
+        (src / "b.bin").write_bytes(os.urandom(1_500_000))
+        client = FakeTelegramClient()
+
+        with FakeUploadEnvironment(self.root / "work", client) as env:
+            self.assertEqual(env.send([src / "a.bin"]), 1)
+
+            # Mismo tamaño que una pieza ya subida, pero otro primer MiB.
+            hash_payload = UploadService._hash_payload
+            with mock.patch.object(
+                UploadService, "_hash_payload", autospec=True, side_effect=hash_payload
+            ) as full_hash:
+                self.assertEqual(env.send([src / "b.bin"]), 1)
+            full_hash.assert_not_called()
+            self.assertEqual(client.stats.bytes_uploaded, 3_000_000)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,162 @@
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from benchmarks.fake_telegram import FakeNetwork, FakeTelegramClient, FakeUploadEnvironment
+from totelegram.cli.logic import get_or_create_send_job, prepare_upload_context
+from totelegram.cli.ui import console
+from totelegram.database import db_connection
+from totelegram.fanout import HelperPool, validate_helper_profiles
+from totelegram.identity import SettingsManager
+from totelegram.models import Job, RemotePayload
+from totelegram.schemas import JobStatus
+from totelegram.uploader import UploadService
+
+
+class TestFanOut(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.manager = SettingsManager(Path(self.test_dir))
+        self.manager.profiles_dir.mkdir(parents=True, exist_ok=True)
+        self._profile("main", 10)
+        self._profile("alt", 20)
+        self._profile("alt_same_account", 20)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def _profile(self, name: str, account_id: int, extra: str = ""):
+        env = self.manager.get_settings_path(name)
+        env.write_text(
+            f"API_ID=1\nAPI_HASH=x\nPROFILE_NAME={name}\nTELEGRAM_ACCOUNT_ID={account_id}\n"
+            + extra
+        )
+
+    def test_validate_helpers(self):
+        self.assertEqual(
+            validate_helper_profiles(self.manager, "main", ["alt", "alt"]), ["alt"]
+        )
+
+        with self.assertRaises(ValueError):
+            validate_helper_profiles(self.manager, "main", ["main"])
+        with self.assertRaises(ValueError):
+            validate_helper_profiles(self.manager, "main", ["alt", "alt_same_account"])
+        with self.assertRaises(IOError):
+            validate_helper_profiles(self.manager, "main", ["missing"])
+
+    def test_helpers_must_share_the_catalog(self):
+        self._profile("remote", 30, "DATABASE_URL=postgresql://u:p@db/totelegram\n")
+        with self.assertRaises(ValueError):
+            validate_helper_profiles(self.manager, "main", ["remote"])
+
+        # Con el mismo catálogo compartido sí pueden ayudar.
+        self._profile("main", 10, "DATABASE_URL=postgresql://u:p@db/totelegram\n")
+        self.assertEqual(validate_helper_profiles(self.manager, "main", ["remote"]), ["remote"])
+        with self.assertRaises(ValueError):
+            validate_helper_profiles(self.manager, "main", ["alt"])
+
+    def test_helper_command(self):
+        pool = HelperPool(["alt"], debug=True)
+        cmd = pool._command("alt", 7)
+        self.assertEqual(cmd[1:], ["-m", "totelegram.cli", "--use", "alt", "--debug", "assist", "7"])
+
+    def test_helper_stderr_goes_to_the_log_dir(self):
+        log_dir = Path(self.test_dir) / "logs"
+        pool = HelperPool(["alt"], log_dir=log_dir)
+        script = "import sys; sys.stderr.write('fallo al arrancar'); sys.exit(3)"
+        with mock.patch.object(pool, "_command", return_value=[sys.executable, "-c", script]):
+            pool.start(7)
+        self.assertEqual(pool.wait(timeout=30), {"alt": 3})
+
+        (log,) = log_dir.glob("*_assist_alt_job7.stderr.log")
+        self.assertEqual(log.read_text(), "fallo al arrancar")
+
+
+class ThreadHelpers:
+    """Sustituye a `HelperPool`: el ayudante corre en un hilo del mismo proceso."""
+
+    def __init__(self, helper: UploadService, job):
+        self.thread = threading.Thread(target=self._assist, args=(helper, job))
+        self.thread.start()
+
+    @staticmethod
+    def _assist(helper: UploadService, job):
+        with db_connection(helper.db):
+            helper.assist_job(job, plan_timeout=5)
+
+    def wait(self):
+        self.thread.join()
+
+    def terminate(self):
+        self.thread.join()
+
+
+class TestFanOutDrain(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        console.quiet = True
+
+    def tearDown(self):
+        console.quiet = False
+        self.tmp.cleanup()
+
+    def test_two_accounts_upload_each_payload_once(self):
+        path = self.root / "video.bin"
+        path.write_bytes(os.urandom(800_000))
+        network = FakeNetwork(latency=0.01)
+        main = FakeTelegramClient(network, name="main", user_id=1001)
+        alt = FakeTelegramClient(network, name="alt", user_id=2002)
+
+        with FakeUploadEnvironment(
+            self.root / "work", main, profile_name="main", tg_max_size_normal=102_400
+        ) as env:
+            u_ctx = env.u_ctx
+            assert u_ctx is not None
+            alt_settings = u_ctx.settings.model_copy(
+                update={"profile_name": "alt", "telegram_account_id": alt.me.id}
+            )
+            alt_ctx = prepare_upload_context(u_ctx.state, alt, u_ctx.db, alt_settings)  # type: ignore
+            helper = UploadService(alt_ctx)
+
+            job = get_or_create_send_job([path], u_ctx, force=False, wait_if_busy=True)
+            assert job is not None
+            uploader = UploadService(u_ctx, helper_profiles=["alt"])
+            try:
+                with mock.patch.object(
+                    UploadService, "_start_helpers", lambda _, job: ThreadHelpers(helper, job)
+                ):
+                    uploader.process_job(job, job.source.path, is_last_job=True)
+            finally:
+                alt_ctx.writer.close()
+                alt_ctx.lease_manager.stop()
+
+            job = Job.get_by_id(job.id)
+            self.assertEqual(job.status, JobStatus.UPLOADED)
+            payloads = list(job.payloads)
+            self.assertEqual(len(payloads), 8)
+
+            clients = {main.me.id: main, alt.me.id: alt}
+            for payload in payloads:
+                with self.subTest(piece=payload.sequence_index):
+                    (remote,) = RemotePayload.select().where(RemotePayload.payload == payload)
+                    client = clients[remote.owner.id]
+                    (message,) = client.get_messages(remote.chat.id, [remote.message_id])
+                    self.assertEqual(message.document.file_name, payload.filename)
+
+            uploaded = sum(
+                len(c.messages_in(c.default_chat.id)) for c in clients.values()
+            )
+            self.assertEqual(uploaded, len(payloads))
+            # Con latencia, ambas cuentas llegan a subir piezas.
+            for client in clients.values():
+                self.assertGreater(len(client.messages_in(client.default_chat.id)), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
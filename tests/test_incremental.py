@@ -0,0 +1,116 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from benchmarks.fake_telegram import FakeTelegramClient, FakeUploadEnvironment
+from totelegram.cli.ui import console
+from totelegram.incremental import find_base_job
+from totelegram.models import Job, Source
+from totelegram.packaging import SnapshotService
+from totelegram.restore import RestoreService
+
+
+class TestIncrementalBackup(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        console.quiet = True
+
+        self.folder = self.root / "fotos"
+        (self.folder / "sub").mkdir(parents=True)
+        self.files = {
+            "a.bin": os.urandom(300_000),
+            "b.bin": os.urandom(300_000),
+            "sub/c.bin": os.urandom(50_000),
+            "vacio.txt": b"",
+        }
+        for name, data in self.files.items():
+            (self.folder / name).write_bytes(data)
+
+    def tearDown(self):
+        console.quiet = False
+        self.tmp.cleanup()
+
+    def _change(self, name: str, data: bytes):
+        path = self.folder / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+        # tartape detecta cambios por tamaño y mtime (en segundos).
+        mtime = path.stat().st_mtime + 10
+        os.utime(path, (mtime, mtime))
+        self.files[name] = data
+
+    def _latest_manifest(self):
+        snapshots = sorted(self.root.glob("fotos*.json.*"), key=lambda p: p.stat().st_mtime_ns)
+        return SnapshotService.read_snapshot(snapshots[-1])
+
+    def test_changed_folder_uploads_only_the_delta_and_restores_the_tree(self):
+        client = FakeTelegramClient(keep_data=True)
+
+        with FakeUploadEnvironment(
+            self.root / "work", client, tg_max_size_normal=102_400, incremental_backups=True
+        ) as env:
+            self.assertEqual(env.backup([self.folder]), 1)
+            full = client.stats.bytes_uploaded
+
+            self._change("b.bin", os.urandom(300_000))
+            self._change("nuevo.bin", os.urandom(20_000))
+            self.assertEqual(env.backup([self.folder]), 1)
+            delta = client.stats.bytes_uploaded - full
+
+            # Segundo incremental: la cadena referencia a las dos cintas anteriores.
+            self._change("a.bin", os.urandom(1_000))
+            self.assertEqual(env.backup([self.folder]), 1)
+            last_delta = client.stats.bytes_uploaded - full - delta
+
+            # Sin cambios no hay nada que subir.
+            self.assertEqual(env.backup([self.folder]), 0)
+
+            jobs = list(Job.select().order_by(Job.id))
+            self.assertEqual(
+                [j.config.base_job_id for j in jobs], [None, jobs[0].id, jobs[1].id]
+            )
+            self.assertEqual(jobs[2].lineage(), [j.id for j in reversed(jobs)])
+            first_fingerprint = jobs[1].source.md5sum
+
+        # Solo b.bin y nuevo.bin (con cabeceras, relleno y pie TAR).
+        self.assertGreater(full, 650_000)
+        self.assertTrue(320_000 <= delta < 330_000, delta)
+        self.assertTrue(last_delta < 4_096, last_delta)
+
+        manifest = self._latest_manifest()
+        self.assertEqual(manifest.base_fingerprint, first_fingerprint)
+        members = {m.relative_path: m for m in manifest.source.inventory or []}
+        self.assertEqual(set(members), {f"fotos/{name}" for name in self.files})
+        self.assertTrue(all(f.message_id is None for f in members["fotos/a.bin"].fragments))
+        for name in ("b.bin", "sub/c.bin", "nuevo.bin"):
+            self.assertTrue(all(f.message_id for f in members[f"fotos/{name}"].fragments))
+
+        output = self.root / "restaurado"
+        target = RestoreService(client).restore_source(manifest, output)  # type: ignore
+        self.assertEqual(target, output / "fotos")
+        for name, data in self.files.items():
+            with self.subTest(name=name):
+                self.assertEqual((target / name).read_bytes(), data)
+
+    def test_deleted_base_forces_a_full_tape(self):
+        client = FakeTelegramClient()
+
+        with FakeUploadEnvironment(
+            self.root / "work", client, tg_max_size_normal=102_400, incremental_backups=True
+        ) as env:
+            self.assertEqual(env.backup([self.folder]), 1)
+            base = Job.get()
+            self._change("b.bin", os.urandom(300_000))
+
+            base.mark_deleted()
+            self.assertEqual(env.backup([self.folder]), 1)
+
+            job = Job.select().order_by(Job.id.desc()).get()
+            self.assertIsNone(job.config.base_job_id)
+            self.assertIsNone(find_base_job(Source.get_by_id(job.source.id), job.chat))
+
+
+if __name__ == "__main__":
+    unittest.main()
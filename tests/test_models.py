@@ -1,14 +1,17 @@
 import unittest
 
 import peewee
+from tartape.schemas import ByteWindow, EntryMetadata, EntryState, ManifestEntry
 
 from totelegram.database import DatabaseSession  # type: ignore
 from totelegram.models import (
     Job,
+    Payload,
     Source,
+    TapeMember,
     TelegramChat,
 )
-from totelegram.schemas import Strategy
+from totelegram.schemas import SourceType, Strategy
 
 
 class TestModelsArchitecture(unittest.TestCase):
@@ -90,6 +93,71 @@ class TestModelsArchitecture(unittest.TestCase):
         job_from_db = Job.get_by_id(job.id)
         self.assertEqual(job_from_db.config.tg_max_size, 100)
 
+    def _entry(self, path, state, local_start, local_end, is_dir=False):
+        info = EntryMetadata(
+            arc_path=path,
+            rel_path=path,
+            size=0 if is_dir else 3000,
+            mtime=0,
+            mode=0o644,
+            uid=0,
+            gid=0,
+            uname="",
+            gname="",
+            is_dir=is_dir,
+            md5sum=None if is_dir else f"md5-{path}",
+        )
+        window = ByteWindow(start=local_start, end=local_end)
+        return ManifestEntry(
+            info=info, state=state, global_window=window, local_window=window
+        )
+
+    def test_register_manifest_entries_single_pass(self):
+        """
+        Un archivo partido entre dos volúmenes es un solo TapeMember con un GPS
+        por volumen. Los directorios no se registran.
+        """
+        source = Source.create(
+            path_str="carpeta",
+            md5sum="tape_hash",
+            size=8192,
+            mtime=1.0,
+            mimetype="application/x-tar",
+            type=SourceType.FOLDER,
+        )
+        job = Job.formalize_intent(source, self.chat, is_premium=False, tg_limit=4096)
+        vol_0, vol_1 = (
+            Payload.create(
+                job=job,
+                sequence_index=i,
+                start_offset=i * 4096,
+                end_offset=(i + 1) * 4096,
+                size=4096,
+                filename=f"carpeta.tar.{i}",
+                filename_short=f"carpeta.tar.{i}",
+            )
+            for i in range(2)
+        )
+
+        # Más archivos que un lote para cubrir el corte entre lotes
+        files = [f"dir/f{i}.bin" for i in range(7500)]
+        entries_0 = [self._entry("dir", EntryState.COMPLETE, 0, 512, is_dir=True)]
+        entries_0 += [self._entry(p, EntryState.COMPLETE, 0, 512) for p in files]
+        entries_0.append(self._entry("grande.bin", EntryState.HEAD, 512, 4096))
+        entries_1 = [self._entry("grande.bin", EntryState.TAIL, 0, 1024)]
+
+        TapeMember.register_manifest_entries(source, vol_0, iter(entries_0))
+        TapeMember.register_manifest_entries(source, vol_1, iter(entries_1))
+
+        self.assertEqual(source.members.count(), len(files) + 1)
+        self.assertEqual(vol_0.fragments.count(), len(files) + 1)
+
+        grande = source.members.where(TapeMember.relative_path == "grande.bin").get()
+        gps = {g.payload_id: g for g in grande.fragments}
+        self.assertEqual(gps[vol_0.id].state, EntryState.HEAD)
+        self.assertEqual(gps[vol_1.id].state, EntryState.TAIL)
+        self.assertEqual(gps[vol_1.id].bytes_in_volume, 1024)
+
     # def test_payload_relation_and_status(self):
     #     """Valida que los payloads se vinculen correctamente y el Job cambie de estado."""
     #     source = Source.create(
@@ -0,0 +1,160 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime
+from datetime import time as dtime
+from pathlib import Path
+from unittest import mock
+
+from benchmarks.fake_telegram import FakeTelegramClient, FakeUploadEnvironment
+from totelegram.cli.ui import UI, console
+from totelegram.identity import Settings
+from totelegram.pacing import (
+    ByteBudget,
+    CompositePolicy,
+    FixedPause,
+    PacingPolicy,
+    RandomPause,
+    TimeWindows,
+    build_policy,
+    parse_time_windows,
+)
+
+MB = 1024 * 1024
+
+
+class FakeClock:
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class TestPacing(unittest.TestCase):
+    def test_fixed_pause_counts_from_last_upload(self):
+        clock = FakeClock()
+        policy = FixedPause(60, clock)
+        self.assertEqual(policy.next_delay().delay, 0)
+
+        policy.record(MB)
+        clock.now += 20
+        self.assertAlmostEqual(policy.next_delay().delay, 40)
+        clock.now += 40
+        self.assertEqual(policy.next_delay().delay, 0)
+
+    def test_pause_does_not_carry_over_to_the_next_job(self):
+        clock = FakeClock()
+        budget = ByteBudget(MB, window=3600, clock=clock)
+        policy = CompositePolicy([FixedPause(60, clock), budget])
+
+        policy.record(MB)
+        policy.start_batch()
+        # La pausa se olvida; el presupuesto agotado sigue contando.
+        self.assertAlmostEqual(policy.next_delay().delay, 3600)
+        clock.now += 3600
+        self.assertEqual(policy.next_delay().delay, 0)
+
+    def test_budget_only_waits_when_exhausted(self):
+        clock = FakeClock()
+        budget = ByteBudget(100 * MB, window=3600, clock=clock)
+
+        budget.record(60 * MB)
+        clock.now += 600
+        self.assertEqual(budget.next_delay().delay, 0)
+
+        budget.record(50 * MB)  # 110 MB en la ventana: hay que esperar a que expire la primera.
+        decision = budget.next_delay()
+        self.assertAlmostEqual(decision.delay, 3000)
+        self.assertIn("presupuesto", decision.reason)
+
+        clock.now += 3000
+        self.assertEqual(budget.next_delay().delay, 0)
+        self.assertEqual(budget.used, 50 * MB)
+
+    def test_budget_seed_from_history(self):
+        clock = FakeClock()
+        budget = ByteBudget(10 * MB, window=60, clock=clock)
+        budget.seed([(clock.now - 120, 50 * MB), (clock.now - 30, 10 * MB)])
+        self.assertEqual(budget.used, 10 * MB)
+        self.assertAlmostEqual(budget.next_delay().delay, 30)
+
+    def test_time_windows_cross_midnight(self):
+        day = datetime(2024, 1, 1, 12, 0).timestamp()
+        clock = FakeClock(day)
+        windows = TimeWindows(parse_time_windows("22-06"), clock)
+        self.assertAlmostEqual(windows.next_delay().delay, 10 * 3600)
+
+        clock.now = datetime(2024, 1, 1, 23, 0).timestamp()
+        self.assertEqual(windows.next_delay().delay, 0)
+        clock.now = datetime(2024, 1, 2, 5, 59).timestamp()
+        self.assertEqual(windows.next_delay().delay, 0)
+
+    def test_parse_time_windows(self):
+        self.assertEqual(
+            parse_time_windows("22-06, 12:30-14"),
+            [(dtime(22), dtime(6)), (dtime(12, 30), dtime(14))],
+        )
+        with self.assertRaises(ValueError):
+            parse_time_windows("22")
+
+    def test_build_policy(self):
+        base = dict(api_id=1, api_hash="x", profile_name="t")
+
+        self.assertIs(type(build_policy(Settings(**base))), CompositePolicy)
+        self.assertEqual(build_policy(Settings(**base)).next_delay().delay, 0)
+
+        policy = build_policy(Settings(**base, upload_pause_range=[1, 3]))
+        self.assertIsInstance(policy, RandomPause)
+
+        policy = build_policy(
+            Settings(
+                **base,
+                pacing_strategy="budget",
+                pacing_budget_mb=500,
+                upload_hours="1-5",
+            )
+        )
+        self.assertIsInstance(policy, CompositePolicy)
+        self.assertEqual(policy.lookback, 3600)
+
+        with self.assertRaises(ValueError):
+            Settings(**base, pacing_strategy="turbo")
+
+    def test_base_policy_never_waits(self):
+        self.assertEqual(PacingPolicy().next_delay().delay, 0)
+
+
+class TestUploaderPacing(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        console.quiet = True
+
+    def tearDown(self):
+        console.quiet = False
+        self.tmp.cleanup()
+
+    def test_pauses_only_between_pieces_of_the_same_job(self):
+        files = []
+        for name in ("a.bin", "b.bin"):
+            path = self.root / name
+            path.write_bytes(os.urandom(250_000))  # 3 piezas de 100 KiB
+            files.append(path)
+
+        with FakeUploadEnvironment(
+            self.root / "work",
+            FakeTelegramClient(),
+            tg_max_size_normal=102_400,
+            pacing_strategy="fixed",
+            upload_pause_range=[1, 1],
+        ) as env:
+            with mock.patch.object(UI, "sleep_progress") as sleep:
+                self.assertEqual(env.send(files), 2)
+
+        # Dos pausas por archivo (entre sus 3 piezas) y ninguna entre archivos.
+        self.assertEqual(sleep.call_count, 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import pstats
+import threading
+import time
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+from typer.testing import CliRunner
+
+from totelegram.cli.__main__ import app
+from totelegram.profiling import ProfileMode, RunProfiler
+from totelegram.telemetry import get_telemetry
+
+runner = CliRunner()
+
+
+def busy_work(seconds: float) -> list:
+    data = []
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        data.append(bytes(1024))
+    return data
+
+
+class TestRunProfiler(unittest.TestCase):
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.prefix = Path(self.tmp.name) / "20260101_120000_backup"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_both_writes_pstats_collapsed_and_allocations(self):
+        profiler = RunProfiler(ProfileMode.BOTH, self.prefix, top=5)
+        profiler.start()
+        worker = threading.Thread(target=busy_work, args=(0.1,), name="volume-planner")
+        worker.start()
+        kept = busy_work(0.1)
+        worker.join()
+        written = profiler.stop()
+
+        names = sorted(p.name for p in written)
+        self.assertEqual(
+            names,
+            [
+                "20260101_120000_backup.alloc.txt",
+                "20260101_120000_backup.collapsed",
+                "20260101_120000_backup.pstats",
+            ],
+        )
+
+        stats = pstats.Stats(str(self.prefix.with_suffix(".pstats")))
+        self.assertTrue(any(func[2] == "busy_work" for func in stats.stats))  # type: ignore
+
+        lines = self.prefix.with_suffix(".collapsed").read_text(encoding="utf-8").splitlines()
+        self.assertTrue(lines)
+        for line in lines:
+            stack, count = line.rsplit(" ", 1)
+            self.assertTrue(count.isdigit())
+        # El muestreo cubre hilos que cProfile no ve.
+        self.assertTrue(any(line.startswith("volume-planner;") for line in lines))
+
+        alloc = Path(f"{self.prefix}.alloc.txt").read_text(encoding="utf-8")
+        self.assertIn("Top 5 sitios de asignación", alloc)
+        self.assertIn("test_profiling.py", alloc)
+        del kept
+
+    def test_cli_flag_writes_profile_next_to_run_log(self):
+        with patch("totelegram.utils.get_user_config_dir", return_value=Path(self.tmp.name)):
+            result = runner.invoke(app, ["--profile", "cpu", "profile", "list"])
+        # El callback apunta el log de eventos global al directorio temporal.
+        get_telemetry().close()
+
+        self.assertNotIn("Traceback", result.output)
+        logs = Path(self.tmp.name) / "logs"
+        run_log = next(logs.glob("*_profile.log"))
+        self.assertTrue(run_log.with_suffix(".pstats").exists())
+        self.assertTrue(run_log.with_suffix(".collapsed").exists())
+        self.assertFalse(run_log.with_suffix(".alloc.txt").exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+
+from totelegram.telegram.patches import _query_name
+from totelegram.telegram.ratelimit import MethodClass, RateScheduler, classify
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestRateScheduler(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.scheduler = RateScheduler(clock=self.clock)
+
+    def test_classify(self):
+        self.assertEqual(classify("upload.SaveBigFilePart"), MethodClass.UPLOAD_PART)
+        self.assertEqual(classify("messages.SendMedia"), MethodClass.SEND)
+        self.assertEqual(classify("channels.GetMessages"), MethodClass.READ)
+        self.assertEqual(classify("users.GetFullUser"), MethodClass.OTHER)
+
+    def test_query_name_unwraps_only_tl_objects(self):
+        from pyrogram import raw
+
+        inline = raw.functions.messages.GetInlineBotResults(
+            bot=raw.types.InputUserSelf(), peer=raw.types.InputPeerSelf(), query="hola", offset=""
+        )
+        self.assertEqual(_query_name(inline), "messages.GetInlineBotResults")
+
+        wrapped = raw.functions.InvokeWithoutUpdates(query=inline)
+        self.assertEqual(_query_name(wrapped), "messages.GetInlineBotResults")
+
+    def test_unthrottled_until_first_flood(self):
+        for _ in range(5):
+            self.assertEqual(self.scheduler.reserve("a", MethodClass.SEND), 0.0)
+
+    def test_flood_blocks_only_its_account_and_method(self):
+        self.scheduler.on_flood("a", MethodClass.SEND, 30)
+
+        self.assertAlmostEqual(self.scheduler.reserve("a", MethodClass.SEND), 30.0)
+        self.assertEqual(self.scheduler.reserve("a", MethodClass.UPLOAD_PART), 0.0)
+        self.assertEqual(self.scheduler.reserve("b", MethodClass.SEND), 0.0)
+        self.assertAlmostEqual(self.scheduler.blocked_for("a", MethodClass.SEND), 30.0)
+
+    def test_interval_grows_on_flood_and_decays_on_success(self):
+        self.scheduler.on_flood("a", MethodClass.READ, 0)
+        self.scheduler.on_flood("a", MethodClass.READ, 0)
+        first = self.scheduler.reserve("a", MethodClass.READ)
+        second = self.scheduler.reserve("a", MethodClass.READ)
+        interval = second - first
+        self.assertAlmostEqual(interval, RateScheduler.MIN_STEP * RateScheduler.GROWTH)
+
+        for _ in range(500):
+            self.scheduler.on_success("a", MethodClass.READ)
+        self.clock.now += 60
+        self.scheduler.reserve("a", MethodClass.READ)
+        self.assertEqual(self.scheduler.reserve("a", MethodClass.READ), 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
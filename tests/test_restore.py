@@ -0,0 +1,233 @@
+import asyncio
+import hashlib
+import io
+import unittest
+from datetime import datetime
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from types import SimpleNamespace
+from typing import Optional
+
+import tartape
+
+from totelegram.database import DatabaseSession
+from totelegram.models import Job, Source, TapeMember, TelegramChat
+from totelegram.packaging import (
+    Chunker,
+    FileFragment,
+    RemotePart,
+    SourceMetadata,
+    TapeMemberSnapshot,
+    UploadManifest,
+    chunk_ranges,
+)
+from totelegram.restore import (
+    TG_CHUNK_SIZE,
+    RestoreService,
+    VolumeRange,
+    plan_member_ranges,
+)
+from totelegram.schemas import SourceType, Strategy
+
+
+class TestRestoreRanges(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = TemporaryDirectory()
+        self.folder = Path(self.tmp_dir.name) / "carpeta"
+        (self.folder / "sub").mkdir(parents=True)
+        self.contents = {
+            "pequeño.txt": b"hola mundo",
+            "sub/mediano.bin": bytes(range(256)) * 9,
+            "sub/grande.bin": b"x" * 5000 + b"fin",
+            "vacio.txt": b"",
+        }
+        for name, data in self.contents.items():
+            (self.folder / name).write_bytes(data)
+
+        self.db_manager = DatabaseSession(":memory:")
+        self.db_manager.start()
+        chat = TelegramChat.create(id=-100123456, title="Test Chat", type="channel")
+
+        self.tape = tartape.create(self.folder, calculate_hashes=True)
+        self.source = Source.create_from_tape(self.tape, [])
+        job = Job.formalize_intent(self.source, chat, is_premium=False, tg_limit=2048)
+        self.payloads = {p.sequence_index: p for p in Chunker.get_or_create(job)}
+
+    def tearDown(self):
+        self.db_manager.close()
+        try:
+            self.tmp_dir.cleanup()
+        except Exception:
+            pass
+
+    def _snapshot_member(self, name: str) -> TapeMemberSnapshot:
+        member = TapeMember.get(TapeMember.relative_path.endswith(name))
+        return TapeMemberSnapshot(
+            relative_path=member.relative_path,
+            size=member.size,
+            md5sum=member.md5sum,
+            fragments=[
+                FileFragment(
+                    vol_idx=gps.payload.sequence_index,
+                    offset_in_vol=gps.offset_in_volume,
+                    bytes_in_volume=gps.bytes_in_volume,
+                )
+                for gps in member.fragments
+            ],
+        )
+
+    def _read_volume(self, idx: int) -> bytes:
+        payload = self.payloads[idx]
+        volume = self.tape.get_volume(
+            payload.filename, idx, payload.start_offset, payload.end_offset
+        )
+        with volume:
+            return volume.read()
+
+    def test_ranges_extract_exact_content(self):
+        """Los rangos planificados, leídos de los volúmenes reales, reconstruyen cada archivo."""
+        for name, data in self.contents.items():
+            with self.subTest(name=name):
+                ranges = plan_member_ranges(self._snapshot_member(name))
+                restored = b"".join(
+                    self._read_volume(r.vol_idx)[r.start : r.end] for r in ranges
+                )
+                self.assertEqual(restored, data)
+
+    def test_split_member_spans_volumes(self):
+        """Un archivo mayor que el volumen se descarga de varios volúmenes."""
+        ranges = plan_member_ranges(self._snapshot_member("grande.bin"))
+        self.assertGreater(len(ranges), 1)
+        self.assertEqual(sum(r.size for r in ranges), len(self.contents["sub/grande.bin"]))
+
+
+class FakeStreamClient:
+    """Simula `stream_media` entregando un volumen en bloques de 1 MiB."""
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.requested = []
+
+    def stream_media(self, message, limit=0, offset=0):
+        self.requested.append((offset, limit))
+        for chunk_idx in range(offset, offset + limit):
+            start = chunk_idx * TG_CHUNK_SIZE
+            if start >= len(self.data):
+                return
+            yield self.data[start : start + TG_CHUNK_SIZE]
+
+
+class TestRestoreDownload(unittest.TestCase):
+    def test_download_range_requests_only_overlapping_chunks(self):
+        volume = bytes(i % 251 for i in range(3 * TG_CHUNK_SIZE + 100))
+        client = FakeStreamClient(volume)
+        service = RestoreService(client)  # type: ignore
+
+        vol_range = VolumeRange(
+            vol_idx=0, start=TG_CHUNK_SIZE + 10, end=2 * TG_CHUNK_SIZE + 20
+        )
+        out = io.BytesIO()
+        service._download_range(None, vol_range, out, hashlib.md5())  # type: ignore
+
+        self.assertEqual(out.getvalue(), volume[vol_range.start : vol_range.end])
+        self.assertEqual(client.requested, [(1, 2)])
+
+
+class FakeAsyncClient:
+    """Simula la API asíncrona de Pyrogram sobre las partes de un archivo en memoria."""
+
+    def __init__(self, parts: dict, fail_on: Optional[int] = None):
+        self.loop = asyncio.new_event_loop()
+        self.parts = parts  # message_id -> bytes
+        self.fail_on = fail_on
+        self.downloaded = []
+
+    async def get_messages(self, chat_id, ids):
+        return [SimpleNamespace(id=i, empty=False, document=True) for i in ids]
+
+    async def stream_media(self, message, limit=0, offset=0):
+        if message.id == self.fail_on:
+            raise ConnectionError("Conexión perdida")
+        self.downloaded.append(message.id)
+        data = self.parts[message.id]
+        for chunk_idx in range(offset, offset + limit):
+            start = chunk_idx * TG_CHUNK_SIZE
+            if start >= len(data):
+                return
+            yield data[start : start + TG_CHUNK_SIZE]
+
+
+class TestRestoreSource(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = TemporaryDirectory()
+        self.output = Path(self.tmp_dir.name)
+
+        self.data = bytes(i % 253 for i in range(10_000))
+        ranges = chunk_ranges(len(self.data), 4000)
+        self.messages = {100 + i: self.data[s:e] for i, (s, e) in enumerate(ranges)}
+        parts = [
+            RemotePart(
+                sequence=i,
+                message_id=100 + i,
+                chat_id=-100123456,
+                link="",
+                part_filename=f"datos.bin_{i}",
+                part_size=e - s,
+                part_md5sum=hashlib.md5(self.data[s:e]).hexdigest(),
+                start_offset=s,
+                end_offset=e,
+            )
+            for i, (s, e) in enumerate(ranges)
+        ]
+        self.manifest = UploadManifest(
+            created_at=datetime.now(),
+            strategy=Strategy.CHUNKED,
+            chunk_size=4000,
+            chat_id=-100123456,
+            owner_id=1,
+            owner_name="Tester",
+            source=SourceMetadata(
+                filename="datos.bin",
+                size=len(self.data),
+                md5sum=hashlib.md5(self.data).hexdigest(),
+                mime_type="application/octet-stream",
+                mtime=1.0,
+                type=SourceType.FILE,
+            ),
+            parts=parts,
+        )
+
+    def tearDown(self):
+        try:
+            self.tmp_dir.cleanup()
+        except Exception:
+            pass
+
+    def test_restore_writes_parts_at_offsets(self):
+        client = FakeAsyncClient(self.messages)
+        target = RestoreService(client).restore_source(self.manifest, self.output)  # type: ignore
+
+        self.assertEqual(target.read_bytes(), self.data)
+        self.assertFalse(target.with_name("datos.bin.restore.json").exists())
+        self.assertFalse(target.with_name("datos.bin.part").exists())
+
+    def test_restore_resumes_after_interruption(self):
+        """Tras un fallo, solo se descargan las partes que faltaban."""
+        failing = FakeAsyncClient(self.messages, fail_on=101)
+        with self.assertRaises(ConnectionError):
+            RestoreService(failing).restore_source(self.manifest, self.output, workers=1)  # type: ignore
+
+        client = FakeAsyncClient(self.messages)
+        target = RestoreService(client).restore_source(self.manifest, self.output)  # type: ignore
+
+        self.assertNotIn(100, client.downloaded)
+        self.assertIn(101, client.downloaded)
+        self.assertEqual(target.read_bytes(), self.data)
+
+    def test_corrupted_part_is_rejected(self):
+        corrupted = dict(self.messages)
+        corrupted[101] = b"\x00" * len(corrupted[101])
+        client = FakeAsyncClient(corrupted)
+
+        with self.assertRaises(ValueError):
+            RestoreService(client).restore_source(self.manifest, self.output)  # type: ignore
@@ -1,3 +1,191 @@
+import importlib.util
+import json
+import lzma
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+import tartape
+
+from totelegram.database import DatabaseSession
+from totelegram.models import (
+    Job,
+    RemotePayload,
+    Source,
+    TapeMember,
+    TelegramChat,
+    TelegramUser,
+)
+from totelegram.packaging import (
+    MANIFEST_VERSION,
+    Chunker,
+    SnapshotCodec,
+    SnapshotService,
+)
+from totelegram.utils import (
+    SNAPSHOT_INDEX_NAME,
+    SnapshotIndex,
+    delete_snapshot,
+    has_snapshot,
+)
+
+HAS_ZSTD = importlib.util.find_spec("zstandard") is not None
+
+
+class TestStreamingSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = TemporaryDirectory()
+        self.folder = Path(self.tmp_dir.name) / "carpeta"
+        (self.folder / "sub").mkdir(parents=True)
+        for i in range(5):
+            (self.folder / "sub" / f"f{i}.bin").write_bytes(bytes([i]) * (900 * i + 10))
+
+        self.db_manager = DatabaseSession(":memory:")
+        self.db_manager.start()
+        chat = TelegramChat.create(id=-100123456, title="Test Chat", type="channel")
+        owner = TelegramUser.create(id=123, first_name="Tester")
+
+        tape = tartape.create(self.folder, calculate_hashes=True)
+        self.source = Source.create_from_tape(tape, [])
+        self.job = Job.formalize_intent(self.source, chat, is_premium=False, tg_limit=2048)
+        self.payloads = Chunker.get_or_create(self.job)
+
+        for p in self.payloads:
+            RemotePayload.create(
+                payload=p,
+                message_id=1000 + p.sequence_index,
+                chat=chat,
+                owner=owner,
+                json_metadata={
+                    "message_id": 1000 + p.sequence_index,
+                    "chat": {"id": chat.id, "type": "ChatType.CHANNEL"},
+                },
+            )
+
+    def tearDown(self):
+        self.db_manager.close()
+        try:
+            self.tmp_dir.cleanup()
+        except Exception:
+            pass
+
+    def _assert_roundtrip(self, codec: SnapshotCodec):
+        path = SnapshotService.generate_snapshot(self.job, codec)
+
+        self.assertTrue(path.name.endswith(codec.suffix))
+        self.assertTrue(has_snapshot(self.folder))
+        self.assertEqual(SnapshotCodec.detect(path), codec)
+
+        manifest = SnapshotService.read_snapshot(path)
+        self.assertEqual(manifest.codec, codec.value)
+        self.assertEqual(
+            [p.message_id for p in manifest.parts],
+            [1000 + p.sequence_index for p in self.payloads],
+        )
+
+        inventory = {m.relative_path: m for m in manifest.source.inventory or []}
+        self.assertEqual(len(inventory), TapeMember.select().count())
+        for member in TapeMember.select():
+            snap = inventory[member.relative_path]
+            self.assertEqual(snap.md5sum, member.md5sum)
+            self.assertEqual(
+                sorted(f.vol_idx for f in snap.fragments),
+                sorted(g.payload.sequence_index for g in member.fragments),
+            )
+
+    def test_xz_roundtrip(self):
+        self._assert_roundtrip(SnapshotCodec.XZ)
+
+    @unittest.skipUnless(HAS_ZSTD, "zstandard no está instalado")
+    def test_zstd_roundtrip(self):
+        self._assert_roundtrip(SnapshotCodec.ZSTD)
+
+    def test_legacy_snapshot_is_readable(self):
+        """Los snapshots 5.0 (xz con preset por defecto, sin 'codec') siguen leyéndose."""
+        path = SnapshotService.generate_snapshot(self.job, SnapshotCodec.XZ)
+        data = json.loads(lzma.decompress(path.read_bytes()))
+        data.pop("codec")
+        data["manifest_version"] = "5.0"
+        path.write_bytes(lzma.compress(json.dumps(data, indent=2).encode("utf-8")))
+
+        manifest = SnapshotService.read_snapshot(path)
+        self.assertEqual(manifest.manifest_version, "5.0")
+        self.assertEqual(manifest.codec, "xz")
+        self.assertEqual(len(manifest.parts), len(self.payloads))
+
+    def test_index_resolves_collisions_without_decompressing(self):
+        path = SnapshotService.generate_snapshot(self.job, SnapshotCodec.XZ)
+        index = SnapshotIndex.load(path.parent)
+        self.assertEqual(index.get(path.name)["md5sum"], self.source.md5sum)
+
+        with patch.object(
+            SnapshotService, "_read_snapshot_meta", side_effect=AssertionError
+        ):
+            same = SnapshotService._resolve_snapshot_path(
+                self.folder, self.source.md5sum
+            )
+            other = SnapshotService._resolve_snapshot_path(self.folder, "otro_md5")
+
+        self.assertEqual(same, path)
+        self.assertEqual(other.name, "carpeta (1).json.xz")
+
+    def test_index_is_backfilled_for_unindexed_snapshots(self):
+        path = SnapshotService.generate_snapshot(self.job, SnapshotCodec.XZ)
+        (path.parent / SNAPSHOT_INDEX_NAME).unlink()
+
+        resolved = SnapshotService._resolve_snapshot_path(
+            self.folder, self.source.md5sum
+        )
+
+        self.assertEqual(resolved, path)
+        index = SnapshotIndex.load(path.parent)
+        self.assertEqual(index.get(path.name)["manifest_version"], MANIFEST_VERSION)
+
+    def test_stale_index_entry_is_not_trusted(self):
+        path = SnapshotService.generate_snapshot(self.job, SnapshotCodec.XZ)
+
+        # Otro recurso con el mismo nombre, copiado a mano encima del snapshot.
+        data = json.loads(lzma.decompress(path.read_bytes()))
+        data["source"]["md5sum"] = "otro_md5"
+        path.write_bytes(lzma.compress(json.dumps(data).encode("utf-8")))
+
+        resolved = SnapshotService._resolve_snapshot_path(
+            self.folder, self.source.md5sum
+        )
+
+        self.assertEqual(resolved.name, "carpeta (1).json.xz")
+        index = SnapshotIndex.load(path.parent)
+        self.assertEqual(index.get(path.name)["md5sum"], "otro_md5")
+
+    @unittest.skipUnless(HAS_ZSTD, "zstandard no está instalado")
+    def test_codec_change_reuses_the_snapshot_of_the_same_content(self):
+        path = SnapshotService.generate_snapshot(self.job, SnapshotCodec.XZ)
+
+        resolved = SnapshotService._resolve_snapshot_path(
+            self.folder, self.source.md5sum, SnapshotCodec.ZSTD
+        )
+        self.assertEqual(resolved, path)
+
+        again = SnapshotService.generate_snapshot(self.job, SnapshotCodec.ZSTD)
+        self.assertEqual(again, path)
+        self.assertEqual(SnapshotCodec.detect(again), SnapshotCodec.XZ)
+        self.assertFalse(self.folder.with_name("carpeta.json.zst").exists())
+
+        # Otro contenido con el códec nuevo sí toma el nombre base de ese códec.
+        other = SnapshotService._resolve_snapshot_path(
+            self.folder, "otro_md5", SnapshotCodec.ZSTD
+        )
+        self.assertEqual(other.name, "carpeta.json.zst")
+
+    def test_delete_snapshot_updates_index(self):
+        path = SnapshotService.generate_snapshot(self.job, SnapshotCodec.XZ)
+        delete_snapshot(self.folder)
+
+        self.assertFalse(path.exists())
+        self.assertIsNone(SnapshotIndex.load(path.parent).get(path.name))
+
+
 # import json
 # import lzma
 # import unittest
@@ -96,5 +284,6 @@
 #             self.assertEqual(data["owner_id"], 123)
 
 
+
 if __name__ == "__main__":
     unittest.main()
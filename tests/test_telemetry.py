@@ -0,0 +1,116 @@
+import json
+import os
+import tempfile
+import unittest
+import urllib.request
+from pathlib import Path
+
+from benchmarks.fake_telegram import FakeNetwork, FakeTelegramClient, FakeUploadEnvironment
+from totelegram.cli.ui import console
+from totelegram.telemetry import Telemetry, get_telemetry
+
+
+def read_events(path: Path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+class TestTelemetry(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.telemetry = Telemetry()
+        self.log_path = self.root / "logs" / "run.jsonl"
+        self.telemetry.open_log(self.log_path)
+
+    def tearDown(self):
+        self.telemetry.close()
+        self.telemetry.shutdown()
+        self.tmp.cleanup()
+
+    def test_parts_accumulate_into_the_account_payload(self):
+        t = self.telemetry
+        with t.payload("main", job_id=1, payload_id=7, filename="a.bin", size=1024):
+            t.record_part("main", 0, 512, read_s=0.01, rpc_s=0.2)
+            t.record_part("main", 1, 512, read_s=0.01, rpc_s=0.3, flood_s=3, retries=1)
+            t.record_part("otra", 0, 512, read_s=0.0, rpc_s=0.1)
+            t.record_hash("main", 0.05)
+
+        events = read_events(self.log_path)
+        payload = [e for e in events if e["event"] == "payload"][0]
+        self.assertEqual(payload["parts"], 2)
+        self.assertEqual(payload["bytes"], 1024)
+        self.assertEqual(payload["retries"], 1)
+        self.assertEqual(payload["flood_s"], 3)
+        self.assertAlmostEqual(payload["rpc_s"], 0.5)
+        self.assertAlmostEqual(payload["hash_s"], 0.05)
+        self.assertIsNone(payload["error"])
+
+        self.assertEqual(t.counter("parts_total"), 3)
+        self.assertEqual(t.counter("part_retries_total"), 1)
+        self.assertEqual(t.counter("payloads_total"), 1)
+        self.assertEqual(t.counter("bytes_total"), 1024)
+
+    def test_failed_payload_is_logged_but_not_counted(self):
+        with self.assertRaises(RuntimeError):
+            with self.telemetry.payload("main", 1, 7, "a.bin", 1024):
+                raise RuntimeError("corte de red")
+
+        payload = read_events(self.log_path)[-1]
+        self.assertEqual(payload["error"], "RuntimeError")
+        self.assertEqual(self.telemetry.counter("payloads_total"), 0)
+
+    def test_prometheus_file_and_endpoint(self):
+        t = self.telemetry
+        t.export(metrics_file=str(self.root / "metrics" / "totelegram.prom"))
+        t.flood("main", "upload_part", 12)
+        t.job(1, "uploaded", 3.5)
+
+        text = (self.root / "metrics" / "totelegram.prom").read_text(encoding="utf-8")
+        self.assertIn('totelegram_jobs_total{outcome="uploaded"} 1', text)
+        self.assertIn('totelegram_floodwait_seconds_total{method="upload_part"} 12', text)
+        self.assertIn("# TYPE totelegram_part_rpc_seconds summary", text)
+        self.assertIn("totelegram_bytes_total 0", text)
+
+        server = t.serve(0)
+        assert server is not None
+        url = f"http://127.0.0.1:{server.server_port}/metrics"
+        with urllib.request.urlopen(url, timeout=5) as response:
+            self.assertEqual(response.read().decode("utf-8"), t.render_prometheus())
+
+
+class TestTelemetryEndToEnd(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        console.quiet = True
+        self.log_path = self.root / "events.jsonl"
+        get_telemetry().open_log(self.log_path)
+
+    def tearDown(self):
+        get_telemetry().close()
+        console.quiet = False
+        self.tmp.cleanup()
+
+    def test_send_reports_parts_payloads_and_floods(self):
+        src = self.root / "src"
+        src.mkdir()
+        (src / "video.bin").write_bytes(os.urandom(1_200_000))
+        client = FakeTelegramClient(FakeNetwork(flood_every=3, flood_seconds=0))
+
+        with FakeUploadEnvironment(self.root / "work", client, tg_max_size_normal=1_048_576) as env:
+            self.assertEqual(env.send([src]), 1)
+
+        events = read_events(self.log_path)
+        payloads = [e for e in events if e["event"] == "payload"]
+        parts = [e for e in events if e["event"] == "part"]
+
+        self.assertEqual([p["size"] for p in payloads], [1_048_576, 151_424])
+        self.assertEqual(sum(p["parts"] for p in payloads), len(parts))
+        self.assertEqual(sum(p["bytes"] for p in parts), 1_200_000)
+        self.assertTrue(all(p["hash_s"] > 0 for p in payloads))
+        self.assertTrue(any(e["event"] == "flood_wait" for e in events))
+        self.assertEqual([e["outcome"] for e in events if e["event"] == "job"], ["uploaded"])
+
+
+if __name__ == "__main__":
+    unittest.main()
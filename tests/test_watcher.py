@@ -0,0 +1,143 @@
+import hashlib
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from benchmarks.fake_telegram import FakeTelegramClient, FakeUploadEnvironment
+from totelegram import models, packaging
+from totelegram.daemon import UploadDaemon, submit_paths
+from totelegram.identity import Settings
+from totelegram.packaging import SnapshotCodec, SnapshotService
+from totelegram.schemas import QueueMode
+from totelegram.utils import create_md5sum_by_hashlib
+from totelegram.watcher import Debouncer, DirectoryWatcher, PollingBackend
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestWatcher(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_polling_reports_only_deltas(self):
+        old = self.root / "old.txt"
+        old.write_text("x")
+        backend = PollingBackend(self.root)
+        self.assertEqual(backend.changes(), set())
+
+        (self.root / "sub").mkdir()
+        new = self.root / "sub" / "new.txt"
+        new.write_text("y")
+        os.utime(old, ns=(0, old.stat().st_mtime_ns + 1_000_000_000))
+
+        self.assertEqual(backend.changes(), {old, new})
+        self.assertEqual(backend.changes(), set())
+
+    def test_debounce_waits_for_stable_file(self):
+        clock = FakeClock()
+        debouncer = Debouncer(settle=2.0, clock=clock)
+        path = self.root / "video.mp4"
+        path.write_bytes(b"a")
+
+        debouncer.touch([path])
+        clock.now = 1.0
+        path.write_bytes(b"ab")
+        self.assertEqual(debouncer.ready(), [])  # Sigue creciendo: reinicia la espera.
+
+        clock.now = 2.5
+        self.assertEqual(debouncer.ready(), [])
+        clock.now = 3.0
+        self.assertEqual(debouncer.ready(), [path])
+        self.assertEqual(len(debouncer), 0)
+
+    def _snapshot(self, path: Path, content: bytes):
+        """Snapshot mínimo de `path` que describe `content`."""
+        target = path.with_name(f"{path.name}.json.xz")
+        with SnapshotCodec.XZ.open(target, "wt") as f:
+            json.dump({"source": {"md5sum": hashlib.md5(content).hexdigest()}}, f)
+
+    def test_watcher_filters_through_inventory(self):
+        settings = Settings(
+            api_id=1, api_hash="x", profile_name="test", exclude_files=["*.log"]
+        )
+        same = self.root / "igual.txt"
+        same.write_bytes(b"sin cambios")
+        self._snapshot(same, b"sin cambios")
+        stale = self.root / "b.txt"
+        stale.write_bytes(b"version 1")
+        self._snapshot(stale, b"version 1")
+
+        delivered = []
+        watcher = DirectoryWatcher(
+            self.root, settings, lambda paths, _: delivered.extend(paths), settle=0.0, polling=True
+        )
+
+        (self.root / "a.txt").write_text("a")
+        (self.root / "debug.log").write_text("b")
+        stale.write_bytes(b"version 2")  # Su snapshot ya no describe el contenido.
+        os.utime(same, ns=(0, same.stat().st_mtime_ns + 1_000_000_000))  # Solo tocado.
+
+        expected = [(self.root / "a.txt").resolve(), stale.resolve()]
+        self.assertEqual(watcher.poll(), expected)
+        self.assertEqual(delivered, expected)
+        self.assertEqual(watcher.poll(), [])
+    def test_snapshot_stamp_avoids_hashing_unchanged_files(self):
+        path = self.root / "informe.txt"
+        path.write_bytes(os.urandom(10_000))
+
+        with FakeUploadEnvironment(self.root / "work", FakeTelegramClient()) as env:
+            self.assertEqual(env.send([path]), 1)
+
+        with mock.patch.object(packaging, "create_md5sum_by_hashlib") as md5:
+            self.assertTrue(SnapshotService.describes_current_content(path))
+        md5.assert_not_called()
+
+        path.write_bytes(os.urandom(10_000))
+        self.assertFalse(SnapshotService.describes_current_content(path))
+
+    def test_modified_file_is_hashed_once_from_watch_to_upload(self):
+        src = self.root / "src"
+        src.mkdir()
+        path = src / "informe.txt"
+        path.write_bytes(os.urandom(10_000))
+        client = FakeTelegramClient()
+
+        with FakeUploadEnvironment(self.root / "work", client) as env:
+            self.assertEqual(env.send([path]), 1)
+            u_ctx = env.u_ctx
+            assert u_ctx is not None
+
+            def on_ready(paths, md5sums):
+                submit_paths(u_ctx.db, env.profile_name, paths, QueueMode.SEND, False, md5sums)
+
+            watcher = DirectoryWatcher(src, u_ctx.settings, on_ready, settle=0.0, polling=True)
+            path.write_bytes(os.urandom(10_000))
+
+            with mock.patch.object(
+                packaging, "create_md5sum_by_hashlib", wraps=create_md5sum_by_hashlib
+            ) as scan_md5, mock.patch.object(
+                models, "create_md5sum_by_hashlib", wraps=create_md5sum_by_hashlib
+            ) as source_md5:
+                self.assertEqual(watcher.poll(), [path.resolve()])
+                UploadDaemon(u_ctx).run(once=True)
+
+            self.assertEqual(scan_md5.call_count + source_md5.call_count, 1)
+
+        self.assertEqual(len(client.messages_in(client.default_chat.id)), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -10,4 +10,4 @@ Ver: docs/VISION.md
 """
 
 __version__ = "0.9.14"
-CURRENT_DB_VERSION = 2
+CURRENT_DB_VERSION = 6
@@ -0,0 +1,228 @@
+"""
+Paquetes de archivos pequeños para `send`.
+
+Subir miles de archivos pequeños uno a uno cuesta una llamada a la API, un Job y
+un snapshot por archivo. Con `bundle_small_files_bytes`, los archivos de una
+misma carpeta por debajo de ese tamaño se agrupan en paquetes: cintas TAR con
+solo esos archivos, subidas como un único Source (tipo BUNDLE).
+
+Cada archivo del paquete es un `TapeMember` con su GPS en el volumen, así que se
+busca y se restaura por separado igual que un archivo de una carpeta. El paquete
+escribe un snapshot propio, y el índice de snapshots de la carpeta recuerda qué
+archivos (tamaño y mtime) contiene para no volver a enviarlos.
+"""
+
+import hashlib
+import logging
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import peewee
+
+from tartape.constants import TAR_BLOCK_SIZE, TAR_FOOTER_SIZE
+from tartape.exceptions import TarIntegrityError
+from tartape.factory import TarEntryFactory
+from tartape.schemas import ByteWindow, EntryMetadata
+
+from totelegram.database import db_transaction
+from totelegram.incremental import DeltaTrack, delta_volume_manifest
+from totelegram.models import Job, Payload, Source, TapeMember
+from totelegram.schemas import SourceType
+from totelegram.utils import create_md5sum_by_hashlib
+
+logger = logging.getLogger(__name__)
+
+# Archivos por paquete: acota el snapshot y lo que se repite si un paquete falla.
+BUNDLE_MAX_FILES = 1000
+
+
+def entry_size(size: int) -> int:
+    """Bytes de un archivo en la cinta: cabecera, contenido y relleno."""
+    padding = (TAR_BLOCK_SIZE - size % TAR_BLOCK_SIZE) % TAR_BLOCK_SIZE
+    return TAR_BLOCK_SIZE + size + padding
+
+
+def plan_bundles(
+    paths: List[Path], threshold: int, max_size: int
+) -> Tuple[List[List[Path]], List[Path]]:
+    """
+    Separa los candidatos de `send` en paquetes y archivos sueltos.
+
+    Los archivos menores que `threshold` se agrupan por carpeta, en orden de
+    nombre, en paquetes de hasta `max_size` bytes de cinta y `BUNDLE_MAX_FILES`
+    archivos. Un paquete de un solo archivo no ahorra nada: se sube suelto.
+    """
+    if threshold <= 0:
+        return [], list(paths)
+
+    singles: List[Path] = []
+    by_folder: Dict[Path, List[Tuple[Path, int]]] = {}
+    for path in paths:
+        size = path.stat().st_size
+        if size < threshold:
+            by_folder.setdefault(path.parent, []).append((path, size))
+        else:
+            singles.append(path)
+
+    bundles: List[List[Path]] = []
+    for folder in sorted(by_folder):
+        current: List[Path] = []
+        current_size = TAR_FOOTER_SIZE
+        for path, size in sorted(by_folder[folder]):
+            if current and (
+                current_size + entry_size(size) > max_size
+                or len(current) == BUNDLE_MAX_FILES
+            ):
+                bundles.append(current)
+                current, current_size = [], TAR_FOOTER_SIZE
+            current.append(path)
+            current_size += entry_size(size)
+        if current:
+            bundles.append(current)
+
+    singles.extend(b[0] for b in bundles if len(b) == 1)
+    return [b for b in bundles if len(b) > 1], singles
+
+
+def bundle_path(folder: Path, fingerprint: str) -> Path:
+    """Ruta virtual del paquete: da nombre a sus volúmenes y a su snapshot."""
+    return folder / f"{folder.name}.bundle-{fingerprint[:8]}"
+
+
+def stamp_matches(stamp: Optional[list], size: int, mtime: float) -> bool:
+    """¿Describe la entrada del índice (tamaño, mtime[, md5]) al archivo en disco?"""
+    return stamp is not None and list(stamp[:2]) == [size, mtime]
+
+
+def get_or_create_bundle_source(
+    files: List[Path], db: peewee.Database, stamps: Optional[Dict[str, list]] = None
+) -> Source:
+    """
+    Source de un paquete. Su fingerprint sale de los nombres, tamaños y MD5 de
+    sus archivos, así que el mismo grupo sin cambios vuelve a ser el mismo
+    Source. Sus archivos se registran como `TapeMember` en el orden de la cinta.
+
+    `stamps` son los archivos ya enviados en paquetes (`SnapshotService.bundled_members`):
+    los que no cambiaron reutilizan su MD5 en lugar de volver a leerse.
+    """
+    folder = files[0].parent
+    stamps = stamps or {}
+    members = []
+    mtime = 0.0
+    for path in sorted(files):
+        stat = path.stat()
+        stamp = stamps.get(path.name)
+        if stamp_matches(stamp, stat.st_size, stat.st_mtime) and len(stamp) > 2:  # type: ignore
+            md5sum = stamp[2]  # type: ignore
+        else:
+            md5sum = create_md5sum_by_hashlib(path)
+        members.append((path.name, stat.st_size, md5sum))
+        mtime = max(mtime, stat.st_mtime)
+
+    hasher = hashlib.sha256()
+    for name, size, md5sum in members:
+        hasher.update(f"{name}\0{size}\0{md5sum}\n".encode("utf-8"))
+    fingerprint = hasher.hexdigest()
+    path_str = str(bundle_path(folder, fingerprint))
+
+    source = Source.get_or_none(Source.md5sum == fingerprint)
+    if source is not None:
+        if source.path_str != path_str or source.mtime != mtime:
+            # El mismo contenido en otra carpeta, o tocado sin cambiar.
+            source.path_str = path_str
+            source.mtime = mtime
+            with db_transaction(db):
+                source.save(only=[Source.path_str, Source.mtime, Source.updated_at])
+        return source
+
+    with db_transaction(db):
+        source = Source.create(
+            path_str=path_str,
+            md5sum=fingerprint,
+            size=sum(entry_size(size) for _, size, _ in members) + TAR_FOOTER_SIZE,
+            mtime=mtime,
+            mimetype="application/x-tar",
+            type=SourceType.BUNDLE,
+        )
+        TapeMember.insert_many(
+            [
+                {"source": source, "relative_path": name, "size": size, "md5sum": md5sum}
+                for name, size, md5sum in members
+            ]
+        ).execute()
+    logger.info(f"Paquete {source.path.name}: {len(members)} archivos, {source.size} bytes.")
+    return source
+
+
+def _member_metadata(source: Source, member: TapeMember) -> EntryMetadata:
+    """Metadatos TAR de un archivo del paquete, leídos del disco al transmitirlo."""
+    path = source.path.parent / member.relative_path
+    metadata = TarEntryFactory.create_metadata(
+        path, rel_path=member.relative_path, arcname=member.relative_path
+    )
+    if metadata is None:
+        raise TarIntegrityError(f"File missing: {member.relative_path}")
+    # El mtime del paquete es el del archivo más reciente al crearlo.
+    if metadata.size != member.size or metadata.mtime > int(source.mtime):
+        raise TarIntegrityError(f"File modified since bundled: {member.relative_path}")
+    return metadata
+
+
+def iter_bundle_tracks(
+    source: Source, window: Optional[ByteWindow] = None
+) -> Iterator[DeltaTrack]:
+    """
+    Archivos del paquete con sus offsets en la cinta.
+
+    Los offsets solo dependen de los tamaños guardados. Con `window` se
+    devuelven solo los archivos del volumen, con los metadatos del disco que
+    necesitan sus cabeceras para transmitirse.
+    """
+    cursor = 0
+    members = TapeMember.select().where(TapeMember.source == source).order_by(TapeMember.id)
+    for member in members.iterator():
+        start, end = cursor, cursor + entry_size(member.size)
+        cursor = end
+        if window is not None:
+            if start >= window.end or end <= window.start:
+                continue
+            metadata = _member_metadata(source, member)
+        else:
+            metadata = EntryMetadata(
+                arc_path=member.relative_path,
+                rel_path=member.relative_path,
+                size=member.size,
+                mtime=0,
+                mode=0,
+                uid=0,
+                gid=0,
+                uname="",
+                gname="",
+                is_dir=False,
+                md5sum=member.md5sum,
+            )
+        yield DeltaTrack(start, end, metadata)
+
+
+def open_bundle_volume(job: Job, payload: Payload):
+    """Stream de un volumen del paquete, leído de su carpeta como los de `tartape`."""
+    from tartape.stream import FolderVolume
+
+    window = ByteWindow(start=payload.start_offset, end=payload.end_offset)
+    tracks = list(iter_bundle_tracks(job.source, window))
+    manifest = delta_volume_manifest(job, payload.sequence_index, window, tracks)
+    return FolderVolume(job.source.path.parent, manifest, payload.filename)
+
+
+def bundle_member_stamps(source: Source) -> Dict[str, list]:
+    """Tamaño, mtime y MD5 de cada archivo del paquete, para el índice de snapshots."""
+    stamps = {}
+    for name, size, md5sum in (
+        TapeMember.select(TapeMember.relative_path, TapeMember.size, TapeMember.md5sum)
+        .where(TapeMember.source == source)
+        .tuples()
+    ):
+        path = source.path.parent / name
+        mtime = path.stat().st_mtime if path.exists() else 0.0
+        stamps[name] = [size, mtime, md5sum]
+    return stamps
@@ -7,32 +7,37 @@ from typing import Optional
 import typer
 
 from totelegram import __version__
-from totelegram.cli.commands import backup, config, profile, send
-from totelegram.cli.ui import console
-from totelegram.identity import SettingsManager
-from totelegram.logging_config import setup_logging
-from totelegram.schemas import CLIState
-from totelegram.utils import APP_NAME, get_user_config_dir
+from totelegram.cli.lazy import lazy_group
+from totelegram.profiling import ProfileMode
 
 logging.getLogger("dotenv").setLevel(logging.CRITICAL)
 
 logger = logging.getLogger(__name__)
 
+# Los comandos se importan al invocarlos: arrancar la CLI no debe cargar
+# peewee, tartape ni Pyrogram (ver `LazyGroup`).
+COMMANDS = {
+    "send": ("totelegram.cli.commands.send", "send_files"),
+    "backup": ("totelegram.cli.commands.backup", "backup_folders"),
+    "restore": ("totelegram.cli.commands.restore", "restore_snapshot"),
+    "assist": ("totelegram.cli.commands.assist", "assist_job"),
+    "watch": ("totelegram.cli.commands.watch", "watch_folder"),
+    "daemon": ("totelegram.cli.commands.daemon", "app"),
+    "config": ("totelegram.cli.commands.config", "app"),
+    "profile": ("totelegram.cli.commands.profile", "app"),
+}
+
 app = typer.Typer(
+    cls=lazy_group(COMMANDS),
     help="Herramienta para subir archivos a Telegram sin límite de tamaño.",
     add_completion=False,
     no_args_is_help=True,
 )
 
-app.add_typer(config.app, name="config")
-app.add_typer(profile.app, name="profile")
-app.command(name="send")(send.send_files)
-app.command(name="backup")(backup.backup_folders)
-
 
 def version_callback(value: bool):
     if value:
-        console.print(f"toTelegram [bold cyan]v{__version__}[/bold cyan]")
+        print(f"toTelegram v{__version__}")
         raise typer.Exit()
 
 
@@ -59,10 +64,22 @@ def main(
         "--debug",
         help="Activa el modo debug (DB independiente y logs detallados).",
     ),
+    profile: Optional[ProfileMode] = typer.Option(
+        None,
+        "--profile",
+        help="Perfila el comando (cpu, mem o both) y guarda los resultados junto al log.",
+        case_sensitive=False,
+    ),
 ):
     """
     Se ejecuta antes que cualquier comando.
     """
+    from totelegram.identity import SettingsManager
+    from totelegram.logging_config import setup_logging
+    from totelegram.schemas import CLIState
+    from totelegram.telemetry import get_telemetry
+    from totelegram.utils import APP_NAME, get_user_config_dir
+
     worktable = get_user_config_dir(APP_NAME)
     config_manager = SettingsManager(worktable)
 
@@ -73,6 +90,22 @@ def main(
     log_path = log_dir / f"{timestamp}_{cmd_name}.log"
 
     setup_logging(log_path, debug)
+    # Eventos estructurados (partes, piezas, FloodWait) junto al log de texto.
+    get_telemetry().open_log(log_path.with_suffix(".jsonl"))
+
+    if profile is not None:
+        from totelegram.profiling import RunProfiler
+
+        profiler = RunProfiler(profile, log_path.with_suffix(""))
+        profiler.start()
+
+        def finish_profile():
+            from totelegram.cli.ui import UI
+
+            for path in profiler.stop():
+                UI.info(f"Perfil guardado en [dim]{path}[/]")
+
+        ctx.call_on_close(finish_profile)
 
     # main resuelve la intencion del nombre del perfil a usar; las validaciones dependen del contexto del comando.
     profile_name = use or config_manager.get_active_profile_name()
@@ -0,0 +1,45 @@
+import typer
+
+from totelegram.cli.commands.config import _get_config_tools, handle_config_errors
+from totelegram.cli.logic import prepare_upload_context
+from totelegram.cli.ui import UI
+from totelegram.models import Job
+from totelegram.schemas import CLIState, JobStatus
+from totelegram.uploader import UploadService
+
+
+@handle_config_errors
+def assist_job(
+    ctx: typer.Context,
+    job_id: int = typer.Argument(..., help="ID del Job en curso."),
+    plan_timeout: float = typer.Option(
+        60.0,
+        "--plan-timeout",
+        min=0.0,
+        help="Segundos a esperar nuevos volúmenes mientras la cinta se planifica.",
+    ),
+):
+    """
+    Ayuda a subir un Job en curso con la cuenta de este perfil. Lo lanza
+    `send`/`backup --helper`; las piezas van al chat del Job, no al del perfil.
+    """
+    state: CLIState = ctx.obj
+    profile_name, _ = _get_config_tools(ctx)
+    settings = state.manager.get_settings(profile_name)
+
+    with state.scope() as (client, db):
+        job = Job.get_or_none(Job.id == job_id)
+        if job is None:
+            UI.error(f"El Job {job_id} no existe.")
+            raise typer.Exit(1)
+
+        if job.status == JobStatus.UPLOADED:
+            UI.info(f"El Job {job_id} ya está completo.")
+            return
+
+        # El destino es el del Job: todos los ayudantes publican en el mismo chat.
+        settings.chat_id = job.chat_id
+        u_ctx = prepare_upload_context(state, client, db, settings)
+
+        uploaded = UploadService(u_ctx).assist_job(job, plan_timeout)
+        UI.success(f"{uploaded} pieza(s) subida(s) para el Job {job_id}.")
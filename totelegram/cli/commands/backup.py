@@ -9,6 +9,7 @@ from totelegram.cli.logic import (
     InventoryEngine,
     get_or_create_job,
     prepare_upload_context,
+    resolve_helper_profiles,
 )
 from totelegram.cli.ui import UI, DisplayUpload, console
 from totelegram.schemas import VALUE_NOT_SET, CLIState, Commands
@@ -28,6 +29,12 @@ def backup_folders(
         "-f",
         help="Fuerza ignorando el estado del archivo en el sistema",
     ),
+    helpers: List[str] = typer.Option(
+        [],
+        "--helper",
+        "-H",
+        help="Perfil de otra cuenta que sube piezas del mismo Job en paralelo (repetible).",
+    ),
 ):
     """
     Convierte una carpeta en una Cinta de Datos (TAR) y la distribuye en volúmenes.
@@ -36,6 +43,7 @@ def backup_folders(
     profile_name, _ = _get_config_tools(ctx)
 
     settings = state.manager.get_settings(profile_name)
+    helpers = resolve_helper_profiles(state, profile_name, helpers)
 
     if settings.chat_id == VALUE_NOT_SET:
         UI.error("El chat destino no está configurado.")
@@ -69,7 +77,7 @@ def backup_folders(
 
     with state.scope() as (client, db):
         u_ctx = prepare_upload_context(state, client, db, settings)
-        uploader = UploadService(u_ctx)
+        uploader = UploadService(u_ctx, helpers)
 
         from totelegram.telegram.patches import get_patch_status
 
@@ -0,0 +1,113 @@
+from pathlib import Path
+from typing import List
+
+import typer
+
+from totelegram.cli.commands.config import _get_config_tools
+from totelegram.cli.logic import prepare_upload_context
+from totelegram.cli.ui import UI, DisplayQueue
+from totelegram.daemon import UploadDaemon, queue_summary, submit_paths
+from totelegram.database import DatabaseSession
+from totelegram.schemas import VALUE_NOT_SET, CLIState, QueueMode
+
+app = typer.Typer(
+    help="Daemon de subidas: mantiene una sesión abierta y procesa una cola persistente.",
+    no_args_is_help=True,
+)
+
+
+@app.command("run")
+def run_daemon(
+    ctx: typer.Context,
+    once: bool = typer.Option(
+        False,
+        "--once",
+        help="Procesa lo pendiente y termina en vez de quedarse esperando.",
+    ),
+    interval: float = typer.Option(
+        2.0,
+        "--interval",
+        "-i",
+        min=0.1,
+        help="Segundos entre consultas a la cola cuando está vacía.",
+    ),
+):
+    """
+    Inicia el daemon del perfil: abre Telegram y la base de datos una sola vez
+    y sube cada ruta que se encole con `daemon submit`.
+    """
+    state: CLIState = ctx.obj
+    profile_name, _ = _get_config_tools(ctx)
+    settings = state.manager.get_settings(profile_name)
+
+    if settings.chat_id == VALUE_NOT_SET:
+        UI.error("El chat destino no está configurado.")
+        raise typer.Exit(1)
+
+    with state.scope() as (client, db):
+        u_ctx = prepare_upload_context(state, client, db, settings)
+        daemon = UploadDaemon(u_ctx, poll_interval=interval)
+
+        chat_n = u_ctx.tg_chat.title or u_ctx.tg_chat.username
+        UI.success(f"Daemon activo para [bold]{profile_name}[/] → [bold cyan]{chat_n}[/]")
+        if not once:
+            UI.info("[dim]Esperando trabajos. Ctrl+C para detener.[/]")
+
+        try:
+            daemon.run(once=once)
+        except KeyboardInterrupt:
+            daemon.stop()
+            UI.warn("Daemon detenido. Las entradas en curso se reanudarán al reiniciar.")
+
+
+@app.command("submit")
+def submit(
+    ctx: typer.Context,
+    paths: List[Path] = typer.Argument(
+        ...,
+        exists=True,
+        help="Archivos o carpetas a encolar.",
+    ),
+    backup: bool = typer.Option(
+        False,
+        "--backup",
+        "-b",
+        help="Encola las carpetas como backup (cinta TAR) en vez de archivos sueltos.",
+    ),
+    force: bool = typer.Option(
+        False,
+        "--force",
+        "-f",
+        help="Fuerza ignorando el estado del archivo en el sistema",
+    ),
+):
+    """
+    Encola rutas para el daemon del perfil. No abre Telegram: vuelve al instante.
+    """
+    state: CLIState = ctx.obj
+    profile_name, _ = _get_config_tools(ctx)
+    mode = QueueMode.BACKUP if backup else QueueMode.SEND
+
+    with DatabaseSession(state.manager.get_database_target(profile_name)) as db:
+        entries = submit_paths(db, profile_name, paths, mode, force)
+
+    for entry in entries:
+        UI.success(f"Encolado [bold]{entry.path.name}[/] [dim](#{entry.id}, {mode.value})[/]")
+
+
+@app.command("status")
+def status(
+    ctx: typer.Context,
+    limit: int = typer.Option(
+        20, "--limit", "-n", min=1, help="Número de entradas recientes a mostrar."
+    ),
+):
+    """
+    Muestra el estado de la cola del perfil.
+    """
+    state: CLIState = ctx.obj
+    profile_name, _ = _get_config_tools(ctx)
+
+    with DatabaseSession(state.manager.get_database_target(profile_name)) as db:
+        counts, entries = queue_summary(db, profile_name, limit)
+        DisplayQueue.render_queue(profile_name, counts, entries)
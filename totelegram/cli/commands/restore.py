@@ -0,0 +1,124 @@
+from pathlib import Path
+from typing import Optional
+
+import typer
+from rich.progress import (
+    BarColumn,
+    DownloadColumn,
+    Progress,
+    TextColumn,
+    TimeRemainingColumn,
+    TransferSpeedColumn,
+)
+
+from totelegram.cli.commands.config import _get_config_tools, handle_config_errors
+from totelegram.cli.ui import UI, console
+from totelegram.packaging import SnapshotService
+from totelegram.restore import (
+    RestoreService,
+    find_member,
+    resolve_restore_target,
+    restore_size,
+)
+from totelegram.schemas import CLIState
+from totelegram.telegram.client import TelegramSession
+
+
+@handle_config_errors
+def restore_snapshot(
+    ctx: typer.Context,
+    snapshot: Path = typer.Argument(
+        ...,
+        exists=True,
+        dir_okay=False,
+        help="Snapshot (.json.xz) del archivo o carpeta subido.",
+    ),
+    relative_path: Optional[str] = typer.Argument(
+        None,
+        help="Ruta de un archivo dentro de la cinta (ej: carpeta/sub/archivo.txt). "
+        "Si se omite, se restaura el origen completo.",
+    ),
+    output: Path = typer.Option(
+        Path("."),
+        "--output",
+        "-o",
+        file_okay=False,
+        help="Carpeta donde se escribirá el archivo restaurado.",
+    ),
+    workers: Optional[int] = typer.Option(
+        None,
+        "--workers",
+        "-w",
+        min=1,
+        help="Descargas simultáneas (por defecto: download_workers del perfil).",
+    ),
+):
+    """
+    Restaura desde Telegram lo descrito por un snapshot. Con RELATIVE_PATH
+    recupera un solo archivo de una carpeta archivada descargando solo los bytes
+    de los volúmenes que lo contienen; sin él, restaura el origen completo.
+    """
+    state: CLIState = ctx.obj
+    profile_name, _ = _get_config_tools(ctx)
+    settings = state.manager.get_settings(profile_name)
+
+    manifest = SnapshotService.read_snapshot(snapshot)
+    progress = _build_progress()
+
+    if relative_path is None:
+        workers = workers or settings.download_workers
+        target = resolve_restore_target(manifest, output)
+        total = restore_size(manifest)
+        UI.info(
+            f"Restaurando [bold]{target.name}[/] desde {len(manifest.parts)} parte(s) "
+            f"[dim]({total} bytes, {workers} descargas en paralelo)[/]"
+        )
+        if manifest.base_fingerprint:
+            UI.info("Snapshot incremental: se restaura el árbol desde las cintas base.")
+        session = TelegramSession.from_profile(
+            profile_name, state.manager, max_concurrent_transmissions=workers
+        )
+        with session as client:
+            with progress:
+                task_id = progress.add_task(
+                    "restore", total=total, filename=target.name
+                )
+                service = RestoreService(
+                    client, on_progress=lambda n: progress.advance(task_id, n)
+                )
+                target = service.restore_source(manifest, output, workers)
+
+        UI.success(f"Restaurado y verificado: [bold]{target}[/]")
+        return
+
+    member = find_member(manifest, relative_path)
+    UI.info(
+        f"Archivo encontrado en {len(member.fragments)} volumen(es): "
+        f"[bold]{member.relative_path}[/] [dim]({member.size} bytes)[/]"
+    )
+
+    with TelegramSession.from_profile(profile_name, state.manager) as client:
+        with progress:
+            task_id = progress.add_task(
+                "restore", total=member.size, filename=Path(member.relative_path).name
+            )
+            service = RestoreService(
+                client, on_progress=lambda n: progress.advance(task_id, n)
+            )
+            target = service.restore_member(manifest, member.relative_path, output)
+
+    UI.success(f"Archivo restaurado y verificado: [bold]{target}[/]")
+
+
+def _build_progress() -> Progress:
+    return Progress(
+        TextColumn("[bold blue]{task.fields[filename]}", justify="left"),
+        BarColumn(bar_width=20, pulse_style="white"),
+        "[progress.percentage]{task.percentage:>3.0f}%",
+        DownloadColumn(),
+        TransferSpeedColumn(),
+        TimeRemainingColumn(),
+        console=console,
+        transient=True,
+        expand=False,
+    )
@@ -6,8 +6,10 @@ import typer
 from totelegram.cli.commands.config import _get_config_tools, handle_config_errors
 from totelegram.cli.logic import (
     InventoryEngine,
-    get_or_create_job,
+    get_or_create_send_job,
+    plan_send,
     prepare_upload_context,
+    resolve_helper_profiles,
 )
 from totelegram.cli.ui import UI, DisplayUpload, console
 from totelegram.schemas import (
@@ -32,6 +34,12 @@ def send_files(
         "-f",
         help="Fuerza ignorando el estado del archivo en el sistema",
     ),
+    helpers: List[str] = typer.Option(
+        [],
+        "--helper",
+        "-H",
+        help="Perfil de otra cuenta que sube piezas del mismo Job en paralelo (repetible).",
+    ),
 ):
     """
     Envía archivos a Telegram. Si recibe una carpeta, envía su contenido (recursivo)
@@ -40,6 +48,7 @@ def send_files(
     state: CLIState = ctx.obj
     profile_name, _ = _get_config_tools(ctx)
     settings = state.manager.get_settings(profile_name)
+    helpers = resolve_helper_profiles(state, profile_name, helpers)
 
     if settings.chat_id == VALUE_NOT_SET:
         UI.error("El chat destino no está configurado.")
@@ -71,7 +80,7 @@ def send_files(
 
     with state.scope() as (client, db):
         u_ctx = prepare_upload_context(state, client, db, settings)
-        uploader = UploadService(u_ctx)
+        uploader = UploadService(u_ctx, helpers)
 
         from totelegram.telegram.patches import get_patch_status
 
@@ -87,13 +96,15 @@ def send_files(
         UI.info(f"Destino: [bold cyan]{chat_n}[/] [dim](ID: {u_ctx.tg_chat.id})[/]")
         UI.print("", indent=False)
 
-        for idx, path in enumerate(candidates, 1):
-            is_last = idx == len(candidates)
+        units = plan_send(candidates, u_ctx)
+        for idx, unit in enumerate(units, 1):
+            is_last = idx == len(units)
             UI.separator()
 
-            job = get_or_create_job(path, u_ctx, force, is_last)
+            job = get_or_create_send_job(unit, u_ctx, force, is_last)
             if job is None:
                 continue
 
+            path = job.source.path
             if uploader.process_job(job, path, is_last):
                 UI.success(f"Archivo [bold]{path.name}[/] enviado exitosamente.")
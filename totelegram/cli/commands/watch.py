@@ -0,0 +1,107 @@
+from pathlib import Path
+from typing import Dict, List
+
+import typer
+
+from totelegram.cli.commands.config import _get_config_tools
+from totelegram.cli.logic import prepare_upload_context
+from totelegram.cli.ui import UI
+from totelegram.daemon import UploadDaemon, submit_paths
+from totelegram.database import DatabaseSession
+from totelegram.schemas import VALUE_NOT_SET, CLIState, QueueMode
+from totelegram.watcher import DirectoryWatcher
+
+
+def watch_folder(
+    ctx: typer.Context,
+    directory: Path = typer.Argument(
+        ...,
+        exists=True,
+        file_okay=False,
+        help="Carpeta a observar.",
+    ),
+    settle: float = typer.Option(
+        2.0,
+        "--settle",
+        "-s",
+        min=0.0,
+        help="Segundos que tamaño y mtime deben permanecer estables antes de subir.",
+    ),
+    interval: float = typer.Option(
+        1.0,
+        "--interval",
+        "-i",
+        min=0.1,
+        help="Segundos entre comprobaciones.",
+    ),
+    enqueue_only: bool = typer.Option(
+        False,
+        "--enqueue-only",
+        help="Solo encola los cambios para un `daemon run` ya activo (no abre Telegram).",
+    ),
+    polling: bool = typer.Option(
+        False,
+        "--polling",
+        help="Fuerza el sondeo aunque haya eventos del sistema disponibles (útil en NFS/SMB).",
+    ),
+    force: bool = typer.Option(
+        False,
+        "--force",
+        "-f",
+        help="Fuerza ignorando el estado del archivo en el sistema",
+    ),
+):
+    """
+    Observa una carpeta y sube solo los archivos nuevos o modificados, cuando
+    terminan de escribirse. Los cambios pasan por la cola del daemon.
+    """
+    state: CLIState = ctx.obj
+    profile_name, _ = _get_config_tools(ctx)
+    settings = state.manager.get_settings(profile_name)
+
+    if settings.chat_id == VALUE_NOT_SET and not enqueue_only:
+        UI.error("El chat destino no está configurado.")
+        raise typer.Exit(1)
+
+    if enqueue_only:
+        with DatabaseSession(state.manager.get_database_target(profile_name)) as db:
+
+            def on_ready(paths: List[Path], md5sums: Dict[Path, str]):
+                submit_paths(db, profile_name, paths, QueueMode.SEND, force, md5sums)
+                UI.info(f"{len(paths)} archivo(s) encolado(s).")
+
+            _watch(directory, settings, on_ready, settle, interval, force, polling)
+        return
+
+    with state.scope() as (client, db):
+        u_ctx = prepare_upload_context(state, client, db, settings)
+        daemon = UploadDaemon(u_ctx)
+
+        def on_ready(paths: List[Path], md5sums: Dict[Path, str]):
+            submit_paths(db, profile_name, paths, QueueMode.SEND, force, md5sums)
+            daemon.run(once=True)
+
+        # Lo que quedó encolado de una ejecución anterior se procesa primero.
+        daemon.run(once=True)
+        _watch(directory, settings, on_ready, settle, interval, force, polling)
+
+
+def _watch(directory, settings, on_ready, settle, interval, force, polling):
+    watcher = DirectoryWatcher(
+        directory,
+        settings,
+        on_ready,
+        settle=settle,
+        interval=interval,
+        force=force,
+        polling=polling,
+    )
+    UI.success(
+        f"Observando [bold]{watcher.root}[/] [dim](backend: {watcher.backend.name})[/]"
+    )
+    UI.info("[dim]Ctrl+C para detener.[/]")
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        watcher.stop()
+        UI.warn("Observación detenida.")
@@ -0,0 +1,46 @@
+import importlib
+from typing import Any, Dict, List, Optional, Tuple
+
+import typer
+from typer.core import TyperGroup
+
+
+class LazyGroup(TyperGroup):
+    """
+    Grupo de Typer cuyos subcomandos se importan solo al invocarlos.
+
+    Cada comando se registra como `nombre -> ("modulo", "atributo")`. El atributo
+    puede ser una función (comando simple) o un `typer.Typer` (subgrupo). Así,
+    `totelegram --version` o `totelegram config` no cargan peewee, tartape ni
+    Pyrogram, que solo necesitan los comandos de subida.
+    """
+
+    lazy_commands: Dict[str, Tuple[str, str]] = {}
+
+    def list_commands(self, ctx: typer.Context) -> List[str]:
+        eager = super().list_commands(ctx)
+        return eager + [name for name in self.lazy_commands if name not in eager]
+
+    def get_command(self, ctx: typer.Context, cmd_name: str) -> Optional[Any]:
+        if cmd_name in self.lazy_commands and cmd_name not in self.commands:
+            self.add_command(self._load(cmd_name), cmd_name)
+        return super().get_command(ctx, cmd_name)
+
+    def _load(self, cmd_name: str) -> Any:
+        module_name, attr = self.lazy_commands[cmd_name]
+        target = getattr(importlib.import_module(module_name), attr)
+
+        if isinstance(target, typer.Typer):
+            command = typer.main.get_command(target)
+        else:
+            wrapper = typer.Typer()
+            wrapper.command(name=cmd_name)(target)
+            command = typer.main.get_command(wrapper)
+
+        command.name = cmd_name
+        return command
+
+
+def lazy_group(commands: Dict[str, Tuple[str, str]]) -> type:
+    """Crea una subclase de `LazyGroup` con su propio registro de comandos."""
+    return type("LazyCommands", (LazyGroup,), {"lazy_commands": dict(commands)})
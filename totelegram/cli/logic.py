@@ -1,6 +1,6 @@
 import logging
 from pathlib import Path
-from typing import TYPE_CHECKING, List, Optional, cast
+from typing import TYPE_CHECKING, Dict, List, Optional, cast
 
 import peewee
 import tartape
@@ -8,15 +8,26 @@ import typer
 from filelock import Timeout
 from tartape.exceptions import TarIntegrityError
 
+from totelegram.bundling import get_or_create_bundle_source, plan_bundles, stamp_matches
 from totelegram.cli.ui import UI, console
+from totelegram.compression import should_compress
 from totelegram.concurrency import LeaseManager
-from totelegram.database import db_transaction
+from totelegram.database import create_writer, db_transaction
 from totelegram.discovery import DiscoveryService
+from totelegram.incremental import compute_delta_size, find_base_job
 from totelegram.identity import Settings
 from totelegram.models import Job, Source, TelegramChat, TelegramUser
-from totelegram.schemas import CLIState, ScanReport
+from totelegram.packaging import SnapshotService
+from totelegram.schemas import CLIState, PayloadCompression, ScanReport, SourceType
+from totelegram.telemetry import get_telemetry
 from totelegram.types import UploadContext
-from totelegram.utils import delete_snapshot, get_node_id, has_snapshot, is_excluded
+from totelegram.utils import (
+    delete_snapshot,
+    get_node_id,
+    has_snapshot,
+    is_excluded,
+    is_snapshot_file,
+)
 
 if TYPE_CHECKING:
     from pyrogram.client import Client
@@ -29,11 +40,13 @@ def get_or_create_tape(
     u_ctx: UploadContext,
     force: bool,
 ) -> Source:
+    # En incrementales cualquier cambio cuenta: se revisan todas las pistas, no una muestra.
+    incremental = u_ctx.settings.incremental_backups
     if tartape.exists(path) and not force:
         try:
             tape = tartape.Tape(path)
             with UI.loading("Verificando integridad de cinta..."):
-                tape.verify(raise_exception=True)
+                tape.verify(deep=incremental, raise_exception=True)
             return Source.get_or_create_from_tape(tape)
 
         except (peewee.DoesNotExist, TarIntegrityError):
@@ -47,7 +60,7 @@ def get_or_create_tape(
             path,
             exclude=exclusion_patterns,
             calculate_hashes=True,
-            overwrite=force,
+            overwrite=force or incremental,
         )
         return Source.create_from_tape(tape, exclusion_patterns)
 
@@ -57,9 +70,11 @@ def get_or_create_job(
     u_ctx: UploadContext,
     force: bool,
     wait_if_busy: bool = False,
+    md5sum: Optional[str] = None,
 ) -> Optional[Job]:
     """
     Obtiene el job asociado a un path. Si no existe, lo crea.
+    `md5sum` evita releer un archivo cuyo MD5 ya se calculó.
 
     Nota: Intenta obtener un lock para el archivo. Si no se puede obtener y wait_if_busy es False, retorna None
     """
@@ -74,11 +89,74 @@ def get_or_create_job(
                 source = get_or_create_tape(path, u_ctx, force)
             else:
                 with console.status(f"[dim]Procesando {path}...[/dim]"):
-                    source = Source.get_or_create_from_filepath(path)
+                    source = Source.get_or_create_from_filepath(path, md5sum)
     except Timeout:
         UI.info("Otro proceso esta trabajando con este archivo.")
         return
 
+    return _job_for_source(source, chat_db, path, u_ctx, force)
+
+
+def get_or_create_bundle_job(
+    files: List[Path],
+    u_ctx: UploadContext,
+    force: bool,
+    wait_if_busy: bool = False,
+) -> Optional[Job]:
+    """Obtiene o crea el Job de un paquete de archivos pequeños (ver `bundling`)."""
+    folder = files[0].parent
+    lock = u_ctx.state.manager.get_lock_for_path(folder)
+    timeout = None if wait_if_busy else 0.01
+
+    try:
+        with lock.acquire(timeout=timeout):
+            chat_db, _ = TelegramChat.get_or_create_from_chat(u_ctx.tg_chat)
+            stamps = SnapshotService.bundled_members(folder)
+            with console.status(f"[dim]Empaquetando {len(files)} archivos de {folder}...[/dim]"):
+                source = get_or_create_bundle_source(files, u_ctx.db, stamps)
+    except Timeout:
+        UI.info("Otro proceso esta trabajando con esta carpeta.")
+        return
+
+    return _job_for_source(source, chat_db, source.path, u_ctx, force)
+
+
+def plan_send(candidates: List[Path], u_ctx: UploadContext) -> List[List[Path]]:
+    """
+    Unidades de `send`: primero los paquetes de archivos pequeños y luego cada
+    archivo suelto como una lista de un elemento.
+    """
+    settings = u_ctx.settings
+    tg_limit = (
+        settings.tg_max_size_premium if u_ctx.owner.is_premium else settings.tg_max_size_normal
+    )
+    bundles, singles = plan_bundles(candidates, settings.bundle_small_files_bytes, tg_limit)
+    if bundles:
+        bundled = sum(len(b) for b in bundles)
+        UI.info(f"{bundled} archivos pequeños se envían en {len(bundles)} paquete(s).")
+    return bundles + [[path] for path in singles]
+
+
+def get_or_create_send_job(
+    unit: List[Path],
+    u_ctx: UploadContext,
+    force: bool,
+    wait_if_busy: bool = False,
+    md5sums: Optional[Dict[Path, str]] = None,
+) -> Optional[Job]:
+    """
+    Job de una unidad de `plan_send`. La ruta a subir es `job.source.path`.
+    `md5sums`: MD5 ya calculados (p. ej. `ScanReport.md5sums`).
+    """
+    if len(unit) > 1:
+        return get_or_create_bundle_job(unit, u_ctx, force, wait_if_busy)
+    md5sum = (md5sums or {}).get(unit[0])
+    return get_or_create_job(unit[0], u_ctx, force, wait_if_busy, md5sum)
+
+
+def _job_for_source(
+    source: Source, chat_db: TelegramChat, path: Path, u_ctx: UploadContext, force: bool
+) -> Job:
     job = Job.get_for_source_in_chat(source, chat_db)
     if job and not force:
         UI.info(f"Subida previa recuperada: [bold]{path.name}[/]")
@@ -96,13 +174,53 @@ def get_or_create_job(
         if u_ctx.owner.is_premium
         else u_ctx.settings.tg_max_size_normal
     )
-    job = Job.formalize_intent(source, chat_db, u_ctx.owner.is_premium, tg_limit)
+    base_job, delta_size = None, 0
+    if source.type == SourceType.FOLDER and u_ctx.settings.incremental_backups:
+        base_job = find_base_job(source, chat_db)
+        if base_job is not None:
+            with UI.loading("Comparando con la cinta anterior..."):
+                delta_size = compute_delta_size(source, base_job.source)
+            UI.info(
+                f"Cinta incremental: se suben {delta_size} de {source.size} bytes "
+                f"[dim](base: Job {base_job.id})[/]"
+            )
+
+    compression = resolve_compression(source, u_ctx.settings)
+    job = Job.formalize_intent(
+        source,
+        chat_db,
+        u_ctx.owner.is_premium,
+        tg_limit,
+        u_ctx.settings.tape_chunking,
+        base_job=base_job,
+        delta_size=delta_size,
+        compression=compression,
+        compression_level=u_ctx.settings.payload_compression_level,
+    )
     UI.success("Preparando subida.")
     return job
 
 
+def resolve_compression(source: Source, settings: Settings) -> PayloadCompression:
+    """
+    Compresión del Job. Las cintas con backups incrementales no se comprimen:
+    las siguientes cintas referencian rangos de sus volúmenes sin comprimir.
+    """
+    if PayloadCompression(settings.payload_compression) == PayloadCompression.NONE:
+        return PayloadCompression.NONE
+    if source.type == SourceType.FOLDER and settings.incremental_backups:
+        return PayloadCompression.NONE
+
+    with UI.loading("Analizando si el origen se puede comprimir..."):
+        compressible = should_compress(source)
+    if not compressible:
+        UI.info("El origen ya está comprimido: se sube sin recomprimir.")
+        return PayloadCompression.NONE
+    return PayloadCompression.ZSTD
+
+
 def prepare_upload_context(
-    state: CLIState, client: "Client", db: peewee.SqliteDatabase, settings: Settings
+    state: CLIState, client: "Client", db: peewee.Database, settings: Settings
 ) -> UploadContext:
     """
     Centraliza la inicialización de servicios y validación de red.
@@ -133,6 +251,7 @@ def prepare_upload_context(
             raise typer.Exit(1)
 
     discovery = DiscoveryService(client, db)
+    get_telemetry().export(settings.metrics_file, settings.metrics_port)
 
     node_id = get_node_id(state.manager.worktable)
     lease_manager = LeaseManager(db, node_id)
@@ -146,15 +265,41 @@ def prepare_upload_context(
         settings=settings,
         state=state,
         lease_manager=lease_manager,
+        writer=create_writer(db, settings.db_write_behind),
     )
 
 
 class InventoryEngine:
-    def __init__(self, settings: Settings, force: bool = False):
+    def __init__(
+        self, settings: Settings, force: bool = False, verify_snapshots: bool = False
+    ):
         self.settings = settings
         self.patterns = settings.exclude_files
         self.max_size = settings.max_filesize_bytes
         self.force = force
+        # Con snapshot, un archivo solo se descarta si el snapshot es de su
+        # contenido actual (watch y daemon: los archivos modificados vuelven).
+        self.verify_snapshots = verify_snapshots
+        # Archivos enviados en paquetes, por carpeta (del índice de snapshots).
+        self._bundled: Dict[Path, dict] = {}
+
+    def _is_bundled(self, path: Path) -> bool:
+        """¿Está el archivo, sin cambios, en un paquete ya enviado?"""
+        if path.parent not in self._bundled:
+            self._bundled[path.parent] = SnapshotService.bundled_members(path.parent)
+        stamp = self._bundled[path.parent].get(path.name)
+        stat = path.stat()
+        return stamp_matches(stamp, stat.st_size, stat.st_mtime)
+
+    def _is_uploaded(self, path: Path, report: ScanReport) -> bool:
+        """¿Tiene el archivo un snapshot propio o está en un paquete enviado?"""
+        if self._is_bundled(path):
+            return True
+        if not has_snapshot(path):
+            return False
+        if not self.verify_snapshots:
+            return True
+        return SnapshotService.describes_current_content(path, report.md5sums)
 
     def _validate_file(
         self, path: Path, report: ScanReport, check_snapshot: bool
@@ -162,10 +307,10 @@ class InventoryEngine:
         """
         Comprueba: Patrones, Tamaño y (opcionalmente) Snapshot.
         """
-        if path.suffix == ".xz" and path.name.endswith(".json.xz"):
+        if is_snapshot_file(path):
             return False
 
-        if check_snapshot and has_snapshot(path):
+        if check_snapshot and self._is_uploaded(path, report):
             if not self.force:
                 report.log_skip(path, "snapshot")
                 return False
@@ -189,8 +334,16 @@ class InventoryEngine:
             report.log_skip(path, "exclusion")
             return False
 
+        # Con backups incrementales, una carpeta archivada que cambió se vuelve a subir.
+        tape = tartape.get_tape(path)
+        changed = (
+            self.settings.incremental_backups
+            and tape is not None
+            and not tape.verify(deep=True)
+        )
+
         # Si la carpeta ya fue archivada como tal.
-        if has_snapshot(path):
+        if has_snapshot(path) and not changed:
             if not self.force:
                 report.log_skip(path, "snapshot")
                 return False
@@ -199,8 +352,7 @@ class InventoryEngine:
             report.log_skip(path, "empty")
             return False
 
-        tape = tartape.get_tape(path)
-        if tape is not None and not self.force:
+        if tape is not None and not self.force and not changed:
             if not tape.verify(deep=False):
                 report.log_skip(path, "integrity")
                 return False
@@ -238,3 +390,19 @@ class InventoryEngine:
                 if self._validate_file(p, report, check_snapshot=False):
                     report.found.append(p)
         return report
+
+
+def resolve_helper_profiles(
+    state: CLIState, profile_name: str, helpers: List[str]
+) -> List[str]:
+    """Valida los perfiles ayudantes del fan-out. Lanza typer.Exit si alguno no sirve."""
+    if not helpers:
+        return []
+
+    from totelegram.fanout import validate_helper_profiles
+
+    try:
+        return validate_helper_profiles(state.manager, profile_name, helpers)
+    except (IOError, ValueError) as e:
+        UI.error(f"Perfil ayudante inválido: {e}")
+        raise typer.Exit(1)
@@ -14,10 +14,15 @@ from rich.table import Table
 from rich.text import Text
 from rich.theme import Theme
 
-from totelegram.database import DatabaseSession
 from totelegram.identity import Profile, Settings, SettingsManager
-from totelegram.models import TelegramChat
-from totelegram.schemas import COLORS, AccessLevel, ChatMatch, Commands, ScanReport
+from totelegram.schemas import (
+    COLORS,
+    AccessLevel,
+    ChatMatch,
+    Commands,
+    QueueStatus,
+    ScanReport,
+)
 
 Spacing = Optional[Literal["top", "bottom", "block"]]
 
@@ -55,6 +60,10 @@ def get_friendly_chat_name(chat_id: str, database_path: str) -> str:
 
     # IDs Numéricos
     if val.replace("-", "").isdigit():
+        # Importación diferida: peewee y los modelos no son necesarios al arrancar la CLI.
+        from totelegram.database import DatabaseSession
+        from totelegram.models import TelegramChat
+
         try:
             with DatabaseSession(database_path):
                 chat = TelegramChat.get_or_none(TelegramChat.id == int(val))
@@ -432,7 +441,9 @@ class DisplayConfig:
 
             # Si es CHAT_ID, lo hace amigable.
             if field_name.lower() == "chat_id":
-                value = get_friendly_chat_name(value, str(maneger.database_path))
+                value = get_friendly_chat_name(
+                    value, settings.database_url or str(maneger.database_path)
+                )
 
             # Oculta value sencille
             if info.is_sensitive:
@@ -662,3 +673,41 @@ class DisplayGeneric:
         UI.warn("No tienes permisos de escritura en el chat.")
         UI.warn("Corrige los permisos antes de intentar cualquier subida.")
         UI.warn("Configuración 'chat_id' no actualizada.")
+
+
+class DisplayQueue:
+    STATUS_STYLES = {
+        QueueStatus.PENDING: "[yellow]PENDIENTE[/]",
+        QueueStatus.RUNNING: "[cyan]EN CURSO[/]",
+        QueueStatus.DONE: "[green]HECHO[/]",
+        QueueStatus.FAILED: "[red]FALLIDO[/]",
+    }
+
+    @classmethod
+    def render_queue(cls, profile_name: str, counts: dict, entries: list):
+        summary = ", ".join(
+            f"{cls.STATUS_STYLES.get(status, status.value)}: {count}"
+            for status, count in counts.items()
+        )
+        UI.info(f"Cola de [bold]{profile_name}[/] → {summary or '[dim]vacía[/]'}")
+        if not entries:
+            return
+
+        table = Table(title="Últimas entradas", title_style=COLORS.TABLE_TITLE)
+        table.add_column("#", style="dim", justify="right")
+        table.add_column("Estado", no_wrap=True)
+        table.add_column("Modo")
+        table.add_column("Ruta")
+        table.add_column("Intentos", justify="right")
+        table.add_column("Error", style="dim")
+
+        for entry in entries:
+            table.add_row(
+                str(entry.id),
+                cls.STATUS_STYLES.get(entry.status, entry.status.value),
+                entry.mode.value,
+                escape(entry.path_str),
+                str(entry.attempts),
+                escape(entry.error or ""),
+            )
+        console.print(table)
@@ -1,27 +1,62 @@
-
 import logging
 import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
-from typing import cast
+from typing import Callable, Dict, List, Optional, cast
 
 import peewee
 
-from totelegram.database import db_transaction
+from totelegram.database import db_connection, db_transaction
 from totelegram.models import Claim, ResourceType
 
 logger = logging.getLogger(__name__)
 
+LeaseLostCallback = Callable[[str], None]
+
+
+@dataclass
+class HeldLease:
+    """Lease que este proceso mantiene vivo. `holders` cuenta los bloques que lo usan."""
+
+    ttl_minutes: int
+    holders: int = 0
+    callbacks: List[LeaseLostCallback] = field(default_factory=list)
+
+
 class LeaseManager:
-    def __init__(self, db: peewee.Database, node_id: str):
+    """
+    Leases (locks con caducidad) en la tabla `Claim`, coordinados entre nodos.
+
+    Los leases en uso se registran con `hold()`. Un único hilo de heartbeat los
+    renueva todos con un UPDATE por ciclo (en vez de un hilo y una transacción
+    por lease), borra los `Claim` caducados de cualquier nodo y avisa con los
+    callbacks `on_lost` cuando un lease dejó de ser nuestro.
+    """
+
+    def __init__(
+        self,
+        db: peewee.Database,
+        node_id: str,
+        heartbeat_interval: Optional[float] = None,
+    ):
         self.db = db
         self.node_id = node_id
+        # Por defecto se renueva a la mitad del TTL más corto en uso.
+        self.heartbeat_interval = heartbeat_interval
+
+        self._held: Dict[str, HeldLease] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
 
     def renew(self, resource_id: str, ttl_minutes: int = 5) -> bool:
         """Renueva el tiempo de expiración de un lock si aún nos pertenece."""
         expires = datetime.now() + timedelta(minutes=ttl_minutes)
         try:
-            # connection_context() es VITAL aquí porque Peewee usa conexiones thread-local.
-            with self.db.connection_context():
+            # Se llama desde el hilo del heartbeat, que necesita su propia conexión.
+            with db_connection(self.db):
                 with db_transaction(self.db):
                     claim = cast(Claim,Claim.get_or_none(Claim.resource_id == resource_id))
                     if claim and claim.node_id == self.node_id:
@@ -52,63 +87,207 @@ class LeaseManager:
                 )
                 return True
         except peewee.IntegrityError:
-            # Ya existe, comprobamos si es nuestro o si está expirado
-            claim = cast(Claim,Claim.get_or_none(Claim.resource_id == resource_id))
-            if claim:
-                if claim.node_id == self.node_id:
-                    # Es nuestro, renovamos
-                    claim.expires_at = expires
-                    claim.save(only=[Claim.expires_at, Claim.updated_at])
-                    return True
-
-                if datetime.now() > claim.expires_at:
-                    # Expiró, lo robamos
-                    claim.node_id = self.node_id
-                    claim.expires_at = expires
-                    claim.save(only=[Claim.node_id, Claim.expires_at, Claim.updated_at])
+            # Ya existe: lo tomamos solo si es nuestro (renovación) o expiró (robo).
+            # El UPDATE condicionado es atómico: si dos nodos intentan robar el mismo
+            # lease, el motor serializa ambos sobre la fila y solo uno lo consigue.
+            with db_transaction(self.db):
+                claim = cast(Claim, Claim.get_or_none(Claim.resource_id == resource_id))
+                taken = (
+                    Claim.update(node_id=self.node_id, expires_at=expires, updated_at=now)
+                    .where(
+                        (Claim.resource_id == resource_id)
+                        & ((Claim.node_id == self.node_id) | (Claim.expires_at < now))
+                    )
+                    .execute()
+                )
+
+            if taken:
+                if claim and claim.node_id != self.node_id:
                     logger.info(f"Lock robado para {resource_id}")
-                    return True
+                return True
 
             logger.warning(f"Recurso {resource_id} bloqueado por otro nodo: {claim.node_id if claim else 'unknown'}")
             return False
 
     def release(self, resource_id: str):
+        with self._lock:
+            self._held.pop(resource_id, None)
         Claim.delete().where(Claim.resource_id == resource_id).execute()
 
+    # --- Registro y heartbeat ---
+
+    def hold(
+        self,
+        resource_id: str,
+        ttl_minutes: int = 5,
+        on_lost: Optional[LeaseLostCallback] = None,
+    ):
+        """Mantiene vivo un lease ya adquirido hasta el `unhold()` correspondiente."""
+        with self._lock:
+            lease = self._held.setdefault(resource_id, HeldLease(ttl_minutes))
+            lease.ttl_minutes = min(lease.ttl_minutes, ttl_minutes)
+            lease.holders += 1
+            if on_lost is not None:
+                lease.callbacks.append(on_lost)
+
+            if self._thread is None:
+                self._wake.clear()
+                self._thread = threading.Thread(
+                    target=self._heartbeat, name="lease-heartbeat", daemon=True
+                )
+                self._thread.start()
+            else:
+                # El intervalo puede haber cambiado con el nuevo TTL.
+                self._wake.set()
+
+    def unhold(self, resource_id: str, on_lost: Optional[LeaseLostCallback] = None):
+        """Deja de renovar el lease (no lo libera: eso es `release()`)."""
+        with self._lock:
+            lease = self._held.get(resource_id)
+            if lease is None:
+                return
+            if on_lost in lease.callbacks:
+                lease.callbacks.remove(on_lost)
+            lease.holders -= 1
+            if lease.holders <= 0:
+                del self._held[resource_id]
+            if not self._held:
+                self._wake.set()
+
+    def held(self) -> List[str]:
+        with self._lock:
+            return list(self._held)
+
+    def _interval(self) -> float:
+        if self.heartbeat_interval is not None:
+            return self.heartbeat_interval
+        with self._lock:
+            ttl = min((lease.ttl_minutes for lease in self._held.values()), default=5)
+        return ttl * 60 / 2.0
+
+    def _heartbeat(self):
+        # Conexión propia durante toda la vida del hilo.
+        with db_connection(self.db):
+            last_renewal = time.monotonic()
+            while True:
+                # Un `hold()` despierta al hilo para acortar el intervalo, pero la
+                # renovación sigue contando desde la última: despertar no la aplaza.
+                remaining = last_renewal + self._interval() - time.monotonic()
+                if remaining > 0:
+                    self._wake.wait(remaining)
+                with self._lock:
+                    if not self._held:
+                        self._thread = None
+                        return
+                    self._wake.clear()
+                if time.monotonic() - last_renewal >= self._interval():
+                    self.renew_held()
+                    last_renewal = time.monotonic()
+
+    def renew_held(self) -> List[str]:
+        """
+        Renueva todos los leases registrados y recoge los `Claim` caducados.
+
+        Los leases que ya no son de este nodo (robados tras caducar o borrados)
+        salen del registro y disparan sus callbacks. Devuelve sus IDs.
+        """
+        with self._lock:
+            held = dict(self._held)
+        if not held:
+            return []
+
+        now = datetime.now()
+        by_ttl: Dict[int, List[str]] = defaultdict(list)
+        for resource_id, lease in held.items():
+            by_ttl[lease.ttl_minutes].append(resource_id)
+
+        try:
+            with db_connection(self.db):
+                with db_transaction(self.db):
+                    for ttl, resource_ids in by_ttl.items():
+                        Claim.update(
+                            expires_at=now + timedelta(minutes=ttl), updated_at=now
+                        ).where(
+                            Claim.resource_id.in_(resource_ids)
+                            & (Claim.node_id == self.node_id)
+                        ).execute()
+
+                    owned = {
+                        claim.resource_id
+                        for claim in Claim.select(Claim.resource_id).where(
+                            Claim.resource_id.in_(list(held))
+                            & (Claim.node_id == self.node_id)
+                        )
+                    }
+                    # Los nuestros ya se renovaron: solo caen los abandonados.
+                    collected = Claim.delete().where(Claim.expires_at < now).execute()
+        except Exception as e:
+            # Un fallo transitorio no es una pérdida: se reintenta en el próximo ciclo.
+            logger.error(f"Error renovando leases {sorted(held)}: {e}")
+            return []
+
+        if collected:
+            logger.debug(f"Heartbeat: {collected} lease(s) caducado(s) eliminado(s).")
+
+        lost = []
+        with self._lock:
+            for resource_id, lease in held.items():
+                # Si se liberó mientras tanto, no es una pérdida.
+                if resource_id not in owned and self._held.get(resource_id) is lease:
+                    del self._held[resource_id]
+                    lost.append(resource_id)
+
+        for resource_id in lost:
+            logger.warning(
+                f"Peligro: Se perdió el lease de {resource_id}. "
+                "¿Fue robado por otro nodo o eliminado?"
+            )
+            for callback in held[resource_id].callbacks:
+                try:
+                    callback(resource_id)
+                except Exception as e:
+                    logger.error(f"Error en el aviso de pérdida de {resource_id}: {e}")
+        return lost
+
+    def stop(self):
+        """Detiene el heartbeat. Los leases quedan en la DB hasta caducar o liberarse."""
+        with self._lock:
+            self._held.clear()
+            thread = self._thread
+        self._wake.set()
+        if thread is not None:
+            thread.join(timeout=2.0)
+
+
 class LeaseKeeper:
     """
-    Context Manager que lanza un hilo en segundo plano para mantener vivo
-    un Lease (lock) renovándolo periódicamente.
+    Context Manager que mantiene vivo un Lease (lock) mientras dura el bloque.
+
+    La renovación la hace el heartbeat compartido del `LeaseManager`. `lost` se
+    activa si el lease deja de ser nuestro, para que el trabajo pueda abortar.
     """
-    def __init__(self, manager: LeaseManager, resource_id: str, ttl_minutes: int = 5):
+
+    def __init__(
+        self,
+        manager: LeaseManager,
+        resource_id: str,
+        ttl_minutes: int = 5,
+        on_lost: Optional[LeaseLostCallback] = None,
+    ):
         self.manager = manager
         self.resource_id = resource_id
         self.ttl_minutes = ttl_minutes
+        self.on_lost = on_lost
+        self.lost = threading.Event()
 
-        # Renovamos el lock cuando haya transcurrido la mitad del tiempo de vida
-        self.interval_seconds = (ttl_minutes * 60) / 2.0
-
-        self._stop_event = threading.Event()
-        self._thread = None
-
-    def _heartbeat(self):
-        # wait() devuelve True si el evento se setea (cuando hacemos stop),
-        # o False si ocurre el timeout (lo cual usamos como nuestro timer).
-        while not self._stop_event.wait(self.interval_seconds):
-            logger.debug(f"Heartbeat: Renovando lease para {self.resource_id}...")
-            success = self.manager.renew(self.resource_id, self.ttl_minutes)
-            if not success:
-                logger.warning(
-                    f"Peligro: No se pudo renovar el lease para {self.resource_id}. "
-                    "¿Fue robado por otro nodo o eliminado?"
-                )
+    def _lost(self, resource_id: str):
+        self.lost.set()
+        if self.on_lost is not None:
+            self.on_lost(resource_id)
 
     def __enter__(self):
-        self._thread = threading.Thread(target=self._heartbeat, daemon=True, name=f"Heartbeat-{self.resource_id}")
-        self._thread.start()
+        self.manager.hold(self.resource_id, self.ttl_minutes, on_lost=self._lost)
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self._stop_event.set()
-        if self._thread:
-            self._thread.join(timeout=2.0)
+        self.manager.unhold(self.resource_id, on_lost=self._lost)
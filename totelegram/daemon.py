@@ -0,0 +1,163 @@
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import peewee
+
+from totelegram.cli.logic import (
+    InventoryEngine,
+    get_or_create_job,
+    get_or_create_send_job,
+    plan_send,
+)
+from totelegram.cli.ui import UI
+from totelegram.database import db_read, db_transaction
+from totelegram.models import QueueEntry
+from totelegram.schemas import QueueMode, QueueStatus
+from totelegram.types import UploadContext
+from totelegram.uploader import UploadService
+
+logger = logging.getLogger(__name__)
+
+
+class UploadDaemon:
+    """
+    Procesa la cola de subidas de un perfil con una única sesión abierta.
+
+    La sesión de Telegram, la base de datos y el `UploadService` se crean una vez
+    al arrancar; cada entrada de la cola solo paga el escaneo y la subida.
+    """
+
+    def __init__(self, u_ctx: UploadContext, poll_interval: float = 2.0):
+        self.u_ctx = u_ctx
+        self.settings = u_ctx.settings
+        self.profile_name = u_ctx.settings.profile_name
+        self.poll_interval = poll_interval
+        self.uploader = UploadService(u_ctx)
+        self._stop = threading.Event()
+
+    def stop(self):
+        self._stop.set()
+
+    def run(self, once: bool = False):
+        """
+        Bucle principal. Con `once=True` vacía la cola y termina (útil en cron).
+        """
+        with db_transaction(self.u_ctx.db):
+            recovered = QueueEntry.requeue_running(self.profile_name)
+        if recovered:
+            logger.info(f"{recovered} entradas interrumpidas devueltas a la cola.")
+
+        while not self._stop.is_set():
+            with db_transaction(self.u_ctx.db):
+                entry = QueueEntry.claim_next(self.profile_name)
+
+            if entry is None:
+                if once:
+                    break
+                self._stop.wait(self.poll_interval)
+                continue
+
+            self.process_entry(entry)
+
+    def process_entry(self, entry: QueueEntry):
+        UI.separator()
+        UI.info(f"Procesando [bold]{entry.path.name}[/] [dim](cola #{entry.id}, {entry.mode.value})[/]")
+        try:
+            self._process_paths(entry)
+        except Exception as e:
+            logger.error(f"Fallo procesando la entrada {entry.id}: {e}", exc_info=True)
+            UI.error(f"Fallo en {entry.path.name}: {e}")
+            with db_transaction(self.u_ctx.db):
+                entry.mark_failed(str(e))
+            return
+
+        with db_transaction(self.u_ctx.db):
+            entry.mark_done()
+
+    def _process_paths(self, entry: QueueEntry):
+        if not entry.path.exists():
+            raise FileNotFoundError(f"La ruta ya no existe: {entry.path}")
+
+        candidates, md5sums = self._scan(entry)
+        if not candidates:
+            UI.info("Nada que subir (ya tiene snapshot o está excluido).")
+            return
+
+        if entry.mode == QueueMode.BACKUP:
+            units = [[path] for path in candidates]
+        else:
+            units = plan_send(candidates, self.u_ctx)
+
+        for idx, unit in enumerate(units, 1):
+            is_last = idx == len(units)
+            if entry.mode == QueueMode.BACKUP:
+                job = get_or_create_job(unit[0], self.u_ctx, entry.force, wait_if_busy=True)
+            else:
+                job = get_or_create_send_job(
+                    unit, self.u_ctx, entry.force, wait_if_busy=True, md5sums=md5sums
+                )
+            if job is None:
+                continue
+            # is_last libera el lock de cuenta al terminar cada entrada: mientras
+            # el daemon está ocioso, otros nodos pueden usar la cuenta.
+            self.uploader.process_job(job, job.source.path, is_last)
+
+    def _scan(self, entry: QueueEntry) -> Tuple[List[Path], Dict[Path, str]]:
+        """Candidatos de la entrada y los MD5 que ya se conocen de ellos."""
+        if entry.is_verified:
+            # `watch` ya la filtró y el archivo no cambió desde entonces.
+            md5sums = {entry.path: entry.md5sum} if entry.md5sum else {}
+            return [entry.path], md5sums
+
+        # Las entradas de `daemon submit`: un archivo que cambió después de
+        # su snapshot se vuelve a subir.
+        engine = InventoryEngine(self.settings, entry.force, verify_snapshots=True)
+        if entry.mode == QueueMode.BACKUP:
+            report = engine.scan_backup_inventory([entry.path])
+        else:
+            report = engine.scan_granular([entry.path])
+        return report.found, report.md5sums
+
+
+def submit_paths(
+    db: peewee.Database,
+    profile_name: str,
+    paths: List[Path],
+    mode: QueueMode,
+    force: bool = False,
+    md5sums: Optional[Dict[Path, str]] = None,
+) -> List[QueueEntry]:
+    """
+    Encola rutas para el daemon del perfil. No necesita sesión de Telegram.
+    Con `md5sums` las rutas cuentan como ya filtradas (ver `QueueEntry.submit`).
+    """
+    with db_transaction(db):
+        return QueueEntry.submit(profile_name, paths, mode, force, md5sums)
+
+
+def queue_summary(
+    db: peewee.Database, profile_name: str, limit: int = 20
+) -> Tuple[Dict[QueueStatus, int], List[QueueEntry]]:
+    """Conteo por estado y últimas entradas de la cola de un perfil, en una misma lectura."""
+    with db_read(db):
+        return _queue_counts(profile_name), list(
+            QueueEntry.select()
+            .where(QueueEntry.profile_name == profile_name)
+            .order_by(QueueEntry.id.desc())
+            .limit(limit)
+        )
+
+
+def _queue_counts(profile_name: str) -> Dict[QueueStatus, int]:
+    counts = {
+        status: count
+        for status, count in (
+            QueueEntry.select(QueueEntry.status, peewee.fn.COUNT(QueueEntry.id))
+            .where(QueueEntry.profile_name == profile_name)
+            .group_by(QueueEntry.status)
+            .tuples()
+        )
+    }
+    return {QueueStatus(k): v for k, v in counts.items()}
@@ -1,21 +1,26 @@
 import logging
 import math
-import time
-from typing import TYPE_CHECKING, List, Union, cast
+from typing import TYPE_CHECKING, List, Optional, Union, cast
 
 import peewee
 
 from totelegram.database import db_transaction
 from totelegram.models import Job, Payload, RemotePayload
-from totelegram.schemas import AvailabilityState, JobStatus
+from totelegram.packaging import Chunker
+from totelegram.schemas import AvailabilityState, JobStatus, SourceType
 from totelegram.types import AvailabilityReport
 from totelegram.utils import batched
 
 if TYPE_CHECKING:
     from pyrogram.client import Client
 
+    from totelegram.models import TelegramUser
+
 logger = logging.getLogger(__name__)
 
+# Espejos de una pieza que se validan en Telegram antes de rendirse y subirla.
+MAX_MIRROR_CANDIDATES = 5
+
 
 class DiscoveryService:
     def __init__(self, client: "Client", db: peewee.Database):
@@ -71,6 +76,64 @@ class DiscoveryService:
                     return remotes
         return None
 
+    def _content_mirrors(
+        self, payload: Payload, head_md5: Optional[str] = None
+    ) -> peewee.ModelSelect:
+        query = (
+            RemotePayload.select(RemotePayload, Payload)
+            .join(Payload)
+            .where(
+                (Payload.size == payload.size)
+                & (Payload.md5sum.is_null(False))
+                & (Payload.packed_size.is_null())  # type: ignore
+                & (Payload.id != payload.id)
+                & (RemotePayload.is_orphaned == False)  # noqa: E712
+            )
+        )
+        if head_md5 is not None:
+            query = query.where(Payload.head_md5 == head_md5)
+        return query
+
+    def has_content_candidates(self, payload: Payload, head_md5: str) -> bool:
+        """
+        ¿Hay alguna pieza subida del mismo tamaño y con el mismo primer MiB?
+        Con cortes fijos casi todas las piezas miden lo mismo: sin el MD5 del
+        inicio, cada pieza grande se leería entera antes de subirla.
+        """
+        return self._content_mirrors(payload, head_md5).exists()
+
+    def find_payload_mirror(
+        self, payload: Payload, md5sum: str, owner: "TelegramUser"
+    ) -> Optional[RemotePayload]:
+        """
+        Busca en Telegram una pieza con el mismo contenido (tamaño y MD5).
+
+        Prefiere las publicadas por `owner` y, entre ellas, las más recientes. Un
+        espejo cuyo chat ya no es accesible se descarta y se prueba el siguiente.
+        """
+        from pyrogram.errors import FloodWait
+
+        candidates = (
+            self._content_mirrors(payload)
+            .where(Payload.md5sum == md5sum)
+            .order_by(
+                (RemotePayload.owner == owner).desc(),
+                RemotePayload.updated_at.desc(),  # type: ignore
+            )
+            .limit(MAX_MIRROR_CANDIDATES)
+        )
+        for remote in candidates:
+            try:
+                if self._validate_jit_batch([remote]):
+                    return remote
+            except FloodWait:
+                raise
+            except Exception as e:
+                logger.debug(
+                    f"Espejo {remote.message_id} del chat {remote.chat_id} inaccesible: {e}"
+                )
+        return None
+
     def is_fulfilled_local(self, job: Job) -> bool:
         """Verifica si el Job actual ya está completo en el destino."""
 
@@ -108,43 +171,53 @@ class DiscoveryService:
 
         from pyrogram.types import Message
 
+        # Las consultas a Telegram van fuera de la transacción: el semáforo de
+        # escritura no debe quedar tomado durante viajes de red.
+        fetched: List[Message] = []
+        for batch_ids in batched(msg_ids, 200):
+            messages = cast(Union[Message, List[Message]], self.client.get_messages(chat_id, batch_ids))
+            if isinstance(messages, Message):
+                messages = [messages]
+            fetched.extend(messages)
+
         with db_transaction(self.db):
-            for batch_ids in batched(msg_ids, 200):
-                messages = cast(Union[Message, List[Message]], self.client.get_messages(chat_id, batch_ids))
-                if isinstance(messages, Message):
-                    messages = [messages]
-
-                for msg in messages:
-                    remote = next(
-                        (r for r in to_verify if r.message_id == msg.id), None
+            for msg in fetched:
+                remote = next(
+                    (r for r in to_verify if r.message_id == msg.id), None
+                )
+                if not remote:
+                    continue
+
+                # Si un solo mensaje del set falló, el espejo no es íntegro
+                if (
+                    msg is None
+                    or getattr(msg, "empty", True)
+                    or not msg.document
+                ):
+                    remote.mark_orphaned()
+                    is_integral = False
+                    logger.warning(
+                        f"Mensaje {remote.message_id} no encontrado o vacío en Telegram. Marcando como huérfano."
                     )
-                    if not remote:
-                        continue
-
-                    # Si un solo mensaje del set falló, el espejo no es íntegro
-                    if (
-                        msg is None
-                        or getattr(msg, "empty", True)
-                        or not msg.document
-                    ):
-                        remote.mark_orphaned()
-                        is_integral = False
-                        logger.warning(
-                            f"Mensaje {remote.message_id} no encontrado o vacío en Telegram. Marcando como huérfano."
-                        )
-                        continue
-
-                    # Verificación extra: ¿El tamaño coincide? (Anti-edición)
-                    if msg.document.file_size != remote.payload.size:
-                        remote.mark_orphaned()
-                        is_integral = False
-                    else:
-                        remote.mark_verified(msg)
-
-                time.sleep(0.5)
-            return is_integral
+                    continue
+
+                # Verificación extra: ¿El tamaño coincide? (Anti-edición)
+                if msg.document.file_size != remote.payload.upload_size:
+                    remote.mark_orphaned()
+                    is_integral = False
+                else:
+                    remote.mark_verified(msg)
+        return is_integral
 
 
     def _get_expected_count(self, job: Job) -> int:
-        # BUG: comprobar si matematicamente esta comprobacion funciona para las cintas.
-        return math.ceil(job.source.size / job.config.tg_max_size)
+        """
+        Piezas que completan el Job. En una cinta los volúmenes pueden medir
+        distinto (cortes por contenido), así que se cuentan los planificados;
+        un Job sin planificar del todo no puede estar completo.
+        """
+        if job.source.type == SourceType.FILE:
+            return math.ceil(job.source.size / job.config.tg_max_size)
+        if not Chunker.is_planned(job):
+            return 0
+        return job.payloads.count()
@@ -0,0 +1,117 @@
+import logging
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import IO, Dict, List, Optional, Sequence
+
+from totelegram.identity import SettingsManager
+
+logger = logging.getLogger(__name__)
+
+
+def validate_helper_profiles(
+    manager: SettingsManager, profile_name: str, helpers: Sequence[str]
+) -> List[str]:
+    """
+    Comprueba que los perfiles ayudantes existan, usen cuentas distintas y el
+    mismo catálogo que el perfil principal.
+
+    Dos perfiles de la misma cuenta comparten sus límites de Telegram y su lease
+    `account:<id>`, así que no suman capacidad. Un ayudante con otro catálogo
+    (`database_url`) buscaría el Job por su id en la base de datos equivocada.
+    """
+    primary = manager.get_settings(profile_name)
+    primary_db = manager.get_database_target(profile_name)
+    seen_accounts = {primary.telegram_account_id} - {None}
+    valid = []
+    for helper in dict.fromkeys(helpers):
+        if helper == profile_name:
+            raise ValueError(f"El perfil '{helper}' ya es el perfil principal.")
+
+        settings = manager.get_settings(helper)
+        if manager.get_database_target(helper) != primary_db:
+            raise ValueError(
+                f"El perfil '{helper}' usa otro catálogo (database_url) que '{profile_name}'."
+            )
+
+        account_id = settings.telegram_account_id
+        if account_id is not None and account_id in seen_accounts:
+            raise ValueError(
+                f"El perfil '{helper}' usa la misma cuenta ({account_id}) que otro perfil."
+            )
+        seen_accounts.add(account_id)
+        valid.append(helper)
+    return valid
+
+
+class HelperPool:
+    """
+    Lanza un proceso `totelegram --use <perfil> assist <job_id>` por perfil ayudante.
+
+    Cada ayudante abre su propia sesión de Telegram y toma su propio lease de
+    cuenta; las piezas se reparten con el mismo candado por pieza (`FileLock`)
+    que ya coordina varios nodos, y todas se publican en el chat del Job.
+    """
+
+    def __init__(
+        self, profiles: Sequence[str], debug: bool = False, log_dir: Optional[Path] = None
+    ):
+        self.profiles = list(profiles)
+        self.debug = debug
+        # stderr de cada ayudante: un fallo antes de configurar su log queda aquí.
+        self.log_dir = log_dir
+        self._procs: Dict[str, subprocess.Popen] = {}
+        self._stderr: Dict[str, IO[bytes]] = {}
+
+    def _command(self, profile: str, job_id: int) -> List[str]:
+        cmd = [sys.executable, "-m", "totelegram.cli", "--use", profile]
+        if self.debug:
+            cmd.append("--debug")
+        return cmd + ["assist", str(job_id)]
+
+    def _stderr_path(self, profile: str, job_id: int) -> Optional[Path]:
+        if self.log_dir is None:
+            return None
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        return self.log_dir / f"{timestamp}_assist_{profile}_job{job_id}.stderr.log"
+
+    def start(self, job_id: int):
+        for profile in self.profiles:
+            cmd = self._command(profile, job_id)
+            logger.info(f"Lanzando ayudante '{profile}' para el Job {job_id}: {cmd}")
+            # La salida de cada ayudante va a su propio log (ver setup_logging);
+            # en consola solo se muestra el progreso del perfil principal.
+            stderr_path = self._stderr_path(profile, job_id)
+            stderr = subprocess.DEVNULL
+            if stderr_path is not None:
+                stderr_path.parent.mkdir(parents=True, exist_ok=True)
+                stderr = self._stderr[profile] = open(stderr_path, "wb")
+            self._procs[profile] = subprocess.Popen(
+                cmd,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=stderr,
+            )
+
+    def wait(self, timeout: Optional[float] = None) -> Dict[str, int]:
+        """Espera a todos los ayudantes. Devuelve {perfil: código de salida}."""
+        codes = {}
+        for profile, proc in self._procs.items():
+            codes[profile] = proc.wait(timeout=timeout)
+            stderr = self._stderr.pop(profile, None)
+            if stderr is not None:
+                stderr.close()
+            if codes[profile] != 0:
+                where = f" Detalles en {stderr.name}." if stderr is not None else ""
+                logger.warning(
+                    f"El ayudante '{profile}' terminó con código {codes[profile]}.{where}"
+                )
+        self._procs.clear()
+        return codes
+
+    def terminate(self):
+        for proc in self._procs.values():
+            if proc.poll() is None:
+                proc.terminate()
+        self.wait(timeout=10)
@@ -0,0 +1,182 @@
+"""
+Cintas incrementales de carpetas.
+
+Cambiar un archivo cambia el fingerprint de la carpeta (ADR-006) y, con ello,
+toda la cinta. Una cinta incremental solo contiene los archivos nuevos o
+modificados respecto a la última cinta subida de la misma carpeta al mismo chat
+(su Job base). Los archivos sin cambios no se vuelven a subir: su GPS apunta a
+los volúmenes de las cintas anteriores, que ya están en Telegram.
+
+El delta es una cinta TAR propia: los archivos cambiados, en el orden del
+catálogo, recolocados uno tras otro y cerrados con el pie TAR. Su disposición se
+deduce del catálogo de `tartape` y de los miembros del Job base, así que
+planificador y subida la recalculan igual sin guardarla.
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from tartape.constants import TAR_FOOTER_SIZE
+from tartape.models import Track
+from tartape.schemas import ByteWindow, EntryMetadata, ManifestEntry, VolumeManifest
+
+from totelegram.models import Job, Payload, Source, TapeMember
+from totelegram.schemas import JobStatus, PayloadCompression, SourceType
+from totelegram.utils import open_tape_catalog
+
+logger = logging.getLogger(__name__)
+
+# Pasada esta cadena de incrementales, el siguiente backup vuelve a ser completo:
+# acota cuántos Jobs hay que leer para restaurar una carpeta.
+MAX_CHAIN_LENGTH = 30
+
+
+@dataclass(frozen=True)
+class DeltaTrack:
+    """Archivo de la cinta incremental, con offsets dentro del delta (imita a `tartape.models.Track`)."""
+
+    start_offset: int
+    end_offset: int
+    metadata: EntryMetadata
+
+    def to_metadata(self) -> EntryMetadata:
+        return self.metadata
+
+
+def find_base_job(source: Source, chat) -> Optional[Job]:
+    """
+    Última cinta subida de la misma carpeta al chat, si sirve como base.
+
+    No sirve si algún Job de su cadena fue eliminado (sus mensajes quedaron
+    huérfanos) o si la cadena ya alcanzó `MAX_CHAIN_LENGTH`.
+    """
+    base = (
+        Job.select(Job, Source)
+        .join(Source)
+        .where(
+            (Source.path_str == source.path_str)
+            & (Source.type == SourceType.FOLDER)
+            & (Source.id != source.id)
+            & (Job.chat == chat)
+            & (Job.status == JobStatus.UPLOADED)
+            & (Job.deleted_at == 0)
+        )
+        .order_by(Job.id.desc())
+        .first()
+    )
+    if base is None:
+        return None
+
+    if base.config.compression != PayloadCompression.NONE:
+        # Los fragmentos referenciados son rangos sin comprimir de sus volúmenes.
+        logger.info(f"La última cinta de {source.path_str} está comprimida: se sube completa.")
+        return None
+
+    lineage = base.lineage()
+    if len(lineage) >= MAX_CHAIN_LENGTH:
+        logger.info(
+            f"La cadena incremental de {source.path_str} llegó a {len(lineage)} cintas: "
+            "se sube una cinta completa."
+        )
+        return None
+
+    alive = Job.select().where((Job.id << lineage) & (Job.deleted_at == 0)).count()
+    if alive != len(lineage):
+        logger.info(f"La cadena incremental de {source.path_str} está rota: se sube completa.")
+        return None
+    return base
+
+
+def _base_members(base_source: Source) -> Dict[str, Tuple[int, str]]:
+    return {
+        path: (size, md5sum)
+        for path, size, md5sum in TapeMember.select(
+            TapeMember.relative_path, TapeMember.size, TapeMember.md5sum
+        )
+        .where(TapeMember.source == base_source)
+        .tuples()
+        .iterator()
+    }
+
+
+def _iter_catalog(source: Source, base_source: Source) -> Iterator[Tuple[Track, bool]]:
+    """Pistas de la cinta actual en orden, marcando si cambiaron respecto a la base."""
+    base = _base_members(base_source)
+    with open_tape_catalog(source.path):
+        tracks = (
+            Track.select()
+            .where(Track.start_offset.is_null(False))  # type: ignore
+            .order_by(Track.start_offset)
+            .iterator()
+        )
+        for track in tracks:
+            if track.is_dir:
+                continue
+            yield track, base.get(track.arc_path) != (track.size, track.md5sum)
+
+
+def iter_delta_tracks(source: Source, base_source: Source) -> Iterator[DeltaTrack]:
+    """Archivos nuevos o modificados, recolocados de forma contigua en el delta."""
+    cursor = 0
+    for track, changed in _iter_catalog(source, base_source):
+        if not changed:
+            continue
+        size = track.total_block_size
+        yield DeltaTrack(cursor, cursor + size, track.to_metadata())
+        cursor += size
+
+
+def iter_unchanged_paths(source: Source, base_source: Source) -> Iterator[str]:
+    """Rutas de los archivos que se referencian desde la cinta base."""
+    for track, changed in _iter_catalog(source, base_source):
+        if not changed:
+            yield track.arc_path
+
+
+def compute_delta_size(source: Source, base_source: Source) -> int:
+    """Tamaño del delta: entradas TAR de los archivos cambiados más el pie."""
+    return (
+        sum(t.end_offset - t.start_offset for t in iter_delta_tracks(source, base_source))
+        + TAR_FOOTER_SIZE
+    )
+
+
+def delta_volume_manifest(
+    job: Job,
+    vol_index: int,
+    window: ByteWindow,
+    tracks: Optional[List[DeltaTrack]] = None,
+) -> VolumeManifest:
+    """
+    Manifiesto de un volumen del delta, con la misma forma que los de `tartape`.
+    Con `tracks` sirve para cualquier cinta armada a mano (p. ej. un paquete).
+    """
+    if tracks is None:
+        base_job = job.base_job
+        assert base_job is not None, f"El Job {job.id} no es incremental."
+        tracks = list(iter_delta_tracks(job.source, base_job.source))
+
+    entries = [
+        ManifestEntry.from_track(track, window, vol_index=vol_index)  # type: ignore
+        for track in tracks
+        if track.start_offset < window.end and track.end_offset > window.start
+    ]
+    return VolumeManifest(
+        tape_fingerprint=job.source.md5sum,
+        volume_index=vol_index,
+        start_offset=window.start,
+        end_offset=window.end,
+        chunk_size=window.size,
+        total_size=job.stream_size,
+        entries=entries,
+    )
+
+
+def open_delta_volume(job: Job, payload: Payload):
+    """Stream de un volumen del delta, leído de la carpeta como los de `tartape`."""
+    from tartape.stream import FolderVolume
+
+    window = ByteWindow(start=payload.start_offset, end=payload.end_offset)
+    manifest = delta_volume_manifest(job, payload.sequence_index, window)
+    return FolderVolume(job.path, manifest, payload.filename)
@@ -34,13 +34,14 @@ def handler_file(path: str, formatter: logging.Formatter) -> logging.FileHandler
 def setup_logging(log_file: Path, is_debug: bool, max_history: int = 20) -> None:
     log_file.parent.mkdir(parents=True, exist_ok=True)
 
-    existing_logs = cast(list[Path],sorted(log_file.parent.glob("*.log"), key=os.path.getmtime))
-    if len(existing_logs) > max_history:
-        for old_log in existing_logs[:-max_history]:
-            try:
-                old_log.unlink()
-            except Exception:
-                pass
+    for pattern in ("*.log", "*.jsonl", "*.pstats", "*.collapsed", "*.alloc.txt"):
+        existing_logs = cast(list[Path],sorted(log_file.parent.glob(pattern), key=os.path.getmtime))
+        if len(existing_logs) > max_history:
+            for old_log in existing_logs[:-max_history]:
+                try:
+                    old_log.unlink()
+                except Exception:
+                    pass
 
     for handler in logging.root.handlers[:]:
         logging.root.removeHandler(handler)
@@ -10,11 +10,53 @@ from totelegram import CURRENT_DB_VERSION
 logger = logging.getLogger(__name__)
 
 
-def run_migrations(db: peewee.SqliteDatabase, db_path: Path | str):
-    """Gestor de migraciones lineales con backup y guardia de seguridad."""
+SCHEMA_TABLE = "totelegram_schema"
 
-    cursor = db.execute_sql("PRAGMA user_version")
-    db_version = cursor.fetchone()[0]
+
+def _is_sqlite(db: peewee.Database) -> bool:
+    return isinstance(db, peewee.SqliteDatabase)
+
+
+def get_schema_version(db: peewee.Database, for_update: bool = False) -> int:
+    """
+    Versión del esquema. SQLite la guarda en `PRAGMA user_version`; el resto de
+    motores en una tabla de una sola fila. `for_update` bloquea esa fila hasta el
+    fin de la transacción, para que dos nodos no migren a la vez.
+    """
+    if _is_sqlite(db):
+        return db.execute_sql("PRAGMA user_version").fetchone()[0]
+
+    db.execute_sql(f"CREATE TABLE IF NOT EXISTS {SCHEMA_TABLE} (version INTEGER NOT NULL)")
+    lock = " FOR UPDATE" if for_update else ""
+    row = db.execute_sql(f"SELECT version FROM {SCHEMA_TABLE}{lock}").fetchone()
+    if row is None:
+        db.execute_sql(f"INSERT INTO {SCHEMA_TABLE} (version) VALUES (0)")
+        return 0
+    return row[0]
+
+
+def set_schema_version(db: peewee.Database, version: int):
+    if _is_sqlite(db):
+        db.execute_sql(f"PRAGMA user_version = {int(version)}")
+    else:
+        db.execute_sql(f"UPDATE {SCHEMA_TABLE} SET version = {db.param}", (version,))
+
+
+def run_migrations(db: peewee.Database, db_path: Path | str):
+    """
+    Gestor de migraciones lineales con backup y guardia de seguridad.
+
+    `db_path` es la ruta del archivo SQLite (se respalda antes de migrar),
+    ':memory:' (no se migra) o la URL de un servidor, cuyo respaldo queda a
+    cargo de su administrador (p. ej. `pg_dump`).
+    """
+    if db_path == ":memory:":
+        return
+
+    from totelegram.database import db_transaction
+
+    with db_transaction(db):
+        db_version = get_schema_version(db)
 
     if db_version == CURRENT_DB_VERSION:
         return
@@ -36,23 +78,39 @@ def run_migrations(db: peewee.SqliteDatabase, db_path: Path | str):
         shutil.copy(db_path, backup_path)
         logger.info(f"Backup de seguridad creado: {backup_path.name}")
 
-        try:
-            from totelegram.database import db_transaction
-            with db_transaction(db):
-                if db_version < 1:
-                    _migrate_to_v1(db)
+    try:
+        with db_transaction(db):
+            # Otro nodo pudo migrar mientras tanto: se relee con la fila bloqueada.
+            db_version = get_schema_version(db, for_update=not _is_sqlite(db))
+            if db_version == CURRENT_DB_VERSION:
+                return
+
+            if db_version < 1:
+                _migrate_to_v1(db)
 
-                if db_version < 2:
-                    _migrate_to_v2(db)
+            if db_version < 2:
+                _migrate_to_v2(db)
 
-                db.execute_sql(f"PRAGMA user_version = {CURRENT_DB_VERSION}")
-                logger.info(
-                    f"Base de datos migrada con éxito a la versión {CURRENT_DB_VERSION}"
-                )
+            if db_version < 3:
+                _migrate_to_v3(db)
 
-        except Exception as e:
-            logger.error(f"Fallo crítico en la migración: {e}")
-            raise e
+            if db_version < 4:
+                _migrate_to_v4(db)
+
+            if db_version < 5:
+                _migrate_to_v5(db)
+
+            if db_version < 6:
+                _migrate_to_v6(db)
+
+            set_schema_version(db, CURRENT_DB_VERSION)
+            logger.info(
+                f"Base de datos migrada con éxito a la versión {CURRENT_DB_VERSION}"
+            )
+
+    except Exception as e:
+        logger.error(f"Fallo crítico en la migración: {e}")
+        raise e
 
 
 def _migrate_to_v1(db):
@@ -76,8 +134,49 @@ def _migrate_to_v2(db):
     logger.info("Migrando a V2: Eliminando gestión de estado manual...")
     try:
         # SQLite soporta DROP COLUMN a partir de la versión 3.35.0 (2021)
-        db.execute_sql("ALTER TABLE payload DROP COLUMN status")
-        db.execute_sql("ALTER TABLE payload DROP COLUMN claimed_by")
+        with db.atomic():
+            db.execute_sql("ALTER TABLE payload DROP COLUMN status")
+            db.execute_sql("ALTER TABLE payload DROP COLUMN claimed_by")
     except Exception as e:
         # Si la versión de SQLite es muy vieja, ignoramos. Peewee no lee esas columnas igual.
         logger.debug(f"DROP COLUMN no soportado en esta versión de SQLite, ignorando: {e}")
+
+
+def _migrate_to_v3(db):
+    """Índice para el dedup de piezas por contenido."""
+    logger.info("Migrando a V3: Índice de piezas por tamaño y MD5...")
+    db.execute_sql(
+        'CREATE INDEX IF NOT EXISTS "payload_size_md5sum" ON "payload" ("size", "md5sum")'
+    )
+
+
+def _migrate_to_v4(db):
+    """Tamaño y frames comprimidos de las piezas."""
+    logger.info("Migrando a V4: Compresión de piezas...")
+    # Una base nueva ya tiene las columnas (create_tables corre antes).
+    columns = {c.name for c in db.get_columns("payload")}
+    if "packed_size" not in columns:
+        db.execute_sql("ALTER TABLE payload ADD COLUMN packed_size BIGINT")
+    if "packed_frames" not in columns:
+        db.execute_sql("ALTER TABLE payload ADD COLUMN packed_frames TEXT")
+
+
+def _migrate_to_v5(db):
+    """MD5 del inicio de cada pieza, para el prefiltro del dedup."""
+    logger.info("Migrando a V5: Prefiltro del dedup de piezas...")
+    columns = {c.name for c in db.get_columns("payload")}
+    if "head_md5" not in columns:
+        db.execute_sql("ALTER TABLE payload ADD COLUMN head_md5 VARCHAR(255)")
+    db.execute_sql(
+        'CREATE INDEX IF NOT EXISTS "payload_size_head_md5" ON "payload" ("size", "head_md5")'
+    )
+
+
+def _migrate_to_v6(db):
+    """Entradas de la cola ya comprobadas por `watch`."""
+    logger.info("Migrando a V6: Entradas verificadas en la cola...")
+    columns = {c.name for c in db.get_columns("queueentry")}
+    if "verified_stamp" not in columns:
+        db.execute_sql("ALTER TABLE queueentry ADD COLUMN verified_stamp TEXT")
+    if "md5sum" not in columns:
+        db.execute_sql("ALTER TABLE queueentry ADD COLUMN md5sum VARCHAR(255)")
@@ -3,15 +3,24 @@ import logging
 import time
 from datetime import datetime
 from pathlib import Path
-from typing import TYPE_CHECKING, Generator, List, Optional, Tuple, cast
+from typing import TYPE_CHECKING, Dict, Generator, Iterable, List, Optional, Tuple, cast
 
 import peewee
 import tartape
-from playhouse.sqlite_ext import JSONField
+from tartape.constants import TAR_BLOCK_SIZE
 from tartape.schemas import EntryState, ManifestEntry
 
 from totelegram import __version__
-from totelegram.schemas import JobStatus, ResourceType, SourceType, Strategy
+from totelegram.schemas import (
+    JobStatus,
+    PayloadCompression,
+    QueueMode,
+    QueueStatus,
+    ResourceType,
+    SourceType,
+    Strategy,
+    TapeChunking,
+)
 from totelegram.telegram.client import parse_message_json_data
 
 if TYPE_CHECKING:
@@ -19,7 +28,7 @@ if TYPE_CHECKING:
     from pyrogram.types import Message
 
 
-from totelegram.database import EnumField, PydanticJSONField, db_proxy
+from totelegram.database import EnumField, JSONField, PydanticJSONField, db_proxy
 from totelegram.schemas import StrategyConfig, TapeCatalog
 from totelegram.utils import batched, create_md5sum_by_hashlib, get_mimetype
 
@@ -173,7 +182,8 @@ class Source(BaseModel):
         return changed
 
     @staticmethod
-    def get_or_create_from_filepath(path: Path) -> "Source":
+    def get_or_create_from_filepath(path: Path, md5sum: Optional[str] = None) -> "Source":
+        """`md5sum`: el del contenido actual, si ya se calculó (no se vuelve a leer)."""
         stat = path.stat()
         current_size = stat.st_size
         current_mtime = stat.st_mtime
@@ -189,7 +199,7 @@ class Source(BaseModel):
             return cached
 
         # Si falló el rápido, calculamos MD5
-        md5sum = create_md5sum_by_hashlib(path)
+        md5sum = md5sum or create_md5sum_by_hashlib(path)
 
         source = cast(Optional[Source], Source.get_or_none(Source.md5sum == md5sum))
         if source:
@@ -262,6 +272,30 @@ class Job(BaseModel):
     def path(self) -> Path:
         return Path(self.source.path_str)
 
+    @property
+    def stream_size(self) -> int:
+        """Bytes que se suben: la cinta completa o, en un Job incremental, solo su delta."""
+        if self.config.base_job_id is not None:
+            return self.config.delta_size
+        return self.source.size
+
+    @property
+    def base_job(self) -> Optional["Job"]:
+        """Job del que depende una cinta incremental (None en cintas completas)."""
+        if self.config.base_job_id is None:
+            return None
+        return Job.get_or_none(Job.id == self.config.base_job_id)
+
+    def lineage(self) -> List[int]:
+        """IDs de este Job y de los Jobs base de los que depende, del más reciente al más antiguo."""
+        ids = [self.id]
+        base_id = self.config.base_job_id
+        while base_id is not None and base_id not in ids:
+            ids.append(base_id)
+            base = Job.get_or_none(Job.id == base_id)
+            base_id = base.config.base_job_id if base else None
+        return ids
+
     def set_uploaded(self):
         self.status = JobStatus.UPLOADED
         self.save(only=[Job.status, Job.updated_at])
@@ -272,15 +306,38 @@ class Job(BaseModel):
         chat: "TelegramChat",
         is_premium: bool,
         tg_limit: int,
+        tape_chunking: TapeChunking = TapeChunking.FIXED,
+        base_job: Optional["Job"] = None,
+        delta_size: int = 0,
+        compression: PayloadCompression = PayloadCompression.NONE,
+        compression_level: int = 0,
     ) -> "Job":
         """
         Crea un Job basado en la estrategía y la configuración de la cuenta.
+
+        Con `base_job`, el Job es una cinta incremental: solo se suben los
+        `delta_size` bytes de los archivos nuevos o modificados. Con
+        `compression`, cada pieza se sube comprimida; el corte en piezas no
+        cambia (se hace sobre los bytes del origen).
         """
 
-        strategy = Strategy.evaluate(source.size, tg_limit)
         config = StrategyConfig(
             tg_max_size=tg_limit, user_is_premium=is_premium, app_version=__version__
         )
+        if base_job is not None:
+            config.base_job_id = base_job.id
+            config.delta_size = delta_size
+        if PayloadCompression(compression) != PayloadCompression.NONE:
+            config.compression = PayloadCompression(compression)
+            config.compression_level = compression_level
+        strategy = Strategy.evaluate(
+            delta_size if base_job is not None else source.size, tg_limit
+        )
+        if source.type == SourceType.FOLDER and TapeChunking(tape_chunking) == TapeChunking.CDC:
+            # Volumen medio en la mitad del límite y mínimo en un octavo, en bloques TAR.
+            config.tape_chunking = TapeChunking.CDC
+            config.cdc_avg_size = tg_limit // 2 // TAR_BLOCK_SIZE * TAR_BLOCK_SIZE
+            config.cdc_min_size = tg_limit // 8 // TAR_BLOCK_SIZE * TAR_BLOCK_SIZE
         return Job.create(
             source=source,
             chat=chat,
@@ -337,6 +394,23 @@ class Payload(BaseModel):
     start_offset = cast(int, peewee.IntegerField())
     end_offset = cast(int, peewee.IntegerField())
     size = cast(int, peewee.IntegerField())
+    # Solo en Jobs comprimidos: bytes subidos y tamaño comprimido de cada frame.
+    packed_size = cast(Optional[int], peewee.BigIntegerField(null=True))
+    packed_frames = cast(Optional[List[int]], JSONField(null=True))
+    # MD5 del primer MiB: filtra los candidatos del dedup antes de leer la pieza entera.
+    head_md5 = cast(Optional[str], peewee.CharField(null=True))
+
+    class Meta:  # type: ignore
+        indexes = (
+            # Dedup por contenido: las piezas se buscan por tamaño y MD5.
+            (("size", "md5sum"), False),
+            (("size", "head_md5"), False),
+        )
+
+    @property
+    def upload_size(self) -> int:
+        """Tamaño del documento en Telegram (comprimido, si la pieza lo está)."""
+        return self.packed_size if self.packed_size is not None else self.size
 
     @property
     def has_remote(self) -> bool:
@@ -383,6 +457,16 @@ class RemotePayload(BaseModel):
     last_verified_at = cast(Optional[datetime], peewee.DateTimeField(null=True))
     is_orphaned = cast(bool, peewee.BooleanField(default=False))
 
+    @classmethod
+    def sent_since(cls, owner: "TelegramUser", since: datetime) -> List[Tuple[datetime, int]]:
+        """(fecha, bytes) de las piezas que `owner` publicó desde `since`."""
+        return list(
+            cls.select(cls.created_at, peewee.fn.COALESCE(Payload.packed_size, Payload.size))
+            .join(Payload)
+            .where((cls.owner == owner) & (cls.created_at >= since))
+            .tuples()
+        )
+
     def mark_orphaned(self):
         """Marca el registro como huérfano (no disponible en Telegram)."""
         self.is_orphaned = True
@@ -460,53 +544,163 @@ class TapeMember(BaseModel):
 
     @classmethod
     def register_manifest_entries(
-        cls, source: "Source", payload: "Payload", entries: list[ManifestEntry]
+        cls, source: "Source", payload: "Payload", entries: Iterable[ManifestEntry]
     ):
         """
         Registra los archivos de un volumen (TapeMembers) y su GPS en el volumen.
+
+        Recorre las entradas una sola vez dentro de una transacción. Cada lote se
+        envía con `executemany` usando sentencias precompiladas: generar el SQL
+        fila a fila con Peewee domina el coste en catálogos de millones de archivos.
+        El GPS resuelve el ID del miembro con un `INSERT ... SELECT` sobre el
+        índice único (source, relative_path), sin volver a Python por los IDs.
         """
-        BATCH_SIZE = 100
-
-        for batch in batched(entries, BATCH_SIZE):
-            batch: List[ManifestEntry]
-            member_data = [
-                {
-                    "source": source,
-                    "relative_path": e.info.arc_path,
-                    "size": e.info.size,
-                    "md5sum": e.info.md5sum,
-                }
-                for e in batch
-                if not e.info.is_dir
-            ]
-            cls.insert_many(member_data).on_conflict_ignore().execute()
+        BATCH_SIZE = 5000
+
+        db = cls._meta.database  # type: ignore
+        member_sql, gps_sql = cls._bulk_statements(db)
+
+        source_id = source.id
+        payload_id = payload.id
+        state_field = TapeMemberGPS.state
+
+        files = (e for e in entries if not e.info.is_dir)
+        with db.atomic():
+            cursor = db.cursor()
+            for batch in batched(files, BATCH_SIZE):
+                batch: List[ManifestEntry]
+                # Se formatea una vez por lote: el adaptador de datetime por fila es costoso.
+                now = str(datetime.now())
+                cursor.executemany(
+                    member_sql,
+                    [
+                        (source_id, e.info.arc_path, e.info.size, e.info.md5sum, now, now)
+                        for e in batch
+                    ],
+                )
+                cursor.executemany(
+                    gps_sql,
+                    [
+                        (
+                            payload_id,
+                            state_field.db_value(e.state),
+                            e.local_window.start,
+                            e.local_window.end,
+                            now,
+                            now,
+                            source_id,
+                            e.info.arc_path,
+                        )
+                        for e in batch
+                    ],
+                )
 
-        path_to_id = {}
-        for batch in batched(entries, BATCH_SIZE):
-            paths = [e.info.arc_path for e in batch]
+    @classmethod
+    def register_references(
+        cls,
+        source: "Source",
+        base_source: "Source",
+        base_jobs: List[int],
+        paths: Iterable[str],
+    ):
+        """
+        Registra en `source` los archivos sin cambios de una cinta incremental.
 
-            # `<<` (operador IN de Peewee)
-            query = cls.select(cls.id, cls.relative_path).where(
-                (cls.source == source) & (cls.relative_path << paths)  # type: ignore
-            )
+        El miembro se copia de `base_source` y su GPS apunta a los volúmenes
+        que ya están en Telegram (Payloads de `base_jobs`), sin subir nada.
+        """
+        BATCH_SIZE = 500
+
+        Base = cls.alias()
+        New = cls.alias()
+        gps = TapeMemberGPS
+        for batch in batched(paths, BATCH_SIZE):
+            now = str(datetime.now())
+            cls.insert_from(
+                Base.select(
+                    peewee.Value(source.id),
+                    Base.relative_path,
+                    Base.size,
+                    Base.md5sum,
+                    peewee.Value(now),
+                    peewee.Value(now),
+                ).where((Base.source == base_source) & (Base.relative_path << batch)),
+                fields=[
+                    cls.source,
+                    cls.relative_path,
+                    cls.size,
+                    cls.md5sum,
+                    cls.created_at,
+                    cls.updated_at,
+                ],
+            ).on_conflict_ignore().execute()
+
+            gps.insert_from(
+                gps.select(
+                    New.id,
+                    gps.payload,
+                    gps.state,
+                    gps.offset_in_volume,
+                    gps.bytes_in_volume,
+                    peewee.Value(now),
+                    peewee.Value(now),
+                )
+                .join(Base, on=(gps.member == Base.id))
+                .join(
+                    New,
+                    on=(
+                        (New.source == source.id)
+                        & (New.relative_path == Base.relative_path)
+                    ),
+                )
+                .join_from(gps, Payload)
+                .where(
+                    (Base.source == base_source)
+                    & (Base.relative_path << batch)
+                    & (Payload.job << base_jobs)
+                ),
+                fields=[
+                    gps.member,
+                    gps.payload,
+                    gps.state,
+                    gps.offset_in_volume,
+                    gps.bytes_in_volume,
+                    gps.created_at,
+                    gps.updated_at,
+                ],
+            ).execute()
 
-            for member in query:
-                path_to_id[member.relative_path] = member.id
-
-        # Registra el GPS de cada archivo en el volumen
-        for batch in batched(entries, BATCH_SIZE):
-            gps_data = [
-                {
-                    "member": path_to_id[e.info.arc_path],
-                    "payload": payload,
-                    "state": e.state.value,
-                    "offset_in_volume": e.local_window.start,
-                    "bytes_in_volume": e.local_window.end,
-                }
-                for e in batch
-                if not e.info.is_dir
-            ]
-            TapeMemberGPS.insert_many(gps_data).execute()
+    @classmethod
+    def _bulk_statements(cls, db: peewee.Database) -> Tuple[str, str]:
+        """Construye los INSERT de miembros y GPS con el estilo de parámetros del motor."""
+
+        def q(name: str) -> str:
+            return f'"{name}"'
+
+        def cols(*fields: peewee.Field) -> str:
+            return ", ".join(q(f.column_name) for f in fields)
+
+        p = db.param
+        member_table = q(cls._meta.table_name)  # type: ignore
+        gps_table = q(TapeMemberGPS._meta.table_name)  # type: ignore
+
+        member_sql = (
+            f"INSERT INTO {member_table} "
+            f"({cols(cls.source, cls.relative_path, cls.size, cls.md5sum, cls.created_at, cls.updated_at)}) "
+            f"VALUES ({', '.join([p] * 6)}) "
+            f"ON CONFLICT ({cols(cls.source, cls.relative_path)}) DO NOTHING"
+        )
+
+        gps = TapeMemberGPS
+        gps_sql = (
+            f"INSERT INTO {gps_table} "
+            f"({cols(gps.member, gps.payload, gps.state, gps.offset_in_volume, gps.bytes_in_volume, gps.created_at, gps.updated_at)}) "
+            f"SELECT m.{q(cls._meta.primary_key.column_name)}, {', '.join([p] * 6)} "  # type: ignore
+            f"FROM {member_table} AS m "
+            f"WHERE m.{q(cls.source.column_name)} = {p} "
+            f"AND m.{q(cls.relative_path.column_name)} = {p}"
+        )
+        return member_sql, gps_sql
 
 
 class TapeMemberGPS(BaseModel):
@@ -528,3 +722,133 @@ class Claim(BaseModel):
     @classmethod
     def is_expired(cls, claim: "Claim") -> bool:
         return datetime.now() > claim.expires_at
+
+
+class QueueEntry(BaseModel):
+    """
+    Trabajo encolado para el daemon de subidas.
+
+    `totelegram daemon submit` solo inserta filas aquí (sin abrir Telegram);
+    el daemon del perfil las reclama una a una y las procesa con su sesión abierta.
+    """
+
+    id: int
+
+    profile_name = cast(str, peewee.CharField(index=True))
+    path_str = cast(str, peewee.CharField())
+    mode = cast(QueueMode, EnumField(QueueMode))
+    force = cast(bool, peewee.BooleanField(default=False))
+    # Entradas de `watch`: el archivo ya pasó el inventario con este [tamaño, mtime_ns].
+    verified_stamp = cast(Optional[List[int]], JSONField(null=True))
+    md5sum = cast(Optional[str], peewee.CharField(null=True))
+
+    status = cast(QueueStatus, EnumField(QueueStatus, default=QueueStatus.PENDING, index=True))
+    attempts = cast(int, peewee.IntegerField(default=0))
+    error = cast(Optional[str], peewee.TextField(null=True))
+    started_at = cast(Optional[datetime], peewee.DateTimeField(null=True))
+    finished_at = cast(Optional[datetime], peewee.DateTimeField(null=True))
+
+    @property
+    def path(self) -> Path:
+        return Path(self.path_str)
+
+    @property
+    def is_verified(self) -> bool:
+        """¿Sigue el archivo como estaba cuando lo filtró el inventario de `watch`?"""
+        if self.verified_stamp is None:
+            return False
+        try:
+            stat = self.path.stat()
+        except OSError:
+            return False
+        return list(self.verified_stamp) == [stat.st_size, stat.st_mtime_ns]
+
+    @classmethod
+    def submit(
+        cls,
+        profile_name: str,
+        paths: List[Path],
+        mode: QueueMode,
+        force: bool = False,
+        md5sums: Optional[Dict[Path, str]] = None,
+    ) -> List["QueueEntry"]:
+        """
+        Encola rutas. Si se pasa `md5sums` (aunque esté vacío), las rutas ya
+        pasaron el inventario: se guarda su estado y el MD5 calculado, y el
+        daemon no las vuelve a comprobar mientras no cambien.
+        """
+        entries = []
+        for path in paths:
+            stamp = None
+            if md5sums is not None:
+                stat = path.stat()
+                stamp = [stat.st_size, stat.st_mtime_ns]
+            entries.append(
+                cls.create(
+                    profile_name=profile_name,
+                    path_str=str(path.resolve()),
+                    mode=mode,
+                    force=force,
+                    verified_stamp=stamp,
+                    md5sum=(md5sums or {}).get(path),
+                )
+            )
+        return entries
+
+    @classmethod
+    def claim_next(cls, profile_name: str) -> Optional["QueueEntry"]:
+        """
+        Reclama la entrada pendiente más antigua del perfil.
+        El UPDATE condicionado al estado evita que dos daemons tomen la misma.
+        """
+        while True:
+            entry = cast(
+                Optional[QueueEntry],
+                cls.select()
+                .where(
+                    (cls.profile_name == profile_name)
+                    & (cls.status == QueueStatus.PENDING)
+                )
+                .order_by(cls.id)
+                .first(),
+            )
+            if entry is None:
+                return None
+
+            now = datetime.now()
+            claimed = (
+                cls.update(
+                    status=QueueStatus.RUNNING,
+                    attempts=cls.attempts + 1,
+                    started_at=now,
+                    updated_at=now,
+                )
+                .where((cls.id == entry.id) & (cls.status == QueueStatus.PENDING))
+                .execute()
+            )
+            if claimed:
+                return cls.get_by_id(entry.id)
+
+    @classmethod
+    def requeue_running(cls, profile_name: str) -> int:
+        """Devuelve a la cola las entradas que quedaron a medias (daemon interrumpido)."""
+        return (
+            cls.update(status=QueueStatus.PENDING, updated_at=datetime.now())
+            .where(
+                (cls.profile_name == profile_name)
+                & (cls.status == QueueStatus.RUNNING)
+            )
+            .execute()
+        )
+
+    def mark_done(self):
+        self.status = QueueStatus.DONE
+        self.error = None
+        self.finished_at = datetime.now()
+        self.save()
+
+    def mark_failed(self, error: str):
+        self.status = QueueStatus.FAILED
+        self.error = error
+        self.finished_at = datetime.now()
+        self.save()
@@ -0,0 +1,240 @@
+import random
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from datetime import time as dtime
+from typing import TYPE_CHECKING, Callable, Iterable, List, NamedTuple, Optional, Tuple
+
+if TYPE_CHECKING:
+    from totelegram.identity import Settings
+
+
+PACING_STRATEGIES = ("none", "fixed", "random", "budget")
+
+
+class PacingDecision(NamedTuple):
+    delay: float
+    reason: str = ""
+
+
+NO_WAIT = PacingDecision(0.0)
+
+
+class PacingPolicy:
+    """
+    Decide cuánto esperar antes de la siguiente pieza.
+
+    El uploader llama a `start_batch()` al empezar las piezas de un Job,
+    `record()` tras cada pieza subida y `next_delay()` antes de reclamar la
+    siguiente. Las estrategias solo esperan cuando su regla lo exige (pausa
+    pendiente, presupuesto agotado o fuera de horario).
+    """
+
+    # Segundos de historial que la política necesita al arrancar (ver `seed`).
+    lookback: float = 0.0
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self.clock = clock
+
+    def start_batch(self):
+        pass
+
+    def record(self, nbytes: int, at: Optional[float] = None):
+        pass
+
+    def seed(self, entries: Iterable[Tuple[float, int]]):
+        """Carga envíos previos (timestamp, bytes), p. ej. de la base de datos."""
+        for at, nbytes in sorted(entries):
+            self.record(nbytes, at)
+
+    def next_delay(self) -> PacingDecision:
+        return NO_WAIT
+
+
+class FixedPause(PacingPolicy):
+    """
+    Pausa de `seconds` contada desde el final de la última pieza. Solo separa
+    piezas de un mismo Job: al empezar otro Job no hay pausa pendiente.
+    """
+
+    def __init__(self, seconds: float, clock: Callable[[], float] = time.time):
+        super().__init__(clock)
+        self.seconds = seconds
+        self._current = seconds
+        self._last: Optional[float] = None
+
+    def _pause(self) -> float:
+        return self.seconds
+
+    def start_batch(self):
+        self._last = None
+
+    def record(self, nbytes: int, at: Optional[float] = None):
+        self._last = self.clock() if at is None else at
+        self._current = self._pause()
+
+    def next_delay(self) -> PacingDecision:
+        if self._last is None:
+            return NO_WAIT
+        remaining = self._last + self._current - self.clock()
+        if remaining <= 0:
+            return NO_WAIT
+        return PacingDecision(remaining, "pausa entre piezas")
+
+
+class RandomPause(FixedPause):
+    """Como `FixedPause`, pero sorteando la pausa en [low, high] tras cada pieza."""
+
+    def __init__(self, low: float, high: float, clock: Callable[[], float] = time.time):
+        super().__init__(low, clock)
+        self.low, self.high = min(low, high), max(low, high)
+
+    def _pause(self) -> float:
+        return random.uniform(self.low, self.high)
+
+
+class ByteBudget(PacingPolicy):
+    """
+    Presupuesto de `max_bytes` por ventana deslizante de `window` segundos.
+    Solo espera cuando lo subido dentro de la ventana agota el presupuesto, y lo
+    justo para que expiren las piezas más antiguas.
+    """
+
+    def __init__(
+        self, max_bytes: int, window: float, clock: Callable[[], float] = time.time
+    ):
+        super().__init__(clock)
+        self.max_bytes = max_bytes
+        self.window = window
+        self.lookback = window
+        self._sent: deque = deque()
+        self._total = 0
+
+    def _expire(self, now: float):
+        while self._sent and self._sent[0][0] <= now - self.window:
+            _, nbytes = self._sent.popleft()
+            self._total -= nbytes
+
+    def record(self, nbytes: int, at: Optional[float] = None):
+        at = self.clock() if at is None else at
+        self._sent.append((at, nbytes))
+        self._total += nbytes
+
+    @property
+    def used(self) -> int:
+        self._expire(self.clock())
+        return self._total
+
+    def next_delay(self) -> PacingDecision:
+        now = self.clock()
+        self._expire(now)
+        if self._total < self.max_bytes:
+            return NO_WAIT
+
+        # Hay que dejar expirar piezas hasta volver a quedar bajo el presupuesto.
+        excess = self._total - self.max_bytes
+        freed = 0
+        for at, nbytes in self._sent:
+            freed += nbytes
+            if freed > excess:
+                return PacingDecision(at + self.window - now, "presupuesto de subida agotado")
+        return NO_WAIT
+
+
+class TimeWindows(PacingPolicy):
+    """Solo permite subir dentro de franjas horarias (pueden cruzar medianoche)."""
+
+    def __init__(
+        self, windows: List[Tuple[dtime, dtime]], clock: Callable[[], float] = time.time
+    ):
+        super().__init__(clock)
+        self.windows = windows
+
+    @staticmethod
+    def _inside(t: dtime, start: dtime, end: dtime) -> bool:
+        if start <= end:
+            return start <= t < end
+        return t >= start or t < end
+
+    def next_delay(self) -> PacingDecision:
+        now = datetime.fromtimestamp(self.clock())
+        if not self.windows or any(
+            self._inside(now.time(), s, e) for s, e in self.windows
+        ):
+            return NO_WAIT
+
+        def until(start: dtime) -> float:
+            opening = datetime.combine(now.date(), start)
+            if opening <= now:
+                opening += timedelta(days=1)
+            return (opening - now).total_seconds()
+
+        return PacingDecision(
+            min(until(s) for s, _ in self.windows), "fuera del horario de subida"
+        )
+
+
+class CompositePolicy(PacingPolicy):
+    """Combina políticas: se espera lo que pida la más restrictiva."""
+
+    def __init__(self, policies: List[PacingPolicy]):
+        super().__init__()
+        self.policies = policies
+        self.lookback = max((p.lookback for p in policies), default=0.0)
+
+    def start_batch(self):
+        for policy in self.policies:
+            policy.start_batch()
+
+    def record(self, nbytes: int, at: Optional[float] = None):
+        for policy in self.policies:
+            policy.record(nbytes, at)
+
+    def next_delay(self) -> PacingDecision:
+        return max(
+            (p.next_delay() for p in self.policies), key=lambda d: d.delay, default=NO_WAIT
+        )
+
+
+def parse_time_windows(text: str) -> List[Tuple[dtime, dtime]]:
+    """'22-06,12:30-13:00' -> [(22:00, 06:00), (12:30, 13:00)]"""
+
+    def parse_hour(value: str) -> dtime:
+        hours, _, minutes = value.strip().partition(":")
+        return dtime(int(hours) % 24, int(minutes or 0))
+
+    windows = []
+    for chunk in text.split(","):
+        if not chunk.strip():
+            continue
+        start, sep, end = chunk.partition("-")
+        if not sep:
+            raise ValueError(f"Franja horaria inválida: '{chunk}'. Ej: '22-06'.")
+        windows.append((parse_hour(start), parse_hour(end)))
+    return windows
+
+
+def build_policy(settings: "Settings") -> PacingPolicy:
+    """Construye la política de ritmo a partir de la configuración del perfil."""
+    policies: List[PacingPolicy] = []
+    strategy = settings.pacing_strategy
+    low, high = (m * 60 for m in settings.upload_pause_range)
+
+    if strategy == "fixed" and low > 0:
+        policies.append(FixedPause(low))
+    elif strategy == "random" and high > 0:
+        policies.append(RandomPause(low, high))
+    elif strategy == "budget" and settings.pacing_budget_mb > 0:
+        policies.append(
+            ByteBudget(
+                settings.pacing_budget_mb * 1024 * 1024,
+                settings.pacing_window_minutes * 60,
+            )
+        )
+
+    if settings.upload_hours:
+        policies.append(TimeWindows(parse_time_windows(settings.upload_hours)))
+
+    if len(policies) == 1:
+        return policies[0]
+    return CompositePolicy(policies)
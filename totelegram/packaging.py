@@ -1,12 +1,29 @@
+import hashlib
+import json
 import logging
 import lzma
+import math
+import os
+import threading
+from contextlib import nullcontext
 from datetime import datetime
+from enum import Enum
 from pathlib import Path
-from typing import List, Optional, Tuple, cast
+from typing import IO, Dict, Generator, Iterable, Iterator, List, Optional, Tuple, cast
 
+import peewee
 from pydantic import BaseModel
 
 from totelegram import __version__
+from totelegram.bundling import bundle_member_stamps, iter_bundle_tracks, stamp_matches
+from totelegram.compression import FRAME_SIZE
+from totelegram.database import db_connection, db_transaction
+from totelegram.incremental import (
+    DeltaTrack,
+    delta_volume_manifest,
+    iter_delta_tracks,
+    iter_unchanged_paths,
+)
 from totelegram.models import (
     Job,
     Payload,
@@ -15,12 +32,26 @@ from totelegram.models import (
     TapeMember,
     TapeMemberGPS,
 )
-from totelegram.schemas import SourceType, Strategy, TapeCatalog
-from totelegram.utils import batched
+from totelegram.schemas import (
+    PayloadCompression,
+    SourceType,
+    Strategy,
+    TapeCatalog,
+    TapeChunking,
+)
+from totelegram.utils import (
+    SnapshotIndex,
+    batched,
+    create_md5sum_by_hashlib,
+    existing_snapshots,
+    open_tape_catalog,
+)
 
 logger = logging.getLogger(__name__)
 
-MANIFEST_VERSION = "5.0"
+MANIFEST_VERSION = "5.3"
+SNAPSHOT_XZ_PRESET = 1
+SNAPSHOT_ZSTD_LEVEL = 3
 
 
 class FileFragment(BaseModel):
@@ -31,6 +62,10 @@ class FileFragment(BaseModel):
     bytes_in_volume: (
         int  # Cantidad de bytes (o donde termina) este archivo en este volumen
     )
+    # Desde 5.2, solo en cintas incrementales: el volumen es de una cinta anterior
+    # y no figura en `parts`, así que el fragmento lleva su propio mensaje.
+    message_id: Optional[int] = None
+    chat_id: Optional[int] = None
 
 
 class TapeMemberSnapshot(BaseModel):
@@ -63,11 +98,21 @@ class RemotePart(BaseModel):
     part_md5sum: str
     start_offset: int  # Offset global en el Source (virtualización)
     end_offset: int  # Offset global en el Source (virtualización)
+    # Desde 5.3, solo en partes comprimidas: tamaño del documento y de cada frame.
+    # `part_size` y `part_md5sum` siguen siendo de los bytes sin comprimir.
+    packed_size: Optional[int] = None
+    frames: Optional[List[int]] = None
+
+    @property
+    def stored_size(self) -> int:
+        """Bytes del documento en Telegram."""
+        return self.packed_size if self.packed_size is not None else self.part_size
 
 
 class UploadManifest(BaseModel):
     manifest_version: str = MANIFEST_VERSION
     app_version: str = __version__
+    codec: str = "xz"  # Desde 5.1. Los snapshots 5.0 siempre son xz.
     created_at: datetime
     strategy: Strategy
     chunk_size: int
@@ -76,6 +121,11 @@ class UploadManifest(BaseModel):
     owner_name: str
     source: SourceMetadata
     parts: List[RemotePart]
+    # Desde 5.2: fingerprint de la cinta de la que depende un snapshot incremental.
+    base_fingerprint: Optional[str] = None
+    # Desde 5.3: compresión de las partes y bytes sin comprimir por frame.
+    compression: PayloadCompression = PayloadCompression.NONE
+    compression_frame_size: int = 0
 
 
 def chunk_ranges(file_size: int, chunk_size: int) -> List[Tuple[int, int]]:
@@ -99,10 +149,75 @@ def chunk_ranges(file_size: int, chunk_size: int) -> List[Tuple[int, int]]:
     ]
 
 
+def _is_cut_point(identity: str, nbytes: int, volume_size: int, avg_size: int) -> bool:
+    """
+    Decide si se corta el volumen al final de una entrada.
+
+    Equivale a un CDC byte a byte donde cada byte tiene 1/avg de probabilidad de
+    ser frontera: una entrada de `nbytes` la contiene con probabilidad ~nbytes/avg.
+    La decisión sale del hash de la entrada, así que es la misma en cada backup.
+    Como en FastCDC, cortar es más difícil antes del tamaño medio y más fácil
+    después (normalización), lo que concentra los volúmenes cerca de `avg_size`.
+    """
+    digest = hashlib.blake2b(identity.encode("utf-8"), digest_size=8).digest()
+    draw = int.from_bytes(digest, "big") / 2**64
+    scale = avg_size * 2 if volume_size < avg_size else avg_size / 2
+    return draw < min(1.0, nbytes / scale)
+
+
+def content_defined_ranges(
+    tracks: Iterable[Tuple[int, int, str]],
+    total_size: int,
+    min_size: int,
+    avg_size: int,
+    max_size: int,
+) -> List[Tuple[int, int]]:
+    """
+    Rangos (inicio, fin) de los volúmenes de una cinta con fronteras definidas por el contenido.
+
+    `tracks` son las entradas de la cinta ordenadas por offset: (inicio, fin, identidad).
+    Los cortes caen al final de una entrada elegida por `_is_cut_point`, nunca
+    antes de `min_size` ni después de `max_size` (el límite de Telegram). Una
+    entrada que no cabe se corta cada `max_size` bytes desde su propio inicio.
+
+    Como la cabecera TAR no guarda offsets, un volumen que empieza y termina en
+    las mismas entradas tiene los mismos bytes aunque se haya insertado un
+    archivo antes: al repetir el backup de una carpeta poco modificada, la
+    mayoría de los volúmenes se reenvían en lugar de subirse (ver dedup).
+    """
+    ranges: List[Tuple[int, int]] = []
+    vol_start = 0
+
+    def cut(at: int):
+        nonlocal vol_start
+        ranges.append((vol_start, at))
+        vol_start = at
+
+    for start, end, identity in tracks:
+        while end - vol_start > max_size:
+            if start > vol_start and start - vol_start >= min_size:
+                cut(start)
+            else:
+                cut(vol_start + max_size)
+
+        volume_size = end - vol_start
+        if volume_size < min_size or total_size - vol_start <= max_size:
+            # Aún es pequeño, o todo lo que queda cabe en este volumen.
+            continue
+        if _is_cut_point(identity, end - max(start, vol_start), volume_size, avg_size):
+            cut(end)
+
+    while total_size - vol_start > max_size:
+        cut(vol_start + max_size)
+    if vol_start < total_size:
+        cut(total_size)
+    return ranges
+
+
 def build_payload_names(source: Source, idx: int, total: int) -> Tuple[str, str]:
     source_path = Path(source.path_str)
 
-    if source.type == SourceType.FOLDER:
+    if source.type in (SourceType.FOLDER, SourceType.BUNDLE):
         original_ext = ".tar"
         base_human_name = source_path.name
         combat_hash = source.md5sum[:40]
@@ -133,15 +248,29 @@ class Chunker:
     def get_or_create(cls, job: Job) -> List[Payload]:
         """Decide la segmentación basándose en el tipo de recurso."""
 
-        if job.payloads.count() > 0:
+        if cls.is_planned(job):
             logger.debug(f"El Job {job.id} ya tiene payloads. Saltando segmentación.")
             return list(job.payloads.order_by(Payload.sequence_index))
 
-        if job.source.type == SourceType.FOLDER:
+        if job.source.type in (SourceType.FOLDER, SourceType.BUNDLE):
             return cls._process_folder_job(job)
         else:
             return cls._process_file_job(job)
 
+    @staticmethod
+    def is_planned(job: Job) -> bool:
+        """
+        Un Job está completamente segmentado cuando su último Payload
+        alcanza el final del Source. Una planificación interrumpida deja
+        payloads, pero no cumple esta condición y puede reanudarse.
+        """
+        last_end = (
+            Payload.select(peewee.fn.MAX(Payload.end_offset))
+            .where(Payload.job == job)
+            .scalar()
+        )
+        return last_end is not None and last_end >= job.stream_size
+
     @classmethod
     def _process_file_job(cls, job: Job) -> List[Payload]:
         limit = job.config.tg_max_size
@@ -175,43 +304,286 @@ class Chunker:
 
     @classmethod
     def _process_folder_job(cls, job: Job) -> List[Payload]:
+        for _ in cls.iter_folder_plan(job):
+            pass
+        return list(job.payloads.order_by(Payload.sequence_index))
+
+    @staticmethod
+    def tape_volume_ranges(
+        job: Job, total_size: int, delta: Optional[List[DeltaTrack]] = None
+    ) -> List[Tuple[int, int]]:
+        """
+        Rangos de los volúmenes de la cinta según la estrategia del Job.
+        En una cinta incremental, `delta` son sus archivos y `total_size` el del delta.
+        """
+        from tartape.chunker import calculate_segments
+        from tartape.models import Track
+
+        config = job.config
+        if config.tape_chunking != TapeChunking.CDC:
+            return list(calculate_segments(total_size, config.tg_max_size))
+
+        def identity(m) -> str:
+            return f"{m.arc_path}\0{m.size}\0{m.mtime}\0{m.md5sum or ''}"
+
+        if delta is not None:
+            return content_defined_ranges(
+                ((t.start_offset, t.end_offset, identity(t.metadata)) for t in delta),
+                total_size,
+                config.cdc_min_size,
+                config.cdc_avg_size,
+                config.tg_max_size,
+            )
+
+        with open_tape_catalog(job.source.path):
+            tracks = (
+                (track.start_offset, track.end_offset, identity(track))
+                for track in Track.select()
+                .where(Track.start_offset.is_null(False))  # type: ignore
+                .order_by(Track.start_offset)
+                .iterator()
+            )
+            return content_defined_ranges(
+                tracks,
+                total_size,
+                config.cdc_min_size,
+                config.cdc_avg_size,
+                config.tg_max_size,
+            )
+
+    @classmethod
+    def iter_folder_plan(
+        cls, job: Job, db: Optional[peewee.Database] = None
+    ) -> Generator[Payload, None, None]:
+        """
+        Planifica los volúmenes de una cinta de forma perezosa.
+
+        El manifiesto de cada volumen se calcula, se persiste y se descarta antes
+        de pasar al siguiente, por lo que la memoria queda acotada a un volumen
+        sin importar cuántos archivos tenga la carpeta. Los volúmenes ya
+        registrados se saltan, lo que permite reanudar una planificación
+        interrumpida.
+
+        Si se pasa `db`, cada volumen (Payload + catálogo) se confirma en su propia
+        transacción y queda disponible para la subida de inmediato.
+
+        En una cinta incremental los volúmenes cubren solo el delta, y los
+        archivos sin cambios se registran como referencias a la cinta base
+        junto con el último volumen. Un paquete se planifica igual que un
+        delta, con sus archivos ya registrados.
+        """
         from tartape.chunker import TarChunker
+        from tartape.schemas import ByteWindow
 
-        # tape = tartape.discover(job.source.path)
-        tar_chunker = TarChunker(chunk_size=job.config.tg_max_size)
-        vols = list(tar_chunker.iter_volumes(job.source.path))
+        source = job.source
+        chunk_size = job.config.tg_max_size
+        TarChunker(chunk_size=chunk_size)  # Valida la alineación con bloques TAR
+
+        base_job = job.base_job
+        delta: Optional[List[DeltaTrack]] = None
+        if base_job is not None:
+            # Solo los archivos cambiados: la memoria crece con el delta, no con la carpeta.
+            delta = list(iter_delta_tracks(source, base_job.source))
+            fingerprint = source.md5sum
+            total_size = job.config.delta_size
+        elif source.type == SourceType.BUNDLE:
+            delta = list(iter_bundle_tracks(source))
+            fingerprint = source.md5sum
+            total_size = source.size
+        else:
+            with open_tape_catalog(source.path) as cat:
+                stats = cat.get_stats()
+            fingerprint = stats["fingerprint"]
+            total_size = stats["total_size"]
+
+        ranges = cls.tape_volume_ranges(job, total_size, delta)
+        total_vols = len(ranges)
+
+        planned = {
+            p.sequence_index
+            for p in Payload.select(Payload.sequence_index).where(Payload.job == job)
+        }
+
+        for idx, (vol_start, vol_end) in enumerate(ranges):
+            if idx in planned:
+                continue
+
+            window = ByteWindow(start=vol_start, end=vol_end)
+            if delta is not None:
+                manifest = delta_volume_manifest(job, idx, window, delta)
+            else:
+                with open_tape_catalog(source.path):
+                    manifest = TarChunker.get_volume_manifest_for_range(
+                        fingerprint, idx, window, total_size=total_size
+                    )
 
-        count_parts = len(vols)
-        payloads = []
-        for idx, (vol, manifest) in enumerate(vols):
             filename, filename_short = build_payload_names(
-                source=job.source, idx=idx, total=count_parts
+                source=source, idx=idx, total=total_vols
             )
 
-            payload = Payload.create(
-                job=job,
-                sequence_index=manifest.volume_index,
-                start_offset=manifest.start_offset,
-                end_offset=manifest.end_offset,
-                size=manifest.chunk_size,
-                filename=filename,
-                filename_short=filename_short,
+            with db_transaction(db) if db is not None else nullcontext():
+                # Otro worker pudo planificar este volumen mientras calculábamos el manifiesto.
+                already_planned = (
+                    Payload.select()
+                    .where((Payload.job == job) & (Payload.sequence_index == idx))
+                    .exists()
+                )
+                if already_planned:
+                    continue
+
+                payload = Payload.create(
+                    job=job,
+                    sequence_index=manifest.volume_index,
+                    start_offset=manifest.start_offset,
+                    end_offset=manifest.end_offset,
+                    size=manifest.chunk_size,
+                    filename=filename,
+                    filename_short=filename_short,
+                )
+
+                TapeMember.register_manifest_entries(
+                    source=source,
+                    payload=payload,
+                    entries=manifest.entries,
+                )
+
+                if base_job is not None and idx == total_vols - 1:
+                    # Con el último volumen: un plan completo siempre tiene sus referencias.
+                    TapeMember.register_references(
+                        source,
+                        base_job.source,
+                        base_job.lineage(),
+                        iter_unchanged_paths(source, base_job.source),
+                    )
+
+            logger.debug(
+                f"Volumen {idx + 1}/{total_vols} planificado para el Job {job.id} "
+                f"({len(manifest.entries)} entradas)"
             )
+            del manifest
+            yield payload
 
-            TapeMember.register_manifest_entries(
-                source=job.source,
-                payload=payload,
-                entries=manifest.entries,
+
+class VolumePlanner(threading.Thread):
+    """
+    Planifica los volúmenes de una cinta en segundo plano.
+
+    Permite que la subida del primer volumen comience mientras los siguientes
+    todavía se están calculando. Cada volumen planificado despierta a quien
+    espere en `wait_for_progress`.
+    """
+
+    def __init__(self, job: Job, db: peewee.Database):
+        super().__init__(daemon=True, name=f"Planner-job-{job.id}")
+        self.job = job
+        self.db = db
+        self.error: Optional[BaseException] = None
+        self._planned = 0
+        self._done = False
+        self._stopping = threading.Event()
+        self._progress = threading.Condition()
+
+    @property
+    def is_done(self) -> bool:
+        return self._done
+
+    def run(self):
+        try:
+            # Peewee usa conexiones thread-local: este hilo necesita la suya.
+            with db_connection(self.db):
+                for _ in Chunker.iter_folder_plan(self.job, self.db):
+                    if self._stopping.is_set():
+                        logger.info(f"Planificación del Job {self.job.id} detenida.")
+                        break
+                    with self._progress:
+                        self._planned += 1
+                        self._progress.notify_all()
+        except BaseException as e:
+            logger.error(f"Fallo planificando volúmenes del Job {self.job.id}: {e}")
+            self.error = e
+        finally:
+            with self._progress:
+                self._done = True
+                self._progress.notify_all()
+
+    def stop(self):
+        """Pide detener la planificación tras el volumen en curso (se reanuda en otra sesión)."""
+        self._stopping.set()
+
+    def wait_for_progress(self, timeout: float = 5.0) -> bool:
+        """
+        Espera a que se planifique un nuevo volumen o a que termine la planificación.
+        Devuelve False cuando ya no se planificarán más volúmenes.
+        Relanza el error del hilo si la planificación falló.
+        """
+        with self._progress:
+            seen = self._planned
+            self._progress.wait_for(
+                lambda: self._done or self._planned != seen, timeout=timeout
             )
+            done = self._done
 
-            payloads.append(payload)
+        if self.error is not None:
+            raise self.error
+        return not done
 
-        return payloads
+
+class SnapshotCodec(str, Enum):
+    """Compresión del snapshot. Se detecta al leer por los bytes mágicos."""
+
+    XZ = "xz"
+    ZSTD = "zstd"
+
+    @property
+    def suffix(self) -> str:
+        return ".json.xz" if self == SnapshotCodec.XZ else ".json.zst"
+
+    @property
+    def magic(self) -> bytes:
+        return b"\xfd7zXZ\x00" if self == SnapshotCodec.XZ else b"\x28\xb5\x2f\xfd"
+
+    @classmethod
+    def detect(cls, path: Path) -> "SnapshotCodec":
+        with open(path, "rb") as f:
+            head = f.read(6)
+        for codec in cls:
+            if head.startswith(codec.magic):
+                return codec
+        raise ValueError(f"Formato de snapshot no reconocido: {path.name}")
+
+    def open(self, path: Path, mode: str) -> IO[str]:
+        """Abre el snapshot en modo texto ('rt' o 'wt')."""
+        if self == SnapshotCodec.XZ:
+            # El preset bajo es varias veces más rápido que el por defecto (6)
+            # y la diferencia de tamaño en JSON es pequeña.
+            preset = SNAPSHOT_XZ_PRESET if "w" in mode else None
+            return cast(IO[str], lzma.open(path, mode, encoding="utf-8", preset=preset))
+
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError(
+                "El códec zstd requiere el paquete opcional 'zstandard' "
+                "(pip install totelegram[zstd])."
+            )
+
+        if "w" in mode:
+            cctx = zstandard.ZstdCompressor(level=SNAPSHOT_ZSTD_LEVEL)
+            return cast(IO[str], zstandard.open(path, mode, cctx=cctx, encoding="utf-8"))
+        return cast(IO[str], zstandard.open(path, mode, encoding="utf-8"))
 
 
 class SnapshotService:
     @staticmethod
-    def generate_snapshot(job: Job):
+    def generate_snapshot(job: Job, codec: SnapshotCodec = SnapshotCodec.XZ):
+        """
+        Escribe el snapshot de un Job en streaming.
+
+        Las partes y el inventario se leen de cursores de la DB y se escriben
+        entrada a entrada, sin construir el `UploadManifest` completo en memoria.
+        El archivo se escribe en un temporal y se mueve al final, de modo que un
+        fallo nunca deja un snapshot a medias.
+        """
         source = job.source
         original_file_path = Path(source.path_str)
 
@@ -223,60 +595,15 @@ class SnapshotService:
             .order_by(Payload.sequence_index)
         )
 
-        if not remotes_db.exists():
+        first_remote = next(iter(remotes_db.clone().limit(1)), None)
+        if first_remote is None:
             raise ValueError(
                 f"No hay registros remotos para el Job {job.id}. Imposible crear snapshot."
             )
 
-        # Mapa de Mensajes en Telegram
-        parts = [
-            RemotePart(
-                sequence=r.payload.sequence_index,
-                message_id=r.message_id,
-                chat_id=r.chat_id,
-                link=r.message.link or "",
-                part_filename=r.payload.filename,
-                part_size=r.payload.size,
-                part_md5sum=r.payload.md5sum or "",
-                start_offset=r.payload.start_offset,
-                end_offset=r.payload.end_offset,
-            )
-            for r in remotes_db
-        ]
-
-        # Construimos el inventario con el GPS de los archivos
-        inventory: Optional[List[TapeMemberSnapshot]] = None
-        if source.type == SourceType.FOLDER:
-            inventory = []
-            # TapeMember -> TapeMemberGPS -> Payload
-            members = cast(
-                List[TapeMember],
-                TapeMember.select()
-                .where(TapeMember.source == source)
-                .prefetch(TapeMemberGPS, Payload),
-            )
-
-            for m in members:
-                fragments = [
-                    FileFragment(
-                        vol_idx=gps.payload.sequence_index,
-                        offset_in_vol=gps.offset_in_volume,
-                        bytes_in_volume=gps.bytes_in_volume,
-                    )
-                    for gps in m.fragments
-                ]
-
-                inventory.append(
-                    TapeMemberSnapshot(
-                        relative_path=m.relative_path,
-                        size=m.size,
-                        md5sum=m.md5sum,
-                        fragments=fragments,
-                    )
-                )
-
-        # Metadatos del Origen (Archivo o Carpeta)
-        owner = remotes_db[0].owner
+        # Cabecera: todo el manifiesto salvo las listas que crecen con el origen.
+        owner = first_remote.owner
+        base_job = job.base_job
         source_meta = SourceMetadata(
             filename=original_file_path.name,
             size=source.size,
@@ -285,11 +612,9 @@ class SnapshotService:
             mtime=source.mtime,
             type=source.type,
             tape_catalog=source.tape_catalog,
-            inventory=inventory,
         )
-
-        # Crear Manifiesto Final
-        manifest = UploadManifest(
+        header = UploadManifest(
+            codec=codec.value,
             strategy=job.strategy,
             chunk_size=job.config.tg_max_size,
             created_at=job.created_at,
@@ -297,43 +622,320 @@ class SnapshotService:
             owner_id=owner.id,
             owner_name=owner.first_name,
             source=source_meta,
-            parts=parts,
-        )
+            parts=[],
+            base_fingerprint=base_job.source.md5sum if base_job else None,
+            compression=job.config.compression,
+            compression_frame_size=(
+                FRAME_SIZE if job.config.compression != PayloadCompression.NONE else 0
+            ),
+        ).model_dump(mode="json", exclude={"parts"})
+        source_header = header.pop("source")
+        source_header.pop("inventory")
 
-        # Guardado Atómico Comprimido
         output_path = SnapshotService._resolve_snapshot_path(
-            original_file_path, source.md5sum
+            original_file_path, source.md5sum, codec
+        )
+        if output_path.exists() and not output_path.name.endswith(codec.suffix):
+            # Se reescribe el snapshot que ya había, en su códec: el nombre lo delata.
+            codec = SnapshotCodec.detect(output_path)
+        tmp_path = output_path.with_name(f"{output_path.name}.tmp")
+
+        try:
+            with codec.open(tmp_path, "wt") as f:
+                f.write("{\n")
+                for key, value in header.items():
+                    f.write(f"{json.dumps(key)}: {json.dumps(value)},\n")
+
+                f.write('"source": {\n')
+                for key, value in source_header.items():
+                    f.write(f"{json.dumps(key)}: {json.dumps(value)},\n")
+                f.write('"inventory": ')
+                if source.type in (SourceType.FOLDER, SourceType.BUNDLE):
+                    SnapshotService._write_json_array(
+                        f, SnapshotService._iter_inventory(job)
+                    )
+                else:
+                    f.write("null")
+                f.write("\n},\n")
+
+                f.write('"parts": ')
+                SnapshotService._write_json_array(
+                    f, SnapshotService._iter_parts(remotes_db)
+                )
+                f.write("\n}\n")
+
+            os.replace(tmp_path, output_path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+        index = SnapshotIndex.load(output_path.parent)
+        members = bundle_member_stamps(source) if source.type == SourceType.BUNDLE else None
+        stamp = [source.size, source.mtime] if source.type == SourceType.FILE else None
+        index.put(
+            output_path.name, source.md5sum, MANIFEST_VERSION, codec.value, members, stamp
         )
-        with lzma.open(output_path, "wt", encoding="utf-8") as f:
-            f.write(manifest.model_dump_json(indent=2))
+        index.save()
 
-        return manifest
+        logger.info(f"Snapshot escrito en {output_path.name} (códec {codec.value})")
+        return output_path
 
     @staticmethod
-    def _resolve_snapshot_path(file_path: Path, current_md5: str) -> Path:
-        """Resuelve el nombre del archivo evitando colisiones (ADR-003)."""
-        base_target = file_path.with_name(f"{file_path.name}.json.xz")
+    def _write_json_array(f: IO[str], items: Iterator[dict]):
+        f.write("[")
+        for i, item in enumerate(items):
+            f.write(",\n" if i else "\n")
+            f.write(json.dumps(item, ensure_ascii=False))
+        f.write("\n]")
 
-        # Si no existe, es la ruta ideal
-        if not base_target.exists():
-            return base_target
+    @staticmethod
+    def _iter_parts(remotes_db: peewee.ModelSelect) -> Iterator[dict]:
+        """Mapa de mensajes en Telegram, con la forma de `RemotePart`."""
+        for r in remotes_db.iterator():
+            yield {
+                "sequence": r.payload.sequence_index,
+                "message_id": r.message_id,
+                "chat_id": r.chat_id,
+                "link": r.message.link or "",
+                "part_filename": r.payload.filename,
+                "part_size": r.payload.size,
+                "part_md5sum": r.payload.md5sum or "",
+                "start_offset": r.payload.start_offset,
+                "end_offset": r.payload.end_offset,
+                "packed_size": r.payload.packed_size,
+                "frames": r.payload.packed_frames,
+            }
 
-        try:
-            with lzma.open(base_target, "rt", encoding="utf-8") as f:
-                import json
+    @staticmethod
+    def _iter_inventory(job: Job) -> Iterator[dict]:
+        """
+        Inventario con el GPS de cada archivo, con la forma de `TapeMemberSnapshot`.
+
+        Un único cursor ordenado por miembro (TapeMember -> TapeMemberGPS -> Payload)
+        agrupa los fragmentos de cada archivo sin cargar el catálogo en memoria.
+        Solo cuentan los volúmenes del Job y, en una cinta incremental, los de sus
+        Jobs base, cuyos fragmentos llevan el mensaje donde están.
+        """
+        lineage = job.lineage()
+        rows = (
+            TapeMember.select(
+                TapeMember.id,
+                TapeMember.relative_path,
+                TapeMember.size,
+                TapeMember.md5sum,
+                Payload.id,
+                Payload.job,
+                Payload.sequence_index,
+                TapeMemberGPS.offset_in_volume,
+                TapeMemberGPS.bytes_in_volume,
+                RemotePayload.message_id,
+                RemotePayload.chat,
+            )
+            .join(TapeMemberGPS, peewee.JOIN.LEFT_OUTER)
+            .join(
+                Payload,
+                peewee.JOIN.LEFT_OUTER,
+                on=(TapeMemberGPS.payload == Payload.id) & (Payload.job << lineage),
+            )
+            .join(
+                RemotePayload,
+                peewee.JOIN.LEFT_OUTER,
+                on=(
+                    (RemotePayload.payload == Payload.id)
+                    & (Payload.job != job)
+                    & (RemotePayload.is_orphaned == False)  # noqa: E712
+                ),
+            )
+            .where(TapeMember.source == job.source)
+            .order_by(TapeMember.id, Payload.sequence_index)
+            .tuples()
+            .iterator()
+        )
+
+        current: Optional[dict] = None
+        current_id = None
+        seen_payloads = set()
+        for row in rows:
+            member_id, path, size, md5sum, payload_id, job_id = row[:6]
+            vol_idx, offset, end, msg_id, chat_id = row[6:]
+            if member_id != current_id:
+                if current is not None:
+                    yield current
+                current_id = member_id
+                seen_payloads.clear()
+                current = {
+                    "relative_path": path,
+                    "size": size,
+                    "md5sum": md5sum,
+                    "fragments": [],
+                }
+            if vol_idx is None or payload_id in seen_payloads:
+                continue
+            seen_payloads.add(payload_id)
+
+            fragment = {"vol_idx": vol_idx, "offset_in_vol": offset, "bytes_in_volume": end}
+            if job_id != job.id:
+                if msg_id is None:
+                    raise ValueError(
+                        f"'{path}' depende de un volumen de la cinta base que ya no está "
+                        "en Telegram. Vuelve a subir la carpeta con --force."
+                    )
+                fragment.update(message_id=msg_id, chat_id=chat_id)
+            current["fragments"].append(fragment)  # type: ignore
+
+        if current is not None:
+            yield current
+
+    @staticmethod
+    def read_snapshot(snapshot_path: Path) -> UploadManifest:
+        """
+        Carga y valida un snapshot. El códec se detecta por el contenido, así que
+        también se leen los snapshots anteriores (xz, sin campo `codec`).
+        """
+        codec = SnapshotCodec.detect(snapshot_path)
+        with codec.open(snapshot_path, "rt") as f:
+            return UploadManifest.model_validate_json(f.read())
 
-                existing_data = json.load(f)
-                if existing_data.get("source", {}).get("md5sum") == current_md5:
-                    return base_target
+    @staticmethod
+    def _read_snapshot_meta(snapshot_path: Path) -> Optional[dict]:
+        """Lee la cabecera de un snapshot descomprimiéndolo (camino lento)."""
+        try:
+            codec = SnapshotCodec.detect(snapshot_path)
+            with codec.open(snapshot_path, "rt") as f:
+                data = json.load(f)
+            return {
+                "md5sum": data.get("source", {}).get("md5sum"),
+                "manifest_version": data.get("manifest_version", "5.0"),
+                "codec": codec.value,
+            }
         except Exception:
-            pass
+            return None
+
+    @staticmethod
+    def get_snapshot_meta(
+        snapshot_path: Path, index: Optional[SnapshotIndex] = None
+    ) -> Optional[dict]:
+        """
+        Metadatos (md5sum, manifest_version, codec) de un snapshot existente.
+
+        Se consultan en el índice de la carpeta. Los snapshots que no figuran en
+        él (anteriores al índice o copiados a mano) se leen una vez y se añaden.
+        """
+        index = index or SnapshotIndex.load(snapshot_path.parent)
+        meta = index.get(snapshot_path.name)
+        if meta is not None:
+            return meta
+
+        meta = SnapshotService._read_snapshot_meta(snapshot_path)
+        if meta is not None and meta["md5sum"]:
+            index.put(snapshot_path.name, **meta)
+            index.save()
+        return meta
 
-        # Si es un recurso distinto, numerar: archivo (1).ext.json.xz
-        counter = 1
-        while True:
-            new_target = file_path.with_name(
-                f"{file_path.stem} ({counter}){file_path.suffix}.json.xz"
+    @staticmethod
+    def bundled_members(folder: Path) -> dict:
+        """
+        Archivos de `folder` enviados en paquetes: nombre -> [tamaño, mtime, md5].
+
+        Sale del índice; si la entrada de un snapshot de paquete falta o no
+        describe el archivo en disco, la lista se reconstruye desde el snapshot.
+        Solo cuentan los archivos cuyo MD5 actual es el del paquete (son
+        pequeños: leerlos una vez es barato) y el resultado vuelve al índice.
+        """
+        index = SnapshotIndex.load(folder)
+        rebuilt = False
+        for snapshot_path in sorted(folder.glob("*.bundle-*.json.*")):
+            entry = index.get(snapshot_path.name)
+            if entry is not None and "members" in entry:
+                continue
+            try:
+                manifest = SnapshotService.read_snapshot(snapshot_path)
+            except Exception as e:
+                logger.warning(
+                    f"Snapshot de paquete ilegible, se ignora: {snapshot_path.name} ({e})"
+                )
+                continue
+            if manifest.source.type != SourceType.BUNDLE:
+                continue
+
+            members = {}
+            for member in manifest.source.inventory or []:
+                path = folder / member.relative_path
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                if stat.st_size != member.size:
+                    continue
+                if create_md5sum_by_hashlib(path) == member.md5sum:
+                    members[member.relative_path] = [stat.st_size, stat.st_mtime, member.md5sum]
+
+            index.put(
+                snapshot_path.name,
+                manifest.source.md5sum,
+                manifest.manifest_version,
+                SnapshotCodec.detect(snapshot_path).value,
+                members,
             )
-            if not new_target.exists():
-                return new_target
+            rebuilt = True
+
+        if rebuilt:
+            index.save()
+        return index.bundled_members()
+
+    @staticmethod
+    def describes_current_content(
+        file_path: Path, md5sums: Optional[Dict[Path, str]] = None
+    ) -> bool:
+        """
+        ¿Hay un snapshot de `file_path` con su contenido actual?
+
+        Si el tamaño y el mtime coinciden con los del archivo subido (índice) no
+        se lee nada; si no, se compara el MD5 con el de cada snapshot de la ruta.
+        El MD5 calculado se guarda en `md5sums`, si se pasa.
+        """
+        snapshots = existing_snapshots(file_path)
+        if not snapshots:
+            return False
+
+        stat = file_path.stat()
+        index = SnapshotIndex.load(file_path.parent)
+        metas = [SnapshotService.get_snapshot_meta(s, index) or {} for s in snapshots]
+        if any(stamp_matches(m.get("stamp"), stat.st_size, stat.st_mtime) for m in metas):
+            return True
+
+        md5sum = create_md5sum_by_hashlib(file_path)
+        if md5sums is not None:
+            md5sums[file_path] = md5sum
+        return any(m.get("md5sum") == md5sum for m in metas)
+
+    @staticmethod
+    def _resolve_snapshot_path(
+        file_path: Path, current_md5: str, codec: SnapshotCodec = SnapshotCodec.XZ
+    ) -> Path:
+        """
+        Resuelve el nombre del archivo evitando colisiones (ADR-003).
+
+        Un snapshot existente del mismo contenido se reutiliza aunque sea de
+        otro códec: cambiar `snapshot_codec` no duplica los snapshots.
+        """
+        index = SnapshotIndex.load(file_path.parent)
+
+        for existing in existing_snapshots(file_path):
+            meta = SnapshotService.get_snapshot_meta(existing, index)
+            if meta is not None and meta.get("md5sum") == current_md5:
+                return existing
+
+        base_target = file_path.with_name(f"{file_path.name}{codec.suffix}")
+        counter = 0
+        target = base_target
+        while target.exists():
+            meta = SnapshotService.get_snapshot_meta(target, index)
+            if meta is not None and meta.get("md5sum") == current_md5:
+                return target
+
+            # Si es un recurso distinto, numerar: archivo (1).ext.json.xz
             counter += 1
+            target = file_path.with_name(
+                f"{file_path.stem} ({counter}){file_path.suffix}{codec.suffix}"
+            )
+        return target
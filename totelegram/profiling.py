@@ -0,0 +1,157 @@
+import logging
+import sys
+import threading
+from collections import Counter
+from enum import Enum
+from pathlib import Path
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ProfileMode(str, Enum):
+    CPU = "cpu"
+    MEM = "mem"
+    BOTH = "both"
+
+
+class StackSampler(threading.Thread):
+    """
+    Muestrea las pilas de todos los hilos cada `interval` segundos.
+
+    cProfile solo ve el hilo que lo activó; el muestreo también cubre al
+    planificador de volúmenes, al loop de Pyrogram y a los hilos de leases. Las
+    pilas se acumulan en formato colapsado (`hilo;f1;f2 N`), listo para
+    flamegraph.pl o speedscope.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        super().__init__(name="stack-sampler", daemon=True)
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop_event = threading.Event()
+
+    @staticmethod
+    def _frame_name(frame) -> str:
+        code = frame.f_code
+        return f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == self.ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._frame_name(frame))
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def write_collapsed(self, path: Path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write(f"{stack} {count}\n")
+
+
+class RunProfiler:
+    """
+    Perfila la ejecución de un comando y deja los resultados junto a su log.
+
+    - cpu: `<run>.pstats` (cProfile) y `<run>.collapsed` (pilas muestreadas).
+    - mem: `<run>.alloc.txt` con los sitios que más memoria retienen (tracemalloc).
+    """
+
+    def __init__(self, mode: ProfileMode, output_prefix: Path, top: int = 30):
+        self.mode = ProfileMode(mode)
+        self.output_prefix = output_prefix
+        self.top = top
+        self._profile = None
+        self._sampler: Optional[StackSampler] = None
+
+    @property
+    def cpu(self) -> bool:
+        return self.mode in (ProfileMode.CPU, ProfileMode.BOTH)
+
+    @property
+    def mem(self) -> bool:
+        return self.mode in (ProfileMode.MEM, ProfileMode.BOTH)
+
+    def _path(self, suffix: str) -> Path:
+        return self.output_prefix.with_name(f"{self.output_prefix.name}{suffix}")
+
+    def start(self):
+        if self.mem:
+            import tracemalloc
+
+            tracemalloc.start(25)
+        if self.cpu:
+            import cProfile
+
+            self._sampler = StackSampler()
+            self._sampler.start()
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+
+    def stop(self) -> List[Path]:
+        """Detiene los perfiladores y escribe los resultados. Devuelve los archivos."""
+        written = []
+        if self._profile is not None:
+            self._profile.disable()
+            path = self._path(".pstats")
+            self._profile.dump_stats(str(path))
+            written.append(path)
+            self._profile = None
+
+        if self._sampler is not None:
+            self._sampler.stop()
+            path = self._path(".collapsed")
+            self._sampler.write_collapsed(path)
+            written.append(path)
+            self._sampler = None
+
+        if self.mem:
+            written.append(self._write_allocations())
+
+        for path in written:
+            logger.info(f"Perfil escrito en {path}")
+        return written
+
+    def _write_allocations(self) -> Path:
+        import tracemalloc
+
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        snapshot = snapshot.filter_traces(
+            (
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            )
+        )
+
+        path = self._path(".alloc.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f"Memoria trazada al terminar: {current / 1024:.1f} KiB\n")
+            f.write(f"Pico de memoria trazada: {peak / 1024:.1f} KiB\n\n")
+
+            f.write(f"Top {self.top} sitios de asignación (por línea):\n")
+            for i, stat in enumerate(snapshot.statistics("lineno")[: self.top], 1):
+                frame = stat.traceback[0]
+                f.write(
+                    f"{i:>3}. {frame.filename}:{frame.lineno}: "
+                    f"{stat.size / 1024:.1f} KiB en {stat.count} bloques\n"
+                )
+
+            f.write("\nPilas de los 5 sitios mayores:\n")
+            for stat in snapshot.statistics("traceback")[:5]:
+                f.write(f"\n{stat.size / 1024:.1f} KiB en {stat.count} bloques\n")
+                for line in stat.traceback.format():
+                    f.write(f"  {line}\n")
+        return path
@@ -0,0 +1,691 @@
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import (
+    TYPE_CHECKING,
+    AsyncIterator,
+    BinaryIO,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    cast,
+)
+
+from totelegram.compression import decompress_frame, frame_spans
+from totelegram.packaging import RemotePart, TapeMemberSnapshot, UploadManifest
+from totelegram.schemas import SourceType
+from totelegram.utils import batched, create_md5sum_by_hashlib
+
+if TYPE_CHECKING:
+    from pyrogram.client import Client
+    from pyrogram.types import Message
+
+
+logger = logging.getLogger(__name__)
+
+# Tamaño de bloque de `upload.GetFile`: Pyrogram pide la media en trozos de 1 MiB
+# y `stream_media` recibe offset/limit en unidades de ese tamaño.
+TG_CHUNK_SIZE = 1024 * 1024
+TAR_BLOCK_SIZE = 512
+# Una parte se divide en segmentos que se descargan en paralelo, cada uno con su
+# propia petición parcial. También es la unidad mínima que se reanuda.
+SEGMENT_SIZE = 64 * TG_CHUNK_SIZE
+
+
+@dataclass(frozen=True)
+class VolumeRange:
+    """Rango de bytes [start, end) dentro de un volumen (parte subida a Telegram)."""
+
+    vol_idx: int
+    start: int
+    end: int
+    # Volumen de una cinta base (snapshot incremental): no está en `parts`.
+    message_id: Optional[int] = None
+    chat_id: Optional[int] = None
+
+    @property
+    def size(self) -> int:
+        return self.end - self.start
+
+
+@dataclass(frozen=True)
+class PartSegment:
+    """Segmento [start, end) de una parte, en offsets relativos a la parte."""
+
+    sequence: int
+    start: int
+    end: int
+
+    @property
+    def size(self) -> int:
+        return self.end - self.start
+
+
+def plan_part_segments(
+    part: RemotePart, segment_size: int = SEGMENT_SIZE
+) -> List[PartSegment]:
+    """
+    Divide una parte en segmentos alineados con los bloques de `upload.GetFile`.
+    En una parte comprimida, los segmentos son del documento comprimido.
+    """
+    if segment_size % TG_CHUNK_SIZE != 0:
+        raise ValueError("El tamaño de segmento debe ser múltiplo de 1 MiB.")
+
+    return [
+        PartSegment(
+            sequence=part.sequence,
+            start=start,
+            end=min(start + segment_size, part.stored_size),
+        )
+        for start in range(0, part.stored_size, segment_size)
+    ]
+
+
+def packed_part_path(tmp_target: Path, part: RemotePart) -> Path:
+    """Archivo donde se descarga una parte comprimida antes de descomprimirla."""
+    return tmp_target.with_name(f"{tmp_target.name}.{part.sequence}.zst")
+
+
+def is_incremental(manifest: UploadManifest) -> bool:
+    return manifest.base_fingerprint is not None
+
+
+def restores_as_tree(manifest: UploadManifest) -> bool:
+    """Incrementales y paquetes se restauran archivo a archivo (ver `restore_tree`)."""
+    return is_incremental(manifest) or manifest.source.type == SourceType.BUNDLE
+
+
+def resolve_restore_target(manifest: UploadManifest, output_dir: Path) -> Path:
+    """
+    Ruta final del origen restaurado. Las carpetas se restauran como su cinta
+    .tar; las incrementales, cuyas partes no forman una cinta, como el árbol.
+    Los archivos de un paquete se restauran sueltos en `output_dir`.
+    """
+    if manifest.source.type == SourceType.BUNDLE:
+        return output_dir
+    filename = manifest.source.filename
+    if manifest.source.type == SourceType.FOLDER and not is_incremental(manifest):
+        filename = f"{filename}.tar"
+    return output_dir / filename
+
+
+def restore_size(manifest: UploadManifest) -> int:
+    """Bytes que escribe la restauración completa."""
+    if restores_as_tree(manifest):
+        return sum(m.size for m in manifest.source.inventory or [])
+    return manifest.source.size
+
+
+class RestoreJournal:
+    """
+    Registro de progreso de una restauración completa, guardado junto al
+    archivo parcial. Permite reanudar sin volver a descargar los segmentos ya
+    escritos ni volver a verificar las partes ya comprobadas.
+    """
+
+    def __init__(self, path: Path, source_md5sum: str):
+        self.path = path
+        self.source_md5sum = source_md5sum
+        self.segments: Set[Tuple[int, int]] = set()
+        self.verified_parts: Set[int] = set()
+
+    @classmethod
+    def load(cls, path: Path, source_md5sum: str) -> "RestoreJournal":
+        journal = cls(path, source_md5sum)
+        if not path.exists():
+            return journal
+
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            logger.warning(f"Diario de restauración ilegible, se ignora: {path}")
+            return journal
+
+        # Un diario de otro origen no sirve: se empieza de cero.
+        if data.get("source_md5sum") != source_md5sum:
+            return journal
+
+        journal.segments = {tuple(s) for s in data.get("segments", [])}  # type: ignore
+        journal.verified_parts = set(data.get("verified_parts", []))
+        return journal
+
+    def is_done(self, segment: PartSegment) -> bool:
+        return (segment.sequence, segment.start) in self.segments
+
+    def mark_segment(self, segment: PartSegment):
+        self.segments.add((segment.sequence, segment.start))
+        self.save()
+
+    def mark_verified(self, sequence: int):
+        self.verified_parts.add(sequence)
+        self.save()
+
+    def discard_part(self, sequence: int):
+        self.segments = {s for s in self.segments if s[0] != sequence}
+        self.verified_parts.discard(sequence)
+        self.save()
+
+    def save(self):
+        data = {
+            "source_md5sum": self.source_md5sum,
+            "segments": sorted(self.segments),
+            "verified_parts": sorted(self.verified_parts),
+        }
+        tmp_path = self.path.with_name(f"{self.path.name}.tmp")
+        tmp_path.write_text(json.dumps(data), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+
+    def delete(self):
+        self.path.unlink(missing_ok=True)
+
+
+def find_member(manifest: UploadManifest, relative_path: str) -> TapeMemberSnapshot:
+    """Busca un archivo en el inventario de un snapshot de carpeta."""
+    is_tape = manifest.source.type in (SourceType.FOLDER, SourceType.BUNDLE)
+    if not is_tape or not manifest.source.inventory:
+        raise ValueError("El snapshot no corresponde a una carpeta con inventario.")
+
+    wanted = relative_path.replace("\\", "/").strip("/")
+    for member in manifest.source.inventory:
+        if member.relative_path.strip("/") == wanted:
+            return member
+
+    raise ValueError(f"'{relative_path}' no existe en el inventario del snapshot.")
+
+
+def plan_member_ranges(member: TapeMemberSnapshot) -> List[VolumeRange]:
+    """
+    Traduce el GPS de un archivo a los rangos de bytes que hay que descargar.
+
+    Los fragmentos, concatenados en orden, forman la entrada TAR completa:
+    cabecera + contenido + relleno. Solo se devuelven los rangos del contenido,
+    de modo que la cabecera y el relleno nunca se descargan.
+    """
+    if member.size == 0:
+        return []
+
+    fragments = sorted(member.fragments, key=lambda f: f.vol_idx)
+    entry_size = sum(f.bytes_in_volume - f.offset_in_vol for f in fragments)
+    padding = (TAR_BLOCK_SIZE - member.size % TAR_BLOCK_SIZE) % TAR_BLOCK_SIZE
+    header_size = entry_size - member.size - padding
+    if header_size < TAR_BLOCK_SIZE:
+        raise ValueError(
+            f"GPS incompleto para '{member.relative_path}': "
+            f"{entry_size} bytes registrados para {member.size} bytes de contenido."
+        )
+
+    content_start = header_size
+    content_end = header_size + member.size
+
+    ranges: List[VolumeRange] = []
+    cursor = 0  # Posición dentro de la entrada TAR concatenada
+    for frag in fragments:
+        frag_size = frag.bytes_in_volume - frag.offset_in_vol
+        frag_start, frag_end = cursor, cursor + frag_size
+        cursor = frag_end
+
+        start = max(frag_start, content_start)
+        end = min(frag_end, content_end)
+        if start >= end:
+            continue
+
+        ranges.append(
+            VolumeRange(
+                vol_idx=frag.vol_idx,
+                start=frag.offset_in_vol + (start - frag_start),
+                end=frag.offset_in_vol + (end - frag_start),
+                message_id=frag.message_id,
+                chat_id=frag.chat_id,
+            )
+        )
+
+    return ranges
+
+
+class RestoreService:
+    """Recupera archivos desde Telegram usando la información de un snapshot."""
+
+    def __init__(
+        self,
+        client: "Client",
+        on_progress: Optional[Callable[[int], None]] = None,
+    ):
+        self.client = client
+        self.on_progress = on_progress
+
+    def restore_member(
+        self, manifest: UploadManifest, relative_path: str, output_dir: Path
+    ) -> Path:
+        """
+        Restaura un único archivo de una cinta descargando solo los rangos de
+        los volúmenes que lo contienen.
+        """
+        member = find_member(manifest, relative_path)
+        return self._restore_member(manifest, member, output_dir, {})
+
+    def _restore_member(
+        self,
+        manifest: UploadManifest,
+        member: TapeMemberSnapshot,
+        output_dir: Path,
+        messages: Dict[Tuple[int, int], "Message"],
+    ) -> Path:
+        ranges = plan_member_ranges(member)
+        parts = {p.sequence: p for p in manifest.parts}
+
+        target = output_dir / Path(*member.relative_path.strip("/").split("/"))
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp_target = target.with_name(f"{target.name}.part")
+
+        logger.info(
+            f"Restaurando {member.relative_path} ({member.size} bytes) "
+            f"desde {len(ranges)} rango(s) de volumen."
+        )
+
+        hasher = hashlib.md5()
+        with open(tmp_target, "wb") as out:
+            for vol_range in ranges:
+                part = None
+                if vol_range.message_id is not None:
+                    key = (cast(int, vol_range.chat_id), vol_range.message_id)
+                elif vol_range.vol_idx in parts:
+                    part = parts[vol_range.vol_idx]
+                    key = (part.chat_id, part.message_id)
+                else:
+                    raise ValueError(
+                        f"El snapshot no contiene la parte {vol_range.vol_idx}."
+                    )
+                message = messages.get(key)
+                if message is None:
+                    message = self._get_message(*key, vol_range.vol_idx)
+                    messages[key] = message
+
+                if part is not None and part.frames:
+                    self._download_packed_range(
+                        message, part, vol_range, manifest.compression_frame_size, out, hasher
+                    )
+                else:
+                    self._download_range(message, vol_range, out, hasher)
+
+        if hasher.hexdigest() != member.md5sum:
+            tmp_target.unlink(missing_ok=True)
+            raise ValueError(
+                f"El MD5 de '{member.relative_path}' no coincide con el del snapshot."
+            )
+
+        tmp_target.replace(target)
+        logger.info(f"Archivo restaurado y verificado: {target}")
+        return target
+
+    def restore_tree(self, manifest: UploadManifest, output_dir: Path) -> Path:
+        """
+        Restaura una carpeta archivo a archivo desde su inventario.
+
+        Es la restauración completa de un snapshot incremental (sus archivos
+        están repartidos entre los volúmenes de varias cintas) y de un paquete.
+        Los archivos que ya existen con su MD5 se saltan, así que se puede reanudar.
+        """
+        # Las rutas del inventario ya empiezan por el nombre de la carpeta.
+        target = resolve_restore_target(manifest, output_dir)
+        members = manifest.source.inventory or []
+        messages: Dict[Tuple[int, int], "Message"] = {}
+
+        logger.info(
+            f"Restaurando {manifest.source.filename}: {len(members)} archivos "
+            f"desde la cinta {manifest.source.md5sum} y sus cintas base."
+        )
+        for member in members:
+            path = output_dir / Path(*member.relative_path.strip("/").split("/"))
+            if path.exists() and path.stat().st_size == member.size:
+                if create_md5sum_by_hashlib(path) == member.md5sum:
+                    if self.on_progress:
+                        self.on_progress(member.size)
+                    continue
+            self._restore_member(manifest, member, output_dir, messages)
+
+        logger.info(f"Carpeta restaurada y verificada: {target}")
+        return target
+
+    def restore_source(
+        self, manifest: UploadManifest, output_dir: Path, workers: int = 4
+    ) -> Path:
+        """
+        Restaura el origen completo descrito por el snapshot.
+
+        Las partes se dividen en segmentos que se descargan en paralelo (cada
+        petición de Pyrogram abre su propia sesión de medios) y se escriben
+        directamente en su `start_offset` dentro de un archivo preasignado.
+        Cada parte se verifica con su `part_md5sum` y, en archivos, el resultado
+        final con el MD5 del origen. Un diario junto al archivo parcial permite
+        reanudar tras una interrupción.
+
+        Las partes comprimidas se descargan en un archivo aparte y se
+        descomprimen en su `start_offset` cuando llega su último segmento.
+
+        Un snapshot incremental o de un paquete se restaura como árbol (ver
+        `restore_tree`).
+        """
+        if restores_as_tree(manifest):
+            return self.restore_tree(manifest, output_dir)
+
+        target = resolve_restore_target(manifest, output_dir)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp_target = target.with_name(f"{target.name}.part")
+        journal = RestoreJournal.load(
+            target.with_name(f"{target.name}.restore.json"), manifest.source.md5sum
+        )
+
+        if not tmp_target.exists():
+            journal = RestoreJournal(journal.path, manifest.source.md5sum)
+
+        # Preasignar: cada segmento escribe en su posición sin depender del orden.
+        with open(tmp_target, "ab") as f:
+            f.truncate(manifest.source.size)
+
+        pending: List[PartSegment] = []
+        pending_bytes = 0
+        for part in manifest.parts:
+            segments = [s for s in plan_part_segments(part) if not journal.is_done(s)]
+            if not segments:
+                continue
+            pending.extend(segments)
+            if part.frames:
+                # El progreso de una parte comprimida avanza al descomprimirla.
+                pending_bytes += part.part_size
+                with open(packed_part_path(tmp_target, part), "ab") as f:
+                    f.truncate(part.stored_size)
+            else:
+                pending_bytes += sum(s.size for s in segments)
+        if self.on_progress:
+            self.on_progress(manifest.source.size - pending_bytes)
+
+        logger.info(
+            f"Restaurando {manifest.source.filename}: {len(manifest.parts)} partes, "
+            f"{len(pending)} segmentos pendientes, {workers} descargas en paralelo."
+        )
+
+        self.client.loop.run_until_complete(
+            self._download_parts(manifest, pending, tmp_target, journal, workers)
+        )
+
+        if manifest.source.type != SourceType.FOLDER:
+            if create_md5sum_by_hashlib(tmp_target) != manifest.source.md5sum:
+                journal.delete()
+                raise ValueError(
+                    f"El MD5 final de '{manifest.source.filename}' no coincide con el del snapshot."
+                )
+
+        tmp_target.replace(target)
+        journal.delete()
+        logger.info(f"Origen restaurado y verificado: {target}")
+        return target
+
+    async def _download_parts(
+        self,
+        manifest: UploadManifest,
+        pending: List[PartSegment],
+        tmp_target: Path,
+        journal: RestoreJournal,
+        workers: int,
+    ):
+        parts = {p.sequence: p for p in manifest.parts}
+        messages = await self._fetch_messages(
+            [parts[seq] for seq in sorted({s.sequence for s in pending})]
+        )
+
+        remaining: Dict[int, int] = {}
+        for seg in pending:
+            remaining[seg.sequence] = remaining.get(seg.sequence, 0) + 1
+
+        semaphore = asyncio.Semaphore(workers)
+
+        async def worker(seg: PartSegment):
+            part = parts[seg.sequence]
+            async with semaphore:
+                await self._download_segment(messages[seg.sequence], part, seg, tmp_target)
+            journal.mark_segment(seg)
+
+            remaining[seg.sequence] -= 1
+            if remaining[seg.sequence] == 0:
+                if part.frames:
+                    self._unpack_part(part, tmp_target)
+                self._verify_part(part, tmp_target, journal)
+
+        tasks = [asyncio.ensure_future(worker(seg)) for seg in pending]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            # Un fallo detiene el resto: lo ya escrito queda en el diario.
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+        # Partes completas en una ejecución anterior pero no verificadas.
+        for part in manifest.parts:
+            if part.sequence not in journal.verified_parts:
+                if part.frames and packed_part_path(tmp_target, part).exists():
+                    self._unpack_part(part, tmp_target)
+                self._verify_part(part, tmp_target, journal)
+
+    async def _fetch_messages(self, parts: List[RemotePart]) -> Dict[int, "Message"]:
+        """Obtiene los mensajes de las partes en lotes de 200 (límite de la API)."""
+        by_chat: Dict[int, List[RemotePart]] = {}
+        for part in parts:
+            by_chat.setdefault(part.chat_id, []).append(part)
+
+        messages: Dict[int, "Message"] = {}
+        for chat_id, chat_parts in by_chat.items():
+            for batch in batched(chat_parts, 200):
+                ids = [p.message_id for p in batch]
+                found = await self.client.get_messages(chat_id, ids)  # type: ignore
+                by_id = {m.id: m for m in cast(List["Message"], found) if m}
+                for part in batch:
+                    message = by_id.get(part.message_id)
+                    if message is None or message.empty or not message.document:
+                        raise ValueError(
+                            f"La parte {part.sequence} (mensaje {part.message_id}) ya no está disponible en Telegram."
+                        )
+                    messages[part.sequence] = message
+        return messages
+
+    async def _download_segment(
+        self, message: "Message", part: RemotePart, seg: PartSegment, tmp_target: Path
+    ):
+        stream = cast(
+            AsyncIterator[bytes],
+            self.client.stream_media(
+                message,
+                limit=math.ceil(seg.size / TG_CHUNK_SIZE),
+                offset=seg.start // TG_CHUNK_SIZE,
+            ),
+        )
+
+        if part.frames:
+            path, position = packed_part_path(tmp_target, part), seg.start
+        else:
+            path, position = tmp_target, part.start_offset + seg.start
+
+        written = 0
+        with open(path, "r+b") as out:
+            out.seek(position)
+            async for chunk in stream:
+                chunk = chunk[: seg.size - written]
+                out.write(chunk)
+                written += len(chunk)
+                if self.on_progress and not part.frames:
+                    self.on_progress(len(chunk))
+
+        if written < seg.size:
+            raise IOError(
+                f"Descarga incompleta de la parte {part.sequence}: "
+                f"{written}/{seg.size} bytes del segmento {seg.start}."
+            )
+
+    def _unpack_part(self, part: RemotePart, tmp_target: Path):
+        """Descomprime los frames de una parte en su región del archivo parcial."""
+        packed_path = packed_part_path(tmp_target, part)
+        written = 0
+        with open(packed_path, "rb") as src, open(tmp_target, "r+b") as out:
+            out.seek(part.start_offset)
+            for packed in part.frames or []:
+                data = decompress_frame(src.read(packed))
+                out.write(data)
+                written += len(data)
+                if self.on_progress:
+                    self.on_progress(len(data))
+
+        if written != part.part_size:
+            raise ValueError(
+                f"La parte {part.sequence} se descomprimió en {written} bytes; "
+                f"se esperaban {part.part_size}."
+            )
+        packed_path.unlink()
+
+    def _verify_part(self, part: RemotePart, tmp_target: Path, journal: RestoreJournal):
+        """Compara la región escrita de una parte con su `part_md5sum`."""
+        if not part.part_md5sum:
+            journal.mark_verified(part.sequence)
+            return
+
+        hasher = hashlib.md5()
+        with open(tmp_target, "rb") as f:
+            f.seek(part.start_offset)
+            remaining = part.part_size
+            while remaining > 0:
+                data = f.read(min(remaining, 8 * TG_CHUNK_SIZE))
+                if not data:
+                    break
+                hasher.update(data)
+                remaining -= len(data)
+
+        if hasher.hexdigest() != part.part_md5sum:
+            # Se descarta la parte para que la próxima ejecución la descargue de nuevo.
+            journal.discard_part(part.sequence)
+            raise ValueError(f"La parte {part.sequence} no coincide con su MD5.")
+
+        journal.mark_verified(part.sequence)
+
+    def _get_message(self, chat_id: int, message_id: int, sequence: int) -> "Message":
+        message = cast("Message", self.client.get_messages(chat_id, message_id))
+        if message is None or message.empty or not message.document:
+            raise ValueError(
+                f"La parte {sequence} (mensaje {message_id}) ya no está disponible en Telegram."
+            )
+        return message
+
+    def _download_range(
+        self, message: "Message", vol_range: VolumeRange, out: BinaryIO, hasher
+    ):
+        """
+        Descarga [start, end) de un volumen con peticiones parciales de `upload.GetFile`.
+        Solo se piden los bloques de 1 MiB que se solapan con el rango.
+        """
+        first_chunk = vol_range.start // TG_CHUNK_SIZE
+        last_chunk = (vol_range.end - 1) // TG_CHUNK_SIZE
+        position = first_chunk * TG_CHUNK_SIZE
+
+        logger.debug(
+            f"Descargando bytes {vol_range.start}-{vol_range.end} del volumen "
+            f"{vol_range.vol_idx} (bloques {first_chunk}-{last_chunk})"
+        )
+
+        stream = self.client.stream_media(
+            message, limit=last_chunk - first_chunk + 1, offset=first_chunk
+        )
+        for chunk in cast(Iterable[bytes], stream):
+            chunk_start, chunk_end = position, position + len(chunk)
+            position = chunk_end
+
+            start = max(chunk_start, vol_range.start)
+            end = min(chunk_end, vol_range.end)
+            if start < end:
+                data = chunk[start - chunk_start : end - chunk_start]
+                out.write(data)
+                hasher.update(data)
+                if self.on_progress:
+                    self.on_progress(len(data))
+
+            if position >= vol_range.end:
+                break
+
+        if position < vol_range.end:
+            raise IOError(
+                f"Descarga incompleta del volumen {vol_range.vol_idx}: "
+                f"se esperaban bytes hasta {vol_range.end}, llegaron hasta {position}."
+            )
+
+    def _download_packed_range(
+        self,
+        message: "Message",
+        part: RemotePart,
+        vol_range: VolumeRange,
+        frame_size: int,
+        out: BinaryIO,
+        hasher,
+    ):
+        """
+        Escribe [start, end) sin comprimir de una parte comprimida. Solo se
+        descargan y descomprimen los frames que se solapan con el rango.
+        """
+        spans = list(
+            frame_spans(cast(List[int], part.frames), vol_range.start, vol_range.end, frame_size)
+        )
+        for raw_start, data in self._stream_frames(message, vol_range.vol_idx, spans):
+            raw = decompress_frame(data)
+            lo = max(vol_range.start, raw_start) - raw_start
+            hi = min(vol_range.end, raw_start + len(raw)) - raw_start
+            chunk = raw[lo:hi]
+            out.write(chunk)
+            hasher.update(chunk)
+            if self.on_progress:
+                self.on_progress(len(chunk))
+
+    def _stream_frames(
+        self, message: "Message", vol_idx: int, spans: List[Tuple[int, int, int]]
+    ) -> Iterator[Tuple[int, bytes]]:
+        """Descarga frames contiguos con una sola petición y los entrega completos."""
+        base, end = spans[0][1], spans[-1][2]
+        first_chunk = base // TG_CHUNK_SIZE
+        last_chunk = (end - 1) // TG_CHUNK_SIZE
+        position = first_chunk * TG_CHUNK_SIZE
+
+        logger.debug(
+            f"Descargando {len(spans)} frame(s) del volumen {vol_idx} "
+            f"(bytes comprimidos {base}-{end})"
+        )
+
+        pending = iter(spans)
+        current = next(pending, None)
+        data = bytearray()  # Bytes comprimidos desde `base`
+        stream = self.client.stream_media(
+            message, limit=last_chunk - first_chunk + 1, offset=first_chunk
+        )
+        for chunk in cast(Iterable[bytes], stream):
+            chunk_start, position = position, position + len(chunk)
+            data += chunk[max(0, base - chunk_start) :]
+
+            while current is not None and base + len(data) >= current[2]:
+                raw_start, frame_start, frame_end = current
+                yield raw_start, bytes(data[frame_start - base : frame_end - base])
+                del data[: frame_end - base]
+                base = frame_end
+                current = next(pending, None)
+
+            if current is None:
+                return
+
+        raise IOError(
+            f"Descarga incompleta del volumen {vol_idx}: "
+            f"se esperaban bytes comprimidos hasta {end}, llegaron hasta {position}."
+        )
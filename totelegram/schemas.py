@@ -16,9 +16,6 @@ from typing import (
 
 from pydantic import BaseModel, Field
 
-from totelegram.database import DatabaseSession
-from totelegram.telegram.client import TelegramSession
-
 if TYPE_CHECKING:
     from pyrogram.types import Chat
 
@@ -64,11 +61,33 @@ class Strategy(str, enum.Enum):
         return cls.SINGLE if file_size <= tg_limit else cls.CHUNKED
 
 
+class TapeChunking(str, enum.Enum):
+    FIXED = "fixed"  # Un volumen cada tg_max_size bytes
+    CDC = "cdc"  # Cortes definidos por el contenido, en fronteras de entradas TAR
+
+
+class PayloadCompression(str, enum.Enum):
+    NONE = "none"  # Las piezas se suben tal cual
+    ZSTD = "zstd"  # Cada pieza se sube como frames zstd independientes
+
+
 class JobStatus(str, enum.Enum):
     PENDING = "PENDING"
     UPLOADED = "UPLOADED"
     DELETED = "DELETED"
 
+class QueueStatus(str, enum.Enum):
+    PENDING = "PENDING"
+    RUNNING = "RUNNING"
+    DONE = "DONE"
+    FAILED = "FAILED"
+
+
+class QueueMode(str, enum.Enum):
+    SEND = "send"  # Archivos individuales (como `totelegram send`)
+    BACKUP = "backup"  # Carpetas como cinta (como `totelegram backup`)
+
+
 class AvailabilityState(str, enum.Enum):
     FULFILLED = "fulfilled"
     CAN_FORWARD = "can-forward"
@@ -78,6 +97,7 @@ class AvailabilityState(str, enum.Enum):
 class SourceType(str, enum.Enum):
     FILE = "file"
     FOLDER = "folder"
+    BUNDLE = "bundle"  # Archivos pequeños de `send` agrupados en una cinta
 
 
 class AccessLevel(IntEnum):
@@ -107,6 +127,20 @@ class StrategyConfig(BaseModel):
 
     app_version: str
 
+    # Cómo se cortan las cintas en volúmenes. Los Jobs anteriores son FIXED.
+    tape_chunking: TapeChunking = TapeChunking.FIXED
+    cdc_min_size: int = 0
+    cdc_avg_size: int = 0
+
+    # Cinta incremental: solo sube lo que cambió respecto al Job base.
+    base_job_id: Optional[int] = None
+    delta_size: int = 0
+
+    # Compresión de las piezas. Los offsets de los Payloads siguen siendo del
+    # origen sin comprimir; cada pieza guarda su tamaño y sus frames comprimidos.
+    compression: PayloadCompression = PayloadCompression.NONE
+    compression_level: int = 0
+
 
 class ProfileRegistry(BaseModel):
     """Modelo que representa el archivo config.json global de perfiles"""
@@ -133,9 +167,12 @@ class CLIState:
     @contextmanager
     def scope(self):
         """Unifica el ciclo de vida de la DB y la Sesión."""
+        from totelegram.database import DatabaseSession
+        from totelegram.telegram.client import TelegramSession
+
         profile_name = cast(str, self.manager.resolve_profile_name(self.profile_name))
 
-        with DatabaseSession(self.manager.database_path) as db:
+        with DatabaseSession(self.manager.get_database_target(profile_name)) as db:
             with TelegramSession.from_profile(profile_name, self.manager) as client:
                 yield client, db
 
@@ -279,6 +316,11 @@ class ScanReport(BaseModel):
 
     exclusion_patterns: list[str] = Field(default_factory=list)
 
+    md5sums: dict[Path, str] = Field(
+        default_factory=dict,
+        description="MD5 calculados al comprobar snapshots; se reutilizan para el Source.",
+    )
+
     @property
     def total_skipped(self) -> int:
         return (
@@ -1,6 +1,7 @@
 import hashlib
 import io
 import logging
+import time
 from pathlib import Path
 
 from tartape.stream import TapeVolume
@@ -23,6 +24,8 @@ class FileVolume(TapeVolume):
         self._integrity_broken = False
         self._final_md5 = None
         self._closed = True
+        # Segundos dedicados al MD5 (telemetría).
+        self.hash_seconds = 0.0
 
     @property
     def is_completed(self) -> bool:
@@ -53,6 +56,7 @@ class FileVolume(TapeVolume):
             return b""
 
         if not self._integrity_broken:
+            hash_started = time.perf_counter()
             if current_relative_pos == self._hash_cursor:
                 self._md5_context.update(chunk)
                 self._hash_cursor += len(chunk)
@@ -74,6 +78,7 @@ class FileVolume(TapeVolume):
                     extra_data = chunk[new_data_start:]
                     self._md5_context.update(extra_data)
                     self._hash_cursor += len(extra_data)
+            self.hash_seconds += time.perf_counter() - hash_started
 
         self._position = self._file.tell() - self.start_offset
         return chunk
@@ -82,6 +87,7 @@ class FileVolume(TapeVolume):
         logger.warning(
             f"Se requiere cálculo MD5 manual para {self.name} debido a saltos en el cursor de lectura."
         )
+        hash_started = time.perf_counter()
         hasher = hashlib.md5()
         with open(self.path, "rb") as f:
             f.seek(self.start_offset)
@@ -92,6 +98,7 @@ class FileVolume(TapeVolume):
                     break
                 hasher.update(chunk)
                 remaining -= len(chunk)
+        self.hash_seconds += time.perf_counter() - hash_started
         return hasher.hexdigest()
 
     def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
@@ -25,12 +25,16 @@ class TelegramSession:
         api_id: int,
         api_hash: str,
         profiles_dir: Path | str,
+        max_concurrent_transmissions: int = 1,
+        sleep_threshold: int = 60,
     ):
         self.client: Optional[Client] = None
         self.name = session_name
         self.api_id = api_id
         self.api_hash = api_hash
         self.profiles_dir = Path(profiles_dir)
+        self.max_concurrent_transmissions = max_concurrent_transmissions
+        self.sleep_threshold = sleep_threshold
 
         self.lock_path = self.profiles_dir / f"{self.name}.lock"
         self._lock = FileLock(self.lock_path, timeout=0)
@@ -80,7 +84,8 @@ class TelegramSession:
             in_memory=False,
             no_updates=True,
             workers=1,
-            max_concurrent_transmissions=1,
+            max_concurrent_transmissions=self.max_concurrent_transmissions,
+            sleep_threshold=self.sleep_threshold,
         )
 
         try:
@@ -117,7 +122,10 @@ class TelegramSession:
 
     @classmethod
     def from_profile(
-        cls, profile_name: str, manager: "SettingsManager"
+        cls,
+        profile_name: str,
+        manager: "SettingsManager",
+        max_concurrent_transmissions: int = 1,
     ) -> "TelegramSession":
         """
         Construye una `TelegramSession` a partir de un perfil válido.
@@ -128,6 +136,8 @@ class TelegramSession:
         Args:
             profile_name (str): Nombre del perfil a usar.
             manager (SettingsManager): Manejador de configuraciones.
+            max_concurrent_transmissions (int): Transferencias de medios simultáneas
+                que permite el cliente (cada una usa su propia sesión de medios).
 
         Raises:
             ValueError: Si el perfil no existe o no es trinity
@@ -150,13 +160,15 @@ class TelegramSession:
             api_id=settings.api_id,
             api_hash=settings.api_hash,
             profiles_dir=manager.profiles_dir,
+            max_concurrent_transmissions=max_concurrent_transmissions,
+            sleep_threshold=settings.flood_sleep_threshold,
         )
 
 
 def parse_message_json_data(json_data: dict) -> Message:
     """Utilidad para reconstruir objetos Message desde JSON almacenado en BD."""
     from pyrogram.enums import MessageMediaType
-    from pyrogram.types import Chat, Message
+    from pyrogram.types import Chat, Document, Message
 
     if isinstance(json_data, str):
         json_data = json.loads(json_data)
@@ -188,5 +200,12 @@ def parse_message_json_data(json_data: dict) -> Message:
     data["chat"] = chat
     data["media"] = media_type
 
+    # El reenvío por file_id necesita el documento como objeto, no como dict.
+    document_json = data.get("document")
+    if isinstance(document_json, dict):
+        document_json = document_json.copy()
+        document_json.pop("_", None)
+        data["document"] = Document(**document_json)
+
     data.pop("link", "")
     return Message(**data)
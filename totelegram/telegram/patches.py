@@ -4,6 +4,21 @@ logger = logging.getLogger(__name__)
 _PATCHED = False
 
 
+def _query_name(query) -> str:
+    """
+    Nombre del método de una petición ("messages.SendMedia"), sin envoltorios.
+
+    Los envoltorios (InvokeWithoutUpdates, InvokeWithLayer...) guardan la petición
+    en `query`, pero algunos métodos tienen un `query` de texto
+    (messages.GetInlineBotResults): solo se desenvuelve si es un TLObject.
+    """
+    from pyrogram.raw.core import TLObject
+
+    while isinstance(getattr(query, "query", None), TLObject):
+        query = query.query
+    return ".".join(query.QUALNAME.split(".")[1:])
+
+
 def apply_pyrogram_patches():
     """Aplica parches quirúrgicos a Pyrogram para corregir comportamientos archivados."""
     global _PATCHED
@@ -16,6 +31,7 @@ def apply_pyrogram_patches():
     import io
     import math
     import os
+    import time
     from hashlib import md5
     from pathlib import PurePath
     from typing import BinaryIO, Callable, Optional, Union
@@ -37,6 +53,52 @@ def apply_pyrogram_patches():
     Session.SLEEP_THRESHOLD = 60  # type: ignore Evita que pyrogram lanzara error con FloodWait cuando telegram pedia periodo corto de espera (11 en vez de menos de 10).
     logger.debug("Parche aplicado: Session.SLEEP_THRESHOLD = 60")
 
+    # --- Session.invoke pasa por el RateScheduler ---
+    # pyrogram/session/session.py
+
+    from pyrogram.errors import FloodWait
+
+    from totelegram.telegram.ratelimit import classify, get_scheduler
+    from totelegram.telemetry import get_telemetry
+
+    scheduler = get_scheduler()
+    telemetry = get_telemetry()
+    original_invoke = Session.invoke
+
+    async def invoke_scheduled(
+        self: Session,
+        query,
+        retries: int = Session.MAX_RETRIES,
+        timeout: float = Session.WAIT_TIMEOUT,
+        sleep_threshold: Optional[float] = None,
+    ):
+        if sleep_threshold is None:
+            sleep_threshold = Session.SLEEP_THRESHOLD
+
+        method = classify(_query_name(query))
+        account = self.client.name
+
+        while True:
+            await scheduler.acquire(account, method)
+            try:
+                # Con umbral 0 Pyrogram propaga todo FloodWait y el scheduler aprende de él.
+                result = await original_invoke(self, query, retries, timeout, 0)
+            except FloodWait as e:
+                scheduler.on_flood(account, method, int(e.value))  # type: ignore
+                telemetry.flood(account, method.value, int(e.value))  # type: ignore
+                if int(e.value) > sleep_threshold >= 0:  # type: ignore
+                    raise
+                logger.warning(
+                    f"FloodWait de {e.value}s en {method.value}: reprogramando petición."
+                )
+                continue
+
+            scheduler.on_success(account, method)
+            return result
+
+    Session.invoke = invoke_scheduled  # type: ignore
+    logger.debug("Parche aplicado: Session.invoke (RateScheduler)")
+
     # --- Reemplazar save_file (Captura de excepciones) ---
 
     # pyrogram/methods/advanced/save_file.py
@@ -58,9 +120,15 @@ def apply_pyrogram_patches():
             # Definimos la queue antes del worker, por las dudas.
             queue = asyncio.Queue(1)
 
-            async def worker(session):
-                import asyncio
+            # Primer error de los workers. Con él, el productor aborta la subida y
+            # los workers descartan lo que quede en la cola (no se bloquea el put).
+            worker_errors: list = []
+
+            # FloodWait más largos que el umbral del cliente abortan la pieza para que
+            # el uploader la libere (otro perfil puede tomarla) en vez de bloquearse.
+            flood_threshold = self.sleep_threshold
 
+            async def worker(session):
                 from pyrogram.errors import FloodWait
 
                 while True:
@@ -68,10 +136,24 @@ def apply_pyrogram_patches():
                     if data is None:
                         return
 
+                    rpc, part_index, nbytes, read_s = data
+                    retries = 0
+                    flood_s = 0
+
                     # Bucle de reintento interno para este trozo
-                    while True:
+                    while not worker_errors:
                         try:
-                            await session.invoke(data)
+                            rpc_started = time.perf_counter()
+                            await session.invoke(rpc, sleep_threshold=0)
+                            telemetry.record_part(
+                                self.name,
+                                part_index,
+                                nbytes,
+                                read_s,
+                                time.perf_counter() - rpc_started,
+                                flood_s,
+                                retries,
+                            )
 
                             # Reemplazamos el status de la barra de progreso
                             if progress_args and hasattr(progress_args[0], "status"):
@@ -79,6 +161,8 @@ def apply_pyrogram_patches():
                                     progress_args[0].status = "[blue]Subiendo...[/]"
                             break
                         except FloodWait as e:
+                            retries += 1
+                            flood_s += int(e.value)  # type: ignore
 
                             if progress_args and hasattr(progress_args[0], "status"):
                                 progress_args[0].status = (
@@ -101,13 +185,22 @@ def apply_pyrogram_patches():
                                             *progress_args,
                                         )
 
+                            if int(e.value) > flood_threshold:  # type: ignore
+                                logger.warning(
+                                    f"FloodWait de {e.value}s en worker: se aborta la pieza."
+                                )
+                                worker_errors.append(e)
+                                break
+
+                            # El scheduler ya registró el bloqueo: el siguiente invoke
+                            # espera lo justo antes de reintentar.
                             logger.warning(
                                 f"FloodWait detectado en worker: esperando {e.value} segundos..."
                             )
-                            await asyncio.sleep(int(e.value) + 1)  # type: ignore
                         except Exception as e:
                             logger.error(f"Error crítico en worker de subida: {e}")
-                            raise e
+                            worker_errors.append(e)
+                            break
 
                     queue.task_done()
 
@@ -163,7 +256,9 @@ def apply_pyrogram_patches():
                 fp.seek(part_size * file_part)
 
                 while True:
+                    read_started = time.perf_counter()
                     chunk = fp.read(part_size)
+                    read_s = time.perf_counter() - read_started
 
                     if not chunk:
                         if not is_big and not is_missing_part:
@@ -184,7 +279,10 @@ def apply_pyrogram_patches():
                             file_id=file_id, file_part=file_part, bytes=chunk
                         )
 
-                    await queue.put(rpc)
+                    await queue.put((rpc, file_part, len(chunk), read_s))
+
+                    if worker_errors:
+                        raise worker_errors[0]
 
                     if is_missing_part:
                         return
@@ -206,6 +304,11 @@ def apply_pyrogram_patches():
                             await func()
                         else:
                             await self.loop.run_in_executor(self.executor, func)
+
+                # La última parte puede fallar después del último put.
+                await queue.join()
+                if worker_errors:
+                    raise worker_errors[0]
             except StopTransmission:
                 raise
             except Exception as e:
@@ -0,0 +1,147 @@
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from enum import Enum
+from typing import Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class MethodClass(str, Enum):
+    """Familias de peticiones que Telegram limita por separado."""
+
+    UPLOAD_PART = "upload_part"
+    DOWNLOAD_PART = "download_part"
+    SEND = "send"
+    READ = "read"
+    OTHER = "other"
+
+
+_METHOD_CLASSES = {
+    "upload.SaveFilePart": MethodClass.UPLOAD_PART,
+    "upload.SaveBigFilePart": MethodClass.UPLOAD_PART,
+    "upload.GetFile": MethodClass.DOWNLOAD_PART,
+    "messages.SendMedia": MethodClass.SEND,
+    "messages.SendMessage": MethodClass.SEND,
+    "messages.ForwardMessages": MethodClass.SEND,
+    "messages.GetMessages": MethodClass.READ,
+    "channels.GetMessages": MethodClass.READ,
+    "messages.GetHistory": MethodClass.READ,
+    "messages.Search": MethodClass.READ,
+}
+
+
+def classify(query_name: str) -> MethodClass:
+    """'upload.SaveBigFilePart' -> MethodClass.UPLOAD_PART"""
+    return _METHOD_CLASSES.get(query_name, MethodClass.OTHER)
+
+
+@dataclass
+class RateBucket:
+    """
+    Ritmo aprendido para una cuenta y una familia de métodos.
+
+    `interval` es la separación mínima entre peticiones. Crece al recibir un
+    FloodWait y decae con cada éxito (AIMD), de modo que el ritmo converge justo
+    por debajo del límite que Telegram está aplicando.
+    """
+
+    interval: float = 0.0
+    next_slot: float = 0.0
+    blocked_until: float = 0.0
+    floods: int = 0
+    last_flood: float = 0.0
+
+
+class RateScheduler:
+    """
+    Planificador central de peticiones a Telegram, por cuenta y por familia de métodos.
+
+    Todas las peticiones pasan por `Session.invoke` (ver parches), que reserva un
+    turno con `acquire()` y reporta el resultado con `on_success()`/`on_flood()`.
+    Una familia bloqueada no frena a las demás: un FloodWait en `SendMedia` no
+    retrasa la subida de partes ni las lecturas.
+    """
+
+    # Paso mínimo y techo del intervalo aprendido (segundos).
+    MIN_STEP = 0.05
+    MAX_INTERVAL = 10.0
+    GROWTH = 2.0
+    DECAY = 0.97
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._buckets: Dict[Tuple[str, MethodClass], RateBucket] = {}
+
+    def _bucket(self, account: str, method: MethodClass) -> RateBucket:
+        key = (account, method)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = RateBucket()
+        return bucket
+
+    def reserve(self, account: str, method: MethodClass) -> float:
+        """Reserva el siguiente turno. Devuelve los segundos a esperar antes de usarlo."""
+        with self._lock:
+            bucket = self._bucket(account, method)
+            now = self.clock()
+            start = max(now, bucket.next_slot, bucket.blocked_until)
+            bucket.next_slot = start + bucket.interval
+            return start - now
+
+    async def acquire(self, account: str, method: MethodClass):
+        delay = self.reserve(account, method)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def on_success(self, account: str, method: MethodClass):
+        with self._lock:
+            bucket = self._bucket(account, method)
+            bucket.interval *= self.DECAY
+            if bucket.interval < self.MIN_STEP / 10:
+                bucket.interval = 0.0
+
+    def on_flood(self, account: str, method: MethodClass, seconds: float):
+        with self._lock:
+            bucket = self._bucket(account, method)
+            now = self.clock()
+            bucket.blocked_until = max(bucket.blocked_until, now + seconds)
+            bucket.interval = min(
+                self.MAX_INTERVAL, max(bucket.interval * self.GROWTH, self.MIN_STEP)
+            )
+            bucket.floods += 1
+            bucket.last_flood = now
+            logger.info(
+                f"FloodWait {seconds}s en {account}/{method.value}: "
+                f"nuevo intervalo {bucket.interval:.2f}s"
+            )
+
+    def blocked_for(self, account: str, method: MethodClass) -> float:
+        """Segundos que faltan para que la familia vuelva a estar disponible."""
+        with self._lock:
+            bucket = self._buckets.get((account, method))
+            if bucket is None:
+                return 0.0
+            return max(0.0, bucket.blocked_until - self.clock())
+
+    def snapshot(self) -> Dict[str, dict]:
+        """Estado aprendido, para logs y diagnóstico."""
+        with self._lock:
+            return {
+                f"{account}/{method.value}": {
+                    "interval": round(b.interval, 3),
+                    "blocked_for": round(max(0.0, b.blocked_until - self.clock()), 1),
+                    "floods": b.floods,
+                }
+                for (account, method), b in self._buckets.items()
+            }
+
+
+_scheduler = RateScheduler()
+
+
+def get_scheduler() -> RateScheduler:
+    return _scheduler
@@ -0,0 +1,298 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import IO, Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "totelegram"
+
+Labels = Tuple[Tuple[str, str], ...]
+
+COUNTERS = {
+    "jobs_total": "Jobs terminados, por resultado.",
+    "payloads_total": "Piezas subidas.",
+    "bytes_total": "Bytes subidos.",
+    "forwards_total": "Piezas reenviadas por file_id (sin transmitir bytes).",
+    "parts_total": "Partes de 512 KiB enviadas a Telegram.",
+    "part_retries_total": "Reintentos de partes.",
+    "floodwaits_total": "FloodWait recibidos, por familia de métodos.",
+    "floodwait_seconds_total": "Segundos de FloodWait pedidos, por familia de métodos.",
+}
+
+SUMMARIES = {
+    "part_read_seconds": "Tiempo leyendo cada parte del disco (incluye el límite de velocidad).",
+    "part_rpc_seconds": "Latencia de la petición que entregó cada parte.",
+    "payload_seconds": "Duración total de la subida de cada pieza.",
+    "payload_hash_seconds": "Tiempo calculando el MD5 de cada pieza.",
+}
+
+
+@dataclass
+class PayloadSpan:
+    """Tiempos acumulados de la pieza que una cuenta está subiendo."""
+
+    account: str
+    job_id: int
+    payload_id: int
+    filename: str
+    size: int
+    started: float = field(default_factory=time.monotonic)
+    parts: int = 0
+    bytes: int = 0
+    read_s: float = 0.0
+    rpc_s: float = 0.0
+    flood_s: float = 0.0
+    hash_s: float = 0.0
+    retries: int = 0
+
+
+class Telemetry:
+    """
+    Eventos estructurados y métricas de la subida.
+
+    Cada evento (parte, pieza, reenvío, FloodWait, Job) se escribe como una línea
+    JSON en el log de eventos y actualiza contadores y resúmenes que se exportan
+    en formato de texto de Prometheus (archivo o endpoint HTTP local).
+
+    Las partes se atribuyen a la pieza en curso de su cuenta: cada cuenta sube
+    una sola pieza a la vez (lease `account:<id>`), así el parche de `save_file`
+    no necesita conocer el Job ni el Payload.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._summaries: Dict[str, Tuple[float, int]] = {}
+        self._spans: Dict[str, PayloadSpan] = {}
+        self._log_path: Optional[Path] = None
+        self._log: Optional[IO[str]] = None
+        self.metrics_file: Optional[Path] = None
+        self._server = None
+
+    # --- Configuración ---
+
+    def open_log(self, path: Path):
+        """Destino del log JSONL. El archivo se crea con el primer evento."""
+        self.close()
+        self._log_path = Path(path)
+
+    def close(self):
+        with self._lock:
+            if self._log:
+                self._log.close()
+            self._log = None
+            self._log_path = None
+
+    def export(self, metrics_file: str = "", metrics_port: int = 0):
+        """Activa la exportación Prometheus a un archivo, a un puerto HTTP local, o ambos."""
+        self.metrics_file = Path(metrics_file).expanduser() if metrics_file else None
+        if metrics_port and self._server is None:
+            self.serve(metrics_port)
+
+    # --- Registro ---
+
+    def emit(self, event: str, **fields):
+        record = {"ts": round(time.time(), 3), "event": event, **fields}
+        with self._lock:
+            if self._log is None and self._log_path is not None:
+                self._log_path.parent.mkdir(parents=True, exist_ok=True)
+                self._log = open(self._log_path, "a", encoding="utf-8")
+            if self._log is not None:
+                self._log.write(json.dumps(record, ensure_ascii=False) + "\n")
+                self._log.flush()
+
+    def inc(self, name: str, value: float = 1, **labels: str):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float):
+        with self._lock:
+            total, count = self._summaries.get(name, (0.0, 0))
+            self._summaries[name] = (total + seconds, count + 1)
+
+    def counter(self, name: str, **labels: str) -> float:
+        return self._counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    @contextmanager
+    def payload(
+        self, account: str, job_id: int, payload_id: int, filename: str, size: int
+    ) -> Iterator[PayloadSpan]:
+        """Mide la subida de una pieza. Si falla, el evento lleva el tipo de error."""
+        span = PayloadSpan(account, job_id, payload_id, filename, size)
+        with self._lock:
+            self._spans[account] = span
+        error = None
+        try:
+            yield span
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            with self._lock:
+                self._spans.pop(account, None)
+            seconds = time.monotonic() - span.started
+
+            fields = asdict(span)
+            fields.pop("started")
+            self.emit("payload", **fields, seconds=round(seconds, 4), error=error)
+            if error is None:
+                self.inc("payloads_total")
+                self.inc("bytes_total", span.size)
+                self.observe("payload_seconds", seconds)
+                self.observe("payload_hash_seconds", span.hash_s)
+            self.flush_metrics()
+
+    def record_part(
+        self,
+        account: str,
+        part: int,
+        nbytes: int,
+        read_s: float,
+        rpc_s: float,
+        flood_s: float = 0.0,
+        retries: int = 0,
+    ):
+        """Una parte entregada a Telegram: lectura, latencia, FloodWait y reintentos."""
+        with self._lock:
+            span = self._spans.get(account)
+            if span is not None:
+                span.parts += 1
+                span.bytes += nbytes
+                span.read_s += read_s
+                span.rpc_s += rpc_s
+                span.flood_s += flood_s
+                span.retries += retries
+
+        self.emit(
+            "part",
+            account=account,
+            payload_id=span.payload_id if span else None,
+            part=part,
+            bytes=nbytes,
+            read_s=round(read_s, 4),
+            rpc_s=round(rpc_s, 4),
+            flood_s=flood_s,
+            retries=retries,
+        )
+        self.inc("parts_total")
+        if retries:
+            self.inc("part_retries_total", retries)
+        self.observe("part_read_seconds", read_s)
+        self.observe("part_rpc_seconds", rpc_s)
+
+    def record_hash(self, account: str, seconds: float):
+        with self._lock:
+            span = self._spans.get(account)
+            if span is not None:
+                span.hash_s += seconds
+
+    def flood(self, account: str, method: str, seconds: float):
+        self.emit("flood_wait", account=account, method=method, seconds=seconds)
+        self.inc("floodwaits_total", method=method)
+        self.inc("floodwait_seconds_total", seconds, method=method)
+
+    def forward(self, account: str, job_id: int, payload_id: int, size: int):
+        self.emit(
+            "forward", account=account, job_id=job_id, payload_id=payload_id, size=size
+        )
+        self.inc("forwards_total")
+        self.flush_metrics()
+
+    def job(self, job_id: int, outcome: str, seconds: float):
+        self.emit("job", job_id=job_id, outcome=outcome, seconds=round(seconds, 3))
+        self.inc("jobs_total", outcome=outcome)
+        self.flush_metrics()
+
+    # --- Exportación ---
+
+    def render_prometheus(self) -> str:
+        """Métricas en formato de texto de Prometheus (exposition format 0.0.4)."""
+        with self._lock:
+            counters = dict(self._counters)
+            summaries = dict(self._summaries)
+
+        lines = []
+        for name, help_text in COUNTERS.items():
+            metric = f"{PREFIX}_{name}"
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} counter")
+            samples = [(labels, v) for (n, labels), v in counters.items() if n == name]
+            for labels, value in sorted(samples) or [((), 0)]:
+                label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+                suffix = f"{{{label_text}}}" if label_text else ""
+                lines.append(f"{metric}{suffix} {value:g}")
+
+        for name, help_text in SUMMARIES.items():
+            metric = f"{PREFIX}_{name}"
+            total, count = summaries.get(name, (0.0, 0))
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} summary")
+            lines.append(f"{metric}_sum {total:.6f}")
+            lines.append(f"{metric}_count {count}")
+        return "\n".join(lines) + "\n"
+
+    def flush_metrics(self):
+        """Reescribe el archivo de métricas (atómico: el colector nunca lee uno a medias)."""
+        if self.metrics_file is None:
+            return
+        try:
+            self.metrics_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.metrics_file.with_name(f"{self.metrics_file.name}.tmp")
+            tmp_path.write_text(self.render_prometheus(), encoding="utf-8")
+            os.replace(tmp_path, self.metrics_file)
+        except OSError as e:
+            logger.warning(f"No se pudo escribir el archivo de métricas: {e}")
+
+    def serve(self, port: int, host: str = "127.0.0.1"):
+        """Expone `/metrics` en un hilo de fondo."""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        telemetry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") not in ("", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = telemetry.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(f"metrics: {format % args}")
+
+        try:
+            self._server = ThreadingHTTPServer((host, port), MetricsHandler)
+        except OSError as e:
+            logger.warning(f"No se pudo abrir el endpoint de métricas en {host}:{port}: {e}")
+            return None
+
+        thread = threading.Thread(
+            target=self._server.serve_forever, name="metrics-http", daemon=True
+        )
+        thread.start()
+        logger.info(f"Métricas disponibles en http://{host}:{self._server.server_port}/metrics")
+        return self._server
+
+    def shutdown(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+_telemetry = Telemetry()
+
+
+def get_telemetry() -> Telemetry:
+    return _telemetry
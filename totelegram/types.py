@@ -1,5 +1,5 @@
 from dataclasses import dataclass, field
-from typing import TYPE_CHECKING, List
+from typing import TYPE_CHECKING, List, Optional, Union
 
 import peewee
 
@@ -9,6 +9,7 @@ if TYPE_CHECKING:
     from pyrogram.client import Client
     from pyrogram.types import Chat
 
+    from totelegram.database import SyncWriter, WriteBehindWriter
     from totelegram.discovery import DiscoveryService
     from totelegram.identity import Settings
     from totelegram.models import (
@@ -23,11 +24,12 @@ class UploadContext:
     tg_chat: "Chat"
     owner: "TelegramUser"
     client: "Client"
-    db: peewee.SqliteDatabase
+    db: peewee.Database
     discovery: "DiscoveryService"
     settings: "Settings"
     state: "CLIState"
     lease_manager: "LeaseManager"
+    writer: Optional[Union["SyncWriter", "WriteBehindWriter"]] = None
 
 
 @dataclass
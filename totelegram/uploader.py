@@ -1,9 +1,13 @@
+import functools
+import hashlib
 import logging
-import random
+import math
 import shutil
+import threading
 import time
+from datetime import datetime, timedelta
 from pathlib import Path
-from typing import TYPE_CHECKING, BinaryIO, Optional, Tuple, cast
+from typing import TYPE_CHECKING, BinaryIO, Optional, Sequence, Tuple, cast
 
 import peewee
 import tartape
@@ -18,20 +22,32 @@ from rich.progress import (
     TransferSpeedColumn,
 )
 
+from totelegram.bundling import open_bundle_volume
 from totelegram.cli.ui import UI, console
+from totelegram.compression import CompressedVolume
 from totelegram.concurrency import LeaseKeeper
-from totelegram.database import db_transaction
+from totelegram.database import SyncWriter, db_transaction
+from totelegram.fanout import HelperPool
+from totelegram.incremental import open_delta_volume
 from totelegram.models import Job, Payload, RemotePayload, ResourceType
-from totelegram.packaging import Chunker, SnapshotService
+from totelegram.pacing import build_policy
+from totelegram.packaging import (
+    Chunker,
+    SnapshotCodec,
+    SnapshotService,
+    VolumePlanner,
+)
 from totelegram.schemas import (
     AvailabilityState,
     JobStatus,
+    PayloadCompression,
     ProgressState,
     SourceType,
 )
 from totelegram.stream import FileVolume
+from totelegram.telemetry import get_telemetry
 from totelegram.types import AvailabilityReport, UploadContext
-from totelegram.utils import ThrottledFile
+from totelegram.utils import TAPE_CATALOG_LOCK, ThrottledFile
 
 if TYPE_CHECKING:
     from pyrogram.types import Message
@@ -39,12 +55,18 @@ if TYPE_CHECKING:
 
 logger = logging.getLogger(__name__)
 
+# Tamaño de lectura al calcular el MD5 de una pieza para el dedup.
+HASH_READ_SIZE = 1024 * 1024
+# Bytes del inicio de cada pieza que se comparan antes de leerla entera.
+HEAD_HASH_SIZE = 1024 * 1024
+
 
 class UploadService:
     # TODO: Luego de consolidar la logica. Hay que sacar los UI de aqui.
     def __init__(
         self,
         u_ctx: UploadContext,
+        helper_profiles: Sequence[str] = (),
     ):
         self.client = u_ctx.client
         self.limit_rate_kbps = u_ctx.settings.upload_limit_rate_kbps
@@ -62,6 +84,18 @@ class UploadService:
         self.lease_manager = u_ctx.lease_manager
         self.account_id = u_ctx.settings.telegram_account_id
 
+        # Perfiles de otras cuentas que suben piezas del mismo Job en paralelo.
+        self.helper_profiles = list(helper_profiles)
+
+        self.pacer = build_policy(self.settings)
+        self._seed_pacer()
+
+        self.telemetry = get_telemetry()
+        self.writer = u_ctx.writer or SyncWriter(self.db)
+
+        # Lo activa el heartbeat si perdemos el lease de la cuenta o del Job.
+        self._lease_lost = threading.Event()
+
     def _ensure_account_lease(self):
         """Bloquea la cuenta de Telegram a nivel de base de datos."""
         if not self.account_id:
@@ -82,6 +116,11 @@ class UploadService:
             self.lease_manager.release(resource_id)
             logger.info(f"Lock de cuenta {resource_id} liberado explícitamente.")
 
+    def _on_lease_lost(self, resource_id: str):
+        """Otro nodo tomó la cuenta o el Job: no se reclaman más piezas."""
+        logger.error(f"Lease {resource_id} perdido: se detiene la subida tras la pieza en curso.")
+        self._lease_lost.set()
+
     def process_job(self, job: Job, path: Path, is_last_job: bool = False):
         """
         Orquesta el ciclo de vida de un Job: Investigación, Ejecución y Cierre.
@@ -97,11 +136,13 @@ class UploadService:
         account_resource_id = f"account:{self.account_id}"
 
         logger.info(f"Iniciando procesamiento de Job {job.id} para: {path.name}")
+        started = time.monotonic()
         report = self.u_ctx.discovery.investigate(job)
 
+        self._lease_lost.clear()
         try:
-            with LeaseKeeper(self.lease_manager, account_resource_id), \
-                 LeaseKeeper(self.lease_manager, job_resource_id):
+            with LeaseKeeper(self.lease_manager, account_resource_id, on_lost=self._on_lease_lost), \
+                 LeaseKeeper(self.lease_manager, job_resource_id, on_lost=self._on_lease_lost):
 
                 if report.state == AvailabilityState.FULFILLED:
                     UI.info(f"[dim]{path.name}[/] ya está disponible en el destino.")
@@ -109,7 +150,7 @@ class UploadService:
                         job.set_uploaded()
 
                 elif report.state == AvailabilityState.NEEDS_UPLOAD:
-                    self.execute_physical_upload(job, path, is_last_job)
+                    self.execute_physical_upload(job, path)
 
                 elif report.state == AvailabilityState.CAN_FORWARD:
                     UI.info("Iniciando [bold]Smart Forward[/]...")
@@ -121,10 +162,19 @@ class UploadService:
         job = Job.get_by_id(job.id)
         logger.info(f"Evaluando cierre del Job {job.id}. Estado actual en DB: {job.status}")
 
+        outcome = {
+            AvailabilityState.FULFILLED: "fulfilled",
+            AvailabilityState.CAN_FORWARD: "forwarded",
+        }.get(report.state, "uploaded")
+        if job.status != JobStatus.UPLOADED:
+            outcome = "incomplete"
+        self.telemetry.job(job.id, outcome, time.monotonic() - started)
+
         if job.status == JobStatus.UPLOADED:
             try:
                 logger.info(f"Generando Snapshot para el Job {job.id}...")
-                SnapshotService.generate_snapshot(job)
+                codec = SnapshotCodec(self.settings.snapshot_codec)
+                SnapshotService.generate_snapshot(job, codec)
                 logger.info("Snapshot generado y guardado con éxito.")
                 return True
             except Exception as e:
@@ -173,7 +223,9 @@ class UploadService:
 
             for payload in pending_payloads:
                 lock_path = lock_dir / f"payload_{payload.id}.lock"
-                lock = FileLock(lock_path, timeout=0)
+                # Sin thread_local: con escritura diferida, el hilo escritor suelta
+                # el candado cuando el registro de la pieza queda confirmado.
+                lock = FileLock(lock_path, timeout=0, thread_local=False)
 
                 try:
                     lock.acquire()
@@ -186,58 +238,74 @@ class UploadService:
                     continue
 
             return None
-    def _smart_pause(self):
-        """Calcula y ejecuta una pausa aleatoria basada en la configuración."""
-        r = self.settings.upload_pause_range
-
-        minutes = random.randint(min(r), max(r))
 
-        if minutes > 0:
-            UI.sleep_progress(minutes * 60)
+    def _start_planning(self, job: Job) -> Optional[VolumePlanner]:
+        """
+        Segmenta el Job. Las cintas se planifican en segundo plano para que la
+        subida del primer volumen no espere al catálogo completo.
+        """
+        if Chunker.is_planned(job):
+            return None
 
-    def execute_physical_upload(self, job: Job, path: Path, is_last_job: bool):
-            logger.info(
-                f"Iniciando subida física de {path.name}. Estrategia: {job.strategy}"
-            )
+        # Una DB en memoria no se comparte entre conexiones de distintos hilos.
+        in_memory = str(self.db.database) == ":memory:"
+        if job.source.type != SourceType.FOLDER or in_memory:
             with db_transaction(self.db):
                 Chunker.get_or_create(job)
+            return None
 
-            md5sum = job.source.md5sum
-            while True:
-                claim_result = self._claim_next_payload(job)
-
-                if claim_result is None:
-                    break # No hay más piezas disponibles (subidas o procesándose)
-
-                payload, lock = claim_result
-
-                # MAGIA: El lock se mantendrá solo dentro de este bloque 'with'
-                with lock:
-                    UI.info(f"Subiendo la pieza [bold]{payload.filename}[/]")
+        planner = VolumePlanner(job, self.db)
+        planner.start()
+        return planner
 
-                    try:
-                        message, part_md5 = self._upload_payload(
-                            job.source.type, md5sum, path, payload
-                        )
+    def _seed_pacer(self):
+        """Carga en la política lo que esta cuenta ya subió dentro de su ventana."""
+        if not self.pacer.lookback or self.owner is None:
+            return
+        since = datetime.now() - timedelta(seconds=self.pacer.lookback)
+        self.pacer.seed(
+            (sent_at.timestamp(), size)
+            for sent_at, size in RemotePayload.sent_since(self.owner, since)
+        )
 
-                        with db_transaction(self.db):
-                            # Actualizamos el md5sum en vez de usar set_uploaded()
-                            payload.md5sum = part_md5
-                            payload.save(only=[Payload.md5sum, Payload.updated_at])
+    def _pace(self):
+        """Espera solo si la política lo exige (pausa, presupuesto u horario)."""
+        decision = self.pacer.next_delay()
+        if decision.delay <= 0:
+            return
+        logger.info(f"Pausa de {decision.delay:.0f}s: {decision.reason}")
+        UI.info(f"Ritmo de subida: {decision.reason}.")
+        UI.sleep_progress(math.ceil(decision.delay))
 
-                            RemotePayload.register_upload(payload, message, self.owner)
+    def execute_physical_upload(self, job: Job, path: Path):
+            logger.info(
+                f"Iniciando subida física de {path.name}. Estrategia: {job.strategy}"
+            )
+            planner = self._start_planning(job)
+            helpers = self._start_helpers(job)
 
-                        UI.success("Pieza subida exitosamente.")
+            try:
+                self._drain_payloads(job, path, planner)
+            except BaseException:
+                if planner:
+                    planner.stop()
+                    planner.join()
+                if helpers:
+                    helpers.terminate()
+                raise
 
-                        has_more_payloads = Payload.total_pending_for_job(job) > 0
-                        if has_more_payloads and not is_last_job:
-                            self._smart_pause()
+            # Fuera del bucle (terminó la subida o la cola):
+            if planner:
+                planner.join()
+                if planner.error:
+                    raise planner.error
 
-                    except Exception as e:
-                        # El bloque 'with lock' finaliza y el SO libera el archivo automáticamente.
-                        raise e
+            if helpers:
+                UI.info("Esperando a los perfiles ayudantes...")
+                helpers.wait()
+                # Lo que un ayudante no llegó a subir (falló o se cerró) lo termina este perfil.
+                self._drain_payloads(job, path)
 
-            # Fuera del bucle (terminó la subida o la cola):
             with db_transaction(self.db):
                 pending = Payload.total_pending_for_job(job)
                 logger.info(f"Evaluando piezas pending para el Job {job.id}: quedan {pending}")
@@ -253,6 +321,158 @@ class UploadService:
                         shutil.rmtree(lock_dir, ignore_errors=True)
                 else:
                     logger.info(f"Worker terminó su cola, pero faltan {pending} piezas que otro worker está subiendo.")
+
+    def assist_job(self, job: Job, plan_timeout: float = 60.0) -> int:
+        """
+        Sube piezas pendientes de un Job que procesa otro perfil (fan-out).
+
+        No toma el lease del Job ni lo cierra: el perfil principal genera el
+        snapshot. Si la cinta aún se está planificando, espera nuevos volúmenes
+        hasta `plan_timeout` segundos sin progreso. Devuelve las piezas subidas.
+        """
+        tg_limit = (
+            self.settings.tg_max_size_premium
+            if self.owner.is_premium
+            else self.settings.tg_max_size_normal
+        )
+        if job.config.tg_max_size > tg_limit:
+            UI.error(
+                f"Las piezas del Job {job.id} superan el límite de esta cuenta ({tg_limit} bytes)."
+            )
+            raise typer.Exit(1)
+
+        self._ensure_account_lease()
+        account_resource_id = f"account:{self.account_id}"
+        self._lease_lost.clear()
+        try:
+            with LeaseKeeper(self.lease_manager, account_resource_id, on_lost=self._on_lease_lost):
+                return self._drain_payloads(job, job.path, plan_timeout=plan_timeout)
+        finally:
+            self._release_account_lease()
+
+    def _start_helpers(self, job: Job) -> Optional[HelperPool]:
+        if not self.helper_profiles:
+            return None
+
+        helpers = HelperPool(
+            self.helper_profiles,
+            self.u_ctx.state.is_debug,
+            log_dir=self.manager.worktable / "logs",
+        )
+        helpers.start(job.id)
+        UI.info(
+            f"Repartiendo piezas con {len(self.helper_profiles)} perfil(es) ayudante(s): "
+            f"[bold]{', '.join(self.helper_profiles)}[/]"
+        )
+        return helpers
+
+    def _drain_payloads(
+        self,
+        job: Job,
+        path: Path,
+        planner: Optional[VolumePlanner] = None,
+        plan_timeout: float = 0.0,
+    ) -> int:
+        """Reclama y sube piezas hasta que no quede ninguna libre. Devuelve las subidas."""
+        from pyrogram.errors import FloodWait
+
+        md5sum = job.source.md5sum
+        uploaded = 0
+        idle_since = time.monotonic()
+        self.pacer.start_batch()
+        while True:
+            if self._lease_lost.is_set():
+                UI.warn("Otro nodo tomó el trabajo; se detiene la subida.")
+                break
+
+            if Payload.total_pending_for_job(job) > 0:
+                self._pace()
+
+            claim_result = self._claim_next_payload(job)
+
+            if claim_result is None:
+                # La cinta aún se está planificando: esperamos al siguiente volumen.
+                if planner is not None:
+                    if not planner.wait_for_progress():
+                        # Terminó de planificar: los últimos volúmenes pudieron
+                        # confirmarse después de la consulta, se reclama una vez más.
+                        planner = None
+                    continue
+                if plan_timeout and time.monotonic() - idle_since < plan_timeout:
+                    if not Chunker.is_planned(job):
+                        time.sleep(1)
+                        continue
+                break # No hay más piezas disponibles (subidas o procesándose)
+
+            payload, lock = claim_result
+            flood_wait = 0
+            handed_off = False
+
+            try:
+                duplicate = self._forward_duplicate(job, path, payload)
+                if duplicate is not None:
+                    message, part_md5 = duplicate
+                    self.telemetry.forward(self.client.name, job.id, payload.id, payload.size)
+                else:
+                    UI.info(f"Subiendo la pieza [bold]{payload.filename}[/]")
+
+                    with self.telemetry.payload(
+                        self.client.name, job.id, payload.id, payload.filename, payload.size
+                    ):
+                        message, part_md5 = self._upload_payload(
+                            job, md5sum, path, payload
+                        )
+
+                # La pieza sigue bloqueada hasta que su registro se confirme: ningún
+                # worker puede volver a reclamarla mientras la escritura espera en cola.
+                self.writer.submit(
+                    functools.partial(self._register_payload, payload, part_md5, message)
+                ).add_done_callback(lambda _, lock=lock: lock.release())
+                handed_off = True
+
+                if duplicate is not None:
+                    UI.success(f"Pieza [bold]{payload.filename}[/] reenviada: ya estaba en Telegram.")
+                else:
+                    UI.success("Pieza subida exitosamente.")
+                    self.pacer.record(payload.upload_size)
+                uploaded += 1
+                idle_since = time.monotonic()
+
+            except FloodWait as e:
+                # Espera larga: soltamos la pieza para que otro perfil la tome
+                # mientras esta cuenta está bloqueada.
+                flood_wait = int(e.value)  # type: ignore
+                UI.warn(
+                    f"Telegram limitó la cuenta ({flood_wait}s). "
+                    f"La pieza [bold]{payload.filename}[/] queda libre para otros perfiles."
+                )
+            finally:
+                if not handed_off:
+                    lock.release()
+
+            if flood_wait:
+                UI.sleep_progress(flood_wait)
+                idle_since = time.monotonic()
+
+        # Quien llama cuenta las piezas pendientes: necesita ver lo escrito.
+        self.writer.flush()
+        return uploaded
+
+    def _register_payload(self, payload: Payload, part_md5: str, message: "Message"):
+        # Actualizamos el md5sum en vez de usar set_uploaded()
+        payload.md5sum = part_md5
+        payload.save(
+            only=[
+                Payload.md5sum,
+                Payload.packed_size,
+                Payload.packed_frames,
+                Payload.head_md5,
+                Payload.updated_at,
+            ]
+        )
+
+        RemotePayload.register_upload(payload, message, self.owner)
+
     def execute_smart_forward(self, job: Job, report: AvailabilityReport):
         mirrros = {r.payload.sequence_index: r for r in report.remotes}
         UI.info(f"Reenviando {len(mirrros)} partes...")
@@ -270,11 +490,25 @@ class UploadService:
             message = self._smart_forward_strategy(
                 md5sum, payload_adopted, remote_mirror
             )
-            with db_transaction(self.db):
-                RemotePayload.register_upload(payload_adopted, message, self.owner)
-
-            time.sleep(1)
+            # El documento reenviado es el del espejo: comprimido si aquel lo estaba.
+            mirror_payload = remote_mirror.payload
+            payload_adopted.md5sum = mirror_payload.md5sum
+            payload_adopted.packed_size = mirror_payload.packed_size
+            payload_adopted.packed_frames = mirror_payload.packed_frames
+            payload_adopted.head_md5 = mirror_payload.head_md5
+            self.writer.submit(
+                functools.partial(
+                    self._register_payload,
+                    payload_adopted,
+                    cast(str, mirror_payload.md5sum),
+                    message,
+                )
+            )
+            self.telemetry.forward(
+                self.client.name, job.id, payload_adopted.id, payload_adopted.size
+            )
 
+        self.writer.flush()
         with db_transaction(self.db):
             job_adopted.set_uploaded()
 
@@ -284,9 +518,103 @@ class UploadService:
 
         return payload.filename_short, payload.filename
 
-    def _upload_payload(
-        self, source_type: SourceType, md5sum: str, path: Path, payload: Payload
-    ):
+    def _open_volume(self, job: Job, path: Path, payload: Payload):
+        """Stream de los bytes de la pieza (rango del archivo o volumen de la cinta)."""
+        if job.config.base_job_id is not None:
+            return open_delta_volume(job, payload)
+        if job.source.type == SourceType.BUNDLE:
+            return open_bundle_volume(job, payload)
+        if job.source.type == SourceType.FOLDER:
+            # El planificador puede estar leyendo el catálogo en otro hilo.
+            with TAPE_CATALOG_LOCK:
+                tape = tartape.Tape(path)
+                return tape.get_volume(
+                    payload.filename,
+                    payload.sequence_index,
+                    payload.start_offset,
+                    payload.end_offset,
+                )
+        return FileVolume(path, payload.start_offset, payload.end_offset, payload.filename)
+
+    def _spool_dir(self) -> Path:
+        """Carpeta de las piezas comprimidas antes de subirlas."""
+        if self.settings.compression_spool_dir:
+            return Path(self.settings.compression_spool_dir).expanduser()
+        return self.manager.worktable / "spool"
+
+    def _hash_payload(self, job: Job, path: Path, payload: Payload) -> str:
+        """MD5 de la pieza sin subirla (lectura local)."""
+        started = time.monotonic()
+        with self._open_volume(job, path, payload) as volume:
+            while volume.read(HASH_READ_SIZE):
+                pass
+            md5sum = volume.md5sum
+        logger.debug(
+            f"MD5 de {payload.filename} calculado en {time.monotonic() - started:.2f}s"
+        )
+        return md5sum
+
+    def _hash_payload_head(self, job: Job, path: Path, payload: Payload) -> str:
+        """MD5 de los primeros `HEAD_HASH_SIZE` bytes de la pieza."""
+        hasher = hashlib.md5()
+        remaining = HEAD_HASH_SIZE
+        with self._open_volume(job, path, payload) as volume:
+            while remaining > 0:
+                chunk = volume.read(remaining)
+                if not chunk:
+                    break
+                hasher.update(chunk)
+                remaining -= len(chunk)
+        return hasher.hexdigest()
+
+    def _forward_duplicate(
+        self, job: Job, path: Path, payload: Payload
+    ) -> Optional[Tuple["Message", str]]:
+        """
+        Dedup por contenido: si una pieza con el mismo tamaño y MD5 ya está en
+        Telegram (de cualquier Job), la reenvía por file_id en vez de subirla.
+
+        Primero se compara el MD5 del primer MiB (que queda guardado en la pieza
+        para futuras búsquedas); el MD5 completo solo se calcula si alguna pieza
+        subida tiene el mismo tamaño y el mismo inicio.
+        Devuelve (mensaje, md5) o None si hay que subirla.
+        """
+        from pyrogram.errors import FloodWait
+
+        if not self.settings.dedup_payloads:
+            return None
+        if job.config.compression != PayloadCompression.NONE:
+            # La pieza se sube comprimida: un espejo sin comprimir no la sustituye.
+            return None
+
+        discovery = self.u_ctx.discovery
+        payload.head_md5 = payload.head_md5 or self._hash_payload_head(job, path, payload)
+        if not discovery.has_content_candidates(payload, payload.head_md5):
+            return None
+
+        md5sum = payload.md5sum or self._hash_payload(job, path, payload)
+        mirror = discovery.find_payload_mirror(payload, md5sum, self.owner)
+        if mirror is None:
+            return None
+
+        try:
+            message = self._smart_forward_strategy(job.source.md5sum, payload, mirror)
+        except FloodWait:
+            raise
+        except Exception as e:
+            logger.warning(
+                f"No se pudo reenviar {payload.filename} desde el mensaje "
+                f"{mirror.message_id}: {e}. Se sube normalmente."
+            )
+            return None
+
+        logger.info(
+            f"Pieza {payload.filename} reenviada desde el mensaje {mirror.message_id} "
+            f"(chat {mirror.chat_id}): mismo contenido."
+        )
+        return message, md5sum
+
+    def _upload_payload(self, job: Job, md5sum: str, path: Path, payload: Payload):
 
         state_control = ProgressState()
         progress = Progress(
@@ -306,17 +634,10 @@ class UploadService:
             progress.update(task_id, completed=current, status=state.status)
 
         logger.debug(f"Preparando stream de datos para pieza {payload.sequence_index}")
-        if source_type == SourceType.FOLDER:
-            tape = tartape.Tape(path)
-            volumen = tape.get_volume(
-                payload.filename,
-                payload.sequence_index,
-                payload.start_offset,
-                payload.end_offset,
-            )
-        else:
-            volumen = FileVolume(
-                path, payload.start_offset, payload.end_offset, payload.filename
+        volumen = self._open_volume(job, path, payload)
+        if job.config.compression == PayloadCompression.ZSTD:
+            volumen = CompressedVolume(
+                volumen, job.config.compression_level, spool_dir=self._spool_dir()
             )
 
         limit_bytes = self.u_ctx.settings.upload_limit_rate_kbps * 1024
@@ -330,8 +651,12 @@ class UploadService:
             )
 
             with volumen:
+                if isinstance(volumen, CompressedVolume):
+                    payload.packed_size = volumen.size
+                    payload.packed_frames = volumen.frames
+                    progress.update(task_id, total=volumen.size)
                 logger.info(
-                    f"Transmitiendo pieza {payload.filename} a Telegram (Tamaño: {payload.size} bytes)"
+                    f"Transmitiendo pieza {payload.filename} a Telegram (Tamaño: {payload.upload_size} bytes)"
                 )
 
                 with ThrottledFile(volumen, limit_bytes) as doc_stream:
@@ -349,7 +674,11 @@ class UploadService:
                             progress_args=(state_control,),
                         ),
                     )
-                    return tg_message, volumen.md5sum
+                    part_md5 = volumen.md5sum
+                    self.telemetry.record_hash(
+                        self.client.name, getattr(volumen, "hash_seconds", 0.0)
+                    )
+                    return tg_message, part_md5
 
     def _smart_forward_strategy(
         self,
@@ -6,9 +6,10 @@ import logging
 import os
 import re
 import sys
+import threading
 import time
 import uuid
-from contextlib import nullcontext
+from contextlib import contextmanager, nullcontext
 from pathlib import Path
 from time import sleep
 from typing import (
@@ -16,6 +17,7 @@ from typing import (
     Any,
     Iterable,
     List,
+    Optional,
     Union,
     cast,
     get_origin,
@@ -162,23 +164,160 @@ def is_excluded(path: Path, patterns: List[str]) -> bool:
     return False
 
 
+# Extensiones de snapshot según el códec (ver `SnapshotService`).
+SNAPSHOT_SUFFIXES = (".json.xz", ".json.zst")
+# Índice de snapshots por carpeta: metadatos sin comprimir de cada snapshot.
+SNAPSHOT_INDEX_NAME = ".totelegram-snapshots.json"
+
+
+def is_snapshot_file(path: Path) -> bool:
+    return path.name.endswith(SNAPSHOT_SUFFIXES) or path.name == SNAPSHOT_INDEX_NAME
+
+
+class SnapshotIndex:
+    """
+    Índice de los snapshots de una carpeta (sidecar JSON sin comprimir).
+
+    Guarda por nombre de snapshot el MD5 del origen, la versión del manifiesto y
+    el códec, para resolver colisiones sin descomprimir snapshots. Es una caché:
+    cada entrada recuerda el tamaño y el mtime del snapshot que describe, y si
+    falta o el snapshot en disco ya no coincide (reemplazado a mano, copiado de
+    otra máquina), quien la necesite lee el snapshot y la rellena.
+    """
+
+    def __init__(self, directory: Path, entries: Optional[dict] = None):
+        self.directory = directory
+        self.path = directory / SNAPSHOT_INDEX_NAME
+        self.entries: dict = entries or {}
+
+    @classmethod
+    def load(cls, directory: Path) -> "SnapshotIndex":
+        path = directory / SNAPSHOT_INDEX_NAME
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+            return cls(directory, data.get("snapshots", {}))
+        except FileNotFoundError:
+            return cls(directory)
+        except (OSError, ValueError, AttributeError):
+            logger.warning(f"Índice de snapshots ilegible, se reconstruirá: {path}")
+            return cls(directory)
+
+    def _file_stamp(self, snapshot_name: str) -> Optional[list]:
+        try:
+            stat = (self.directory / snapshot_name).stat()
+        except OSError:
+            return None
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def get(self, snapshot_name: str) -> Optional[dict]:
+        """Entrada del snapshot, o None si falta o no describe el archivo en disco."""
+        entry = self.entries.get(snapshot_name)
+        if entry is None:
+            return None
+        file_stamp = self._file_stamp(snapshot_name)
+        if file_stamp is None or entry.get("file") != file_stamp:
+            return None
+        return entry
+
+    def put(
+        self,
+        snapshot_name: str,
+        md5sum: str,
+        manifest_version: str,
+        codec: str,
+        members: Optional[dict] = None,
+        stamp: Optional[list] = None,
+    ):
+        """
+        `members`: en un paquete, nombre -> [tamaño, mtime, md5] de sus archivos.
+        `stamp`: en un archivo, [tamaño, mtime] del contenido que se subió.
+        """
+        entry = {
+            "md5sum": md5sum,
+            "manifest_version": manifest_version,
+            "codec": codec,
+            "file": self._file_stamp(snapshot_name),
+        }
+        if members is not None:
+            entry["members"] = members
+        if stamp is not None:
+            entry["stamp"] = stamp
+        self.entries[snapshot_name] = entry
+
+    def bundled_members(self) -> dict:
+        """Archivos de la carpeta enviados dentro de un paquete: nombre -> [tamaño, mtime, md5]."""
+        bundled = {}
+        for snapshot_name in self.entries:
+            entry = self.get(snapshot_name)
+            if entry is not None:
+                bundled.update(entry.get("members") or {})
+        return bundled
+
+    def remove(self, snapshot_name: str) -> bool:
+        return self.entries.pop(snapshot_name, None) is not None
+
+    def save(self):
+        """Escritura atómica: nunca deja un índice a medias."""
+        data = {"version": 1, "snapshots": self.entries}
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(data, indent=1), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+
+
+def _snapshot_candidates(file_path: Path) -> List[Path]:
+    # Ambas convenciones de nombre (archivo.ext.json.xz y archivo.json.xz) por cada códec
+    return [
+        file_path.with_name(f"{name}{suffix}")
+        for suffix in SNAPSHOT_SUFFIXES
+        for name in (file_path.name, file_path.stem)
+    ]
+
+
 def has_snapshot(file_path: Path) -> bool:
-    filename_plus_ext = file_path.with_name(f"{file_path.name}.json.xz")
-    stem_plus_ext = file_path.with_name(f"{file_path.stem}.json.xz")
-    return filename_plus_ext.exists() or stem_plus_ext.exists()
+    return any(target.exists() for target in _snapshot_candidates(file_path))
+
+
+def existing_snapshots(file_path: Path) -> List[Path]:
+    """Snapshots de una ruta en disco, incluidos los numerados por colisión (ADR-003)."""
+    found = [target for target in _snapshot_candidates(file_path) if target.exists()]
+    for suffix in SNAPSHOT_SUFFIXES:
+        counter = 1
+        while True:
+            target = file_path.with_name(
+                f"{file_path.stem} ({counter}){file_path.suffix}{suffix}"
+            )
+            if not target.exists():
+                break
+            found.append(target)
+            counter += 1
+    return found
 
 
 def delete_snapshot(file_path: Path):
     """Elimina los posibles archivos de snapshot asociados a una ruta."""
-    # Intentamos ambas convenciones de nombre (archivo.ext.json.xz y archivo.json.xz)
-    targets = [
-        file_path.with_name(f"{file_path.name}.json.xz"),
-        file_path.with_name(f"{file_path.stem}.json.xz"),
-    ]
-    for target in targets:
+    index = SnapshotIndex.load(file_path.parent)
+    for target in _snapshot_candidates(file_path):
         if target.exists():
             target.unlink()
             logger.debug(f"Snapshot eliminado físicamente: {target.name}")
+        index.remove(target.name)
+
+    if index.path.exists():
+        index.save()
+
+
+# tartape enlaza sus modelos (Track, TapeMetadata) a la última base abierta, para
+# todo el proceso: dos catálogos abiertos a la vez en hilos distintos se pisan.
+TAPE_CATALOG_LOCK = threading.RLock()
+
+
+@contextmanager
+def open_tape_catalog(directory: Union[str, Path]):
+    """Abre el catálogo de una cinta en exclusiva (ver `TAPE_CATALOG_LOCK`)."""
+    from tartape.catalog import Catalog
+
+    with TAPE_CATALOG_LOCK, Catalog.from_directory(directory) as catalog:
+        yield catalog
 
 
 def create_md5sum_by_hashlib(path: Path):
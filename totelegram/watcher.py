@@ -0,0 +1,215 @@
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Set
+
+from totelegram.cli.logic import InventoryEngine
+from totelegram.identity import Settings
+from totelegram.utils import is_snapshot_file
+
+logger = logging.getLogger(__name__)
+
+
+class FileState(NamedTuple):
+    size: int
+    mtime_ns: int
+
+
+def _stat(path: Path) -> Optional[FileState]:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return FileState(st.st_size, st.st_mtime_ns)
+
+
+class PollingBackend:
+    """
+    Detecta cambios recorriendo el árbol con `os.scandir` y comparando tamaño y
+    mtime con la pasada anterior. Solo hace `stat`: no lee contenido ni consulta
+    snapshots. Es el respaldo cuando `watchdog` no está instalado.
+    """
+
+    name = "polling"
+
+    def __init__(self, root: Path):
+        self.root = root
+        self._seen: Dict[Path, FileState] = dict(self._walk())
+
+    def _walk(self) -> Iterable[tuple]:
+        stack = [str(self.root)]
+        while stack:
+            current = stack.pop()
+            try:
+                with os.scandir(current) as it:
+                    for entry in it:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                stack.append(entry.path)
+                            elif entry.is_file(follow_symlinks=False):
+                                st = entry.stat(follow_symlinks=False)
+                                yield Path(entry.path), FileState(st.st_size, st.st_mtime_ns)
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+
+    def changes(self) -> Set[Path]:
+        current = dict(self._walk())
+        changed = {p for p, state in current.items() if self._seen.get(p) != state}
+        self._seen = current
+        return changed
+
+    def stop(self):
+        pass
+
+
+class WatchdogBackend:
+    """
+    Recibe eventos del sistema (inotify/FSEvents/ReadDirectoryChangesW) vía
+    `watchdog`. Los eventos se acumulan en un conjunto que `changes()` vacía.
+    """
+
+    name = "watchdog"
+
+    def __init__(self, root: Path):
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            raise RuntimeError(
+                "El modo watch con eventos requiere el paquete opcional 'watchdog' "
+                "(pip install totelegram[watch])."
+            )
+
+        self._lock = threading.Lock()
+        self._pending: Set[Path] = set()
+        backend = self
+
+        class _Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if event.is_directory:
+                    return
+                target = getattr(event, "dest_path", None) or event.src_path
+                with backend._lock:
+                    backend._pending.add(Path(os.fsdecode(target)))
+
+        self._observer = Observer()
+        self._observer.schedule(_Handler(), str(root), recursive=True)
+        self._observer.daemon = True
+        self._observer.start()
+
+    def changes(self) -> Set[Path]:
+        with self._lock:
+            changed, self._pending = self._pending, set()
+        return changed
+
+    def stop(self):
+        self._observer.stop()
+        self._observer.join(timeout=5)
+
+
+def create_backend(root: Path, polling: bool = False):
+    """Usa eventos del sistema si `watchdog` está disponible; si no, sondeo."""
+    if not polling:
+        try:
+            return WatchdogBackend(root)
+        except RuntimeError as e:
+            logger.info(f"{e} Se usará sondeo.")
+    return PollingBackend(root)
+
+
+class Debouncer:
+    """
+    Retiene los archivos que siguen escribiéndose. Un archivo se entrega cuando su
+    tamaño y mtime no cambian durante `settle` segundos.
+    """
+
+    def __init__(self, settle: float = 2.0, clock: Callable[[], float] = time.monotonic):
+        self.settle = settle
+        self.clock = clock
+        self._pending: Dict[Path, tuple] = {}
+
+    def __len__(self):
+        return len(self._pending)
+
+    def touch(self, paths: Iterable[Path]):
+        now = self.clock()
+        for path in paths:
+            state = _stat(path)
+            if state is None:
+                self._pending.pop(path, None)
+            else:
+                self._pending[path] = (state, now)
+
+    def ready(self) -> List[Path]:
+        now = self.clock()
+        stable = []
+        for path, (state, since) in list(self._pending.items()):
+            current = _stat(path)
+            if current is None:
+                del self._pending[path]
+            elif current != state:
+                self._pending[path] = (current, now)
+            elif now - since >= self.settle:
+                del self._pending[path]
+                stable.append(path)
+        return sorted(stable)
+
+
+class DirectoryWatcher:
+    """
+    Observa una carpeta y entrega en lotes los archivos nuevos o modificados,
+    ya estabilizados y filtrados por `InventoryEngine` (exclusiones, tamaño y
+    snapshots). Solo los archivos que cambiaron pasan por el filtro, y uno con
+    snapshot se entrega si su contenido ya no es el del snapshot.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        settings: Settings,
+        on_ready: Callable[[List[Path], Dict[Path, str]], None],
+        settle: float = 2.0,
+        interval: float = 1.0,
+        force: bool = False,
+        polling: bool = False,
+    ):
+        self.root = root.resolve()
+        self.settings = settings
+        self.on_ready = on_ready
+        self.interval = interval
+        self.force = force
+        self.debouncer = Debouncer(settle)
+        self.backend = create_backend(self.root, polling)
+        self._stop = threading.Event()
+
+    def stop(self):
+        self._stop.set()
+
+    def poll(self) -> List[Path]:
+        """Una iteración: recoge cambios, los estabiliza y filtra. Devuelve lo entregado."""
+        changed = {p for p in self.backend.changes() if not is_snapshot_file(p)}
+        if changed:
+            self.debouncer.touch(changed)
+
+        stable = self.debouncer.ready()
+        if not stable:
+            return []
+
+        engine = InventoryEngine(self.settings, self.force, verify_snapshots=True)
+        report = engine.scan_granular(stable)
+        if report.found:
+            # Los MD5 calculados al comprobar snapshots viajan con los archivos.
+            self.on_ready(report.found, report.md5sums)
+        return report.found
+
+    def run(self):
+        try:
+            while not self._stop.is_set():
+                self.poll()
+                self._stop.wait(self.interval)
+        finally:
+            self.backend.stop()